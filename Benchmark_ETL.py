@@ -0,0 +1,394 @@
+import pandas as pd
+import numpy as np
+import argparse
+import itertools
+import contextlib
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import multiprocessing
+
+from ETL_Metrics import METRICS
+from ETL_Transport import open_stream_source
+from ETL_Join import HybridJoinThreaded
+from ETL_Warehouse import EmbeddedWarehouse
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SWEEP_PARAMETERS = ['join_mode', 'load', 'hash_slots', 'queue_size', 'disk_partition_size', 'batch_size']
+
+STAGES = ['producer_enqueue', 'hash_probe', 'partition_load', 'join', 'spill', 'unspill', 'db_batch_insert', 'db_commit']
+
+
+# Bounded Zipf over `n` keys: P(rank k) ~ 1 / k^skew, skew=0 is uniform. Ranks
+# are mapped onto a random permutation of the keys so hot keys are spread
+# across disk partitions instead of all landing in the first one.
+def zipf_sampler(n, skew, rng):
+    weights = 1.0 / np.power(np.arange(1, n + 1, dtype='float64'), skew)
+    cdf = np.cumsum(weights / weights.sum())
+    permutation = rng.permutation(n)
+    
+    def sample(size):
+        ranks = np.minimum(np.searchsorted(cdf, rng.random(size)), n - 1)
+        return permutation[ranks]
+    return sample
+
+
+def scale_master(df, count, key, make_keys, rng):
+    rows = df.drop_duplicates(key).sample(n=count, replace=count > len(df), random_state=rng.integers(2**31))
+    rows = rows.reset_index(drop=True)
+    rows[key] = make_keys(count)
+    return rows
+
+
+def generate_dataset(out_dir, transactions=10_000_000, customers=None, products=None,
+                     customer_skew=1.1, product_skew=1.1, unmatched_rate=0.0,
+                     start_date='2017-01-01', end_date='2020-12-31', seed=42, chunk_size=1_000_000,
+                     source_dir=REPO_DIR):
+    print("\n" + "="*80)
+    print("GENERATING SYNTHETIC DATASET")
+    print("="*80)
+    
+    rng = np.random.default_rng(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    start_time = time.time()
+    
+    # Attribute combinations (gender/age/..., category/price/store/supplier)
+    # are resampled from the bundled master files so joins stay realistic.
+    customer_seed = pd.read_csv(os.path.join(source_dir, 'customer_master_data.csv'), index_col=0)
+    product_seed = pd.read_csv(os.path.join(source_dir, 'product_master_data.csv'), index_col=0)
+    customers = customers or customer_seed['Customer_ID'].nunique()
+    products = products or product_seed['Product_ID'].nunique()
+    
+    customer_df = scale_master(customer_seed, customers, 'Customer_ID',
+                               lambda n: np.arange(1000001, 1000001 + n), rng)
+    product_df = scale_master(product_seed, products, 'Product_ID',
+                              lambda n: [f"P{i:08d}" for i in range(n)], rng)
+    customer_df.to_csv(os.path.join(out_dir, 'customer_master_data.csv'))
+    product_df.to_csv(os.path.join(out_dir, 'product_master_data.csv'))
+    
+    customer_ids = customer_df['Customer_ID'].to_numpy()
+    product_ids = product_df['Product_ID'].to_numpy(dtype=object)
+    sample_customer = zipf_sampler(customers, customer_skew, rng)
+    sample_product = zipf_sampler(products, product_skew, rng)
+    first_day = np.datetime64(start_date, 'D')
+    days = int((np.datetime64(end_date, 'D') - first_day).astype(int)) + 1
+    
+    path = os.path.join(out_dir, 'transactional_data.csv')
+    unmatched = 0
+    for start_idx in range(0, transactions, chunk_size):
+        size = min(chunk_size, transactions - start_idx)
+        chunk = pd.DataFrame({
+            'orderID': np.arange(start_idx + 1, start_idx + size + 1),
+            'Customer_ID': customer_ids[sample_customer(size)],
+            'Product_ID': product_ids[sample_product(size)],
+            'quantity': rng.integers(1, 11, size),
+            'date': (first_day + rng.integers(0, days, size)).astype(str)
+        }, index=pd.RangeIndex(start_idx, start_idx + size))
+        
+        # Unmatched rows get a key that is in neither master file, on the
+        # customer or the product side with equal probability.
+        missing = np.flatnonzero(rng.random(size) < unmatched_rate)
+        if len(missing):
+            on_customer = rng.random(len(missing)) < 0.5
+            customer_rows = chunk.index[missing[on_customer]]
+            product_rows = chunk.index[missing[~on_customer]]
+            chunk.loc[customer_rows, 'Customer_ID'] = 1000001 + customers + rng.integers(0, customers, len(customer_rows))
+            chunk.loc[product_rows, 'Product_ID'] = [f"PX{i:07d}" for i in rng.integers(0, products, len(product_rows))]
+            unmatched += len(missing)
+        
+        chunk.to_csv(path, mode='w' if start_idx == 0 else 'a', header=start_idx == 0)
+        print(f"Progress: {start_idx + size:,}/{transactions:,} [{(start_idx + size) / transactions * 100:5.1f}%]", end='\r')
+    
+    manifest = {
+        'transactions': transactions,
+        'customers': customers,
+        'products': products,
+        'customer_skew': customer_skew,
+        'product_skew': product_skew,
+        'unmatched_rate': unmatched_rate,
+        'unmatched_rows': unmatched,
+        'start_date': start_date,
+        'end_date': end_date,
+        'seed': seed
+    }
+    with open(os.path.join(out_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    
+    print(f"\n\nWrote {transactions:,} transactions ({unmatched:,} unmatched), {customers:,} customers and "
+          f"{products:,} products to {out_dir} in {time.time() - start_time:.1f}s")
+    print("="*80)
+    return manifest
+
+
+def peak_rss_mb():
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is kilobytes on Linux and bytes on macOS.
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    if psutil is not None:
+        memory = psutil.Process().memory_info()
+        return getattr(memory, 'peak_wset', memory.rss) / (1024 * 1024)
+    return None
+
+
+def case_key(case):
+    return ','.join(f"{name}={case[name]}" for name in SWEEP_PARAMETERS)
+
+
+# Runs in a fresh spawned process so peak RSS and the metrics registry belong
+# to this case alone.
+def run_case(dataset_dir, case):
+    work_dir = tempfile.mkdtemp(prefix='hybridjoin_bench_')
+    join_config = {name: case[name] for name in SWEEP_PARAMETERS if name != 'load'}
+    result = {'config': dict(case)}
+    
+    try:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            hybrid_join = HybridJoinThreaded(disk_dir=os.path.join(work_dir, 'disk_buffer'), **join_config)
+            
+            start_time = time.perf_counter()
+            hybrid_join.load_master_data_to_disk(os.path.join(dataset_dir, 'customer_master_data.csv'),
+                                                 os.path.join(dataset_dir, 'product_master_data.csv'))
+            result['startup_seconds'] = time.perf_counter() - start_time
+            
+            source = open_stream_source(os.path.join(dataset_dir, 'transactional_data.csv'), case['batch_size'])
+            start_time = time.perf_counter()
+            enriched = hybrid_join.execute_join_threaded(source)
+            result['join_seconds'] = time.perf_counter() - start_time
+            
+            result['load_seconds'] = 0.0
+            if case['load'] != 'none':
+                warehouse = EmbeddedWarehouse(path=os.path.join(work_dir, f"bench.{case['load']}"),
+                                              engine=case['load'],
+                                              schema_path=os.path.join(REPO_DIR, 'create_star_schema.sql'))
+                start_time = time.perf_counter()
+                warehouse.load_dimensions(enriched)
+                warehouse.load_fact_table(enriched)
+                result['load_seconds'] = time.perf_counter() - start_time
+                warehouse.close()
+        
+        snapshot = METRICS.snapshot()
+        processed = hybrid_join.stats['processed']
+        result.update({
+            'records': processed,
+            'joined': hybrid_join.stats['joined'],
+            'dropped': hybrid_join.stats['dropped'],
+            'records_per_second': processed / result['join_seconds'] if result['join_seconds'] else 0.0,
+            'end_to_end_records_per_second': processed / (result['join_seconds'] + result['load_seconds'])
+                                             if result['join_seconds'] else 0.0,
+            'peak_rss_mb': peak_rss_mb(),
+            'spilled': hybrid_join.spill.stats['spilled'],
+            'partition_reads': sum(relation.stats['partition_reads']
+                                   for relation in (hybrid_join.customer_disk, hybrid_join.product_disk)),
+            'latency': {stage: {'count': histogram['count'], 'p50': histogram['p50'],
+                                'p99': histogram['p99'], 'max': histogram['max']}
+                        for stage, histogram in snapshot['histograms'].items() if stage in STAGES}
+        })
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    
+    return result
+
+
+def summarize_runs(runs):
+    summary = {'config': runs[0]['config'], 'repeats': len(runs)}
+    for metric in ('records_per_second', 'end_to_end_records_per_second', 'join_seconds', 'load_seconds',
+                   'startup_seconds', 'peak_rss_mb'):
+        values = [run[metric] for run in runs if run.get(metric) is not None]
+        summary[metric] = statistics.median(values) if values else None
+    for metric in ('records', 'joined', 'dropped', 'spilled', 'partition_reads'):
+        summary[metric] = runs[-1][metric]
+    summary['latency'] = {}
+    for stage in runs[-1]['latency']:
+        summary['latency'][stage] = {
+            quantile: statistics.median(run['latency'][stage][quantile] for run in runs if stage in run['latency'])
+            for quantile in ('p50', 'p99', 'max')
+        }
+    return summary
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPO_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_sweep(dataset_dir, sweep, repeat=3, report_path=None):
+    cases = [dict(zip(SWEEP_PARAMETERS, values))
+             for values in itertools.product(*(sweep[name] for name in SWEEP_PARAMETERS))]
+    
+    print("\n" + "="*80)
+    print("HYBRIDJOIN BENCHMARK SWEEP")
+    print("="*80)
+    print(f"\nDataset: {dataset_dir}")
+    print(f"Cases: {len(cases)} x {repeat} repeats\n")
+    print(f"{'Case':<90} {'Records/s':>12} {'Peak RSS MB':>12}")
+    print("─"*116)
+    
+    context = multiprocessing.get_context('spawn')
+    results = []
+    for case in cases:
+        runs = []
+        for _ in range(repeat):
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                runs.append(executor.submit(run_case, dataset_dir, case).result())
+        summary = summarize_runs(runs)
+        summary['runs'] = runs
+        results.append(summary)
+        rss = f"{summary['peak_rss_mb']:,.1f}" if summary['peak_rss_mb'] is not None else 'n/a'
+        print(f"{case_key(case):<90} {summary['records_per_second']:>12,.0f} {rss:>12}")
+    
+    manifest_path = os.path.join(dataset_dir, 'manifest.json')
+    dataset = {'path': dataset_dir}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            dataset = json.load(f)
+    report = {
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'dataset': dataset,
+        'repeat': repeat,
+        'results': {case_key(result['config']): result for result in results}
+    }
+    
+    if report_path:
+        with open(report_path, 'w') as f:
+            json.dump(report, f, indent=2, default=float)
+        print(f"\nReport written to {report_path}")
+    print("="*80)
+    return report
+
+
+# Throughput may drop and peak RSS / p99 join latency may grow by at most
+# `tolerance` (a fraction) before a case counts as a regression.
+def compare_reports(baseline, current, tolerance=0.10):
+    print("\n" + "="*80)
+    print("BENCHMARK COMPARISON")
+    print("="*80)
+    print(f"\nBaseline: {baseline.get('revision')} ({baseline.get('generated_at')})")
+    print(f"Current:  {current.get('revision')} ({current.get('generated_at')})")
+    print(f"Tolerance: {tolerance:.0%}\n")
+    
+    regressions = []
+    for key, result in current['results'].items():
+        reference = baseline['results'].get(key)
+        if reference is None:
+            print(f"   NEW   {key}")
+            continue
+        
+        checks = [('records/s', reference['records_per_second'], result['records_per_second'], False),
+                  ('peak RSS MB', reference['peak_rss_mb'], result['peak_rss_mb'], True)]
+        if 'join' in reference['latency'] and 'join' in result['latency']:
+            checks.append(('join p99 s', reference['latency']['join']['p99'], result['latency']['join']['p99'], True))
+        
+        for metric, before, after, lower_is_better in checks:
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            regressed = change > tolerance if lower_is_better else change < -tolerance
+            status = 'REGRESSION' if regressed else 'ok'
+            print(f"   {status:<10} {key} | {metric}: {before:,.4g} -> {after:,.4g} ({change:+.1%})")
+            if regressed:
+                regressions.append({'case': key, 'metric': metric, 'baseline': before,
+                                    'current': after, 'change': change})
+    
+    print(f"\n{len(regressions)} regression(s)")
+    print("="*80)
+    return regressions
+
+
+def parse_list(value, cast=str):
+    return [cast(item) for item in value.split(',') if item]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetic data generator and HYBRIDJOIN benchmark suite")
+    commands = parser.add_subparsers(dest='command', required=True)
+    
+    generate = commands.add_parser('generate', help="write a scaled synthetic dataset")
+    generate.add_argument('out_dir')
+    generate.add_argument('--transactions', type=int, default=10_000_000)
+    generate.add_argument('--customers', type=int)
+    generate.add_argument('--products', type=int)
+    generate.add_argument('--customer-skew', type=float, default=1.1)
+    generate.add_argument('--product-skew', type=float, default=1.1)
+    generate.add_argument('--unmatched-rate', type=float, default=0.0)
+    generate.add_argument('--start-date', default='2017-01-01')
+    generate.add_argument('--end-date', default='2020-12-31')
+    generate.add_argument('--seed', type=int, default=42)
+    
+    run = commands.add_parser('run', help="run a parameter sweep and write a JSON report")
+    run.add_argument('dataset_dir')
+    run.add_argument('--report', default='benchmark_report.json')
+    run.add_argument('--repeat', type=int, default=3)
+    run.add_argument('--join-mode', default='batch,tuple')
+    run.add_argument('--load', default='none', help="none, duckdb and/or sqlite")
+    run.add_argument('--hash-slots', default='10000')
+    run.add_argument('--queue-size', default='5000')
+    run.add_argument('--partition-size', default='500')
+    run.add_argument('--batch-size', default='5000')
+    run.add_argument('--baseline', help="compare against this report and exit 1 on regression")
+    run.add_argument('--tolerance', type=float, default=0.10)
+    
+    compare = commands.add_parser('compare', help="compare two reports")
+    compare.add_argument('baseline')
+    compare.add_argument('current')
+    compare.add_argument('--tolerance', type=float, default=0.10)
+    
+    args = parser.parse_args()
+    
+    if args.command == 'generate':
+        generate_dataset(args.out_dir, args.transactions, args.customers, args.products,
+                         args.customer_skew, args.product_skew, args.unmatched_rate,
+                         args.start_date, args.end_date, args.seed)
+        return 0
+    
+    if args.command == 'run':
+        sweep = {
+            'join_mode': parse_list(args.join_mode),
+            'load': parse_list(args.load),
+            'hash_slots': parse_list(args.hash_slots, int),
+            'queue_size': parse_list(args.queue_size, int),
+            'disk_partition_size': parse_list(args.partition_size, int),
+            'batch_size': parse_list(args.batch_size, int)
+        }
+        report = run_sweep(args.dataset_dir, sweep, args.repeat, args.report)
+        if args.baseline:
+            with open(args.baseline) as f:
+                return 1 if compare_reports(json.load(f), report, args.tolerance) else 0
+        return 0
+    
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    return 1 if compare_reports(baseline, current, args.tolerance) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
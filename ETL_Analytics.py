@@ -0,0 +1,449 @@
+import pandas as pd
+import numpy as np
+import threading
+import time
+import os
+import json
+from datetime import datetime
+
+from ETL_Metrics import METRICS
+
+try:
+    from scipy import sparse
+except ImportError:
+    sparse = None
+
+
+AGGREGATE_SPECS = {
+    'Agg_Store_Quarter': [('Year', 'INT'), ('Quarter', 'INT'), ('Store_ID', 'INT')],
+    'Agg_Product_Month': [('Year', 'INT'), ('Month', 'INT'), ('Product_ID', 'VARCHAR(50)')],
+    'Agg_Category_DayType': [('Product_Category', 'VARCHAR(100)'), ('Day_Type', 'VARCHAR(20)')],
+    'Agg_Supplier_Month': [('Year', 'INT'), ('Month', 'INT'), ('Supplier_ID', 'INT')]
+}
+
+AGGREGATE_MEASURES = [('Total_Revenue', 'DECIMAL(18, 2)'), ('Total_Quantity', 'BIGINT'), ('Total_Orders', 'BIGINT')]
+
+
+# Running SUM(Total_Revenue), SUM(Quantity) and COUNT(*) per rollup key, fed
+# with joined batches as the consumer emits them. Per-batch group-bys are
+# buffered and compacted so memory tracks the number of groups, not rows.
+class StreamingAggregates:
+    def __init__(self, compact_every=32):
+        self.compact_every = compact_every
+        self.pending = {name: [] for name in AGGREGATE_SPECS}
+        self.rows_aggregated = 0
+    
+    def update(self, joined):
+        if len(joined) == 0:
+            return
+        
+        dates = pd.to_datetime(joined['date'])
+        frame = pd.DataFrame({
+            'Year': dates.dt.year.to_numpy(),
+            'Quarter': ((dates.dt.month - 1) // 3 + 1).to_numpy(),
+            'Month': dates.dt.month.to_numpy(),
+            'Day_Type': np.where(dates.dt.weekday.to_numpy() >= 5, 'Weekend', 'Weekday'),
+            'Store_ID': joined['storeID'].to_numpy(),
+            'Supplier_ID': joined['supplierID'].to_numpy(),
+            'Product_ID': joined['Product_ID'].to_numpy(),
+            'Product_Category': joined['Product_Category'].to_numpy(),
+            'Total_Revenue': joined['Total_Revenue'].astype(float).to_numpy(),
+            'Total_Quantity': joined['quantity'].astype('int64').to_numpy(),
+            'Total_Orders': np.ones(len(joined), dtype='int64')
+        })
+        
+        for name, keys in AGGREGATE_SPECS.items():
+            self.pending[name].append(self.group(frame, [column for column, _ in keys]))
+            if len(self.pending[name]) >= self.compact_every:
+                self.compact(name)
+        self.rows_aggregated += len(joined)
+    
+    def group(self, frame, keys):
+        return frame.groupby(keys, sort=False, as_index=False)[['Total_Revenue', 'Total_Quantity', 'Total_Orders']].sum()
+    
+    def compact(self, name):
+        if len(self.pending[name]) > 1:
+            keys = [column for column, _ in AGGREGATE_SPECS[name]]
+            self.pending[name] = [self.group(pd.concat(self.pending[name], ignore_index=True), keys)]
+    
+    def absorb(self, other):
+        for name in AGGREGATE_SPECS:
+            self.pending[name].append(other.frame(name))
+            self.compact(name)
+        self.rows_aggregated += other.rows_aggregated
+    
+    def frame(self, name):
+        self.compact(name)
+        if not self.pending[name]:
+            columns = [column for column, _ in AGGREGATE_SPECS[name] + AGGREGATE_MEASURES]
+            return pd.DataFrame(columns=columns)
+        frame = self.pending[name][0].copy()
+        frame['Total_Revenue'] = frame['Total_Revenue'].round(2)
+        return frame
+    
+    def frames(self):
+        return {name: self.frame(name) for name in AGGREGATE_SPECS}
+
+
+AFFINITY_TOP_K = 10
+PACKED_KEY_BITS = 32
+PACKED_KEY_MASK = (1 << PACKED_KEY_BITS) - 1
+
+
+def extend_index(index, values):
+    codes = index.get_indexer(values)
+    unseen = codes < 0
+    if unseen.any():
+        index = index.append(pd.Index(pd.unique(values[unseen])))
+        codes = index.get_indexer(values)
+    return index, codes.astype('int64')
+
+
+def expand_ranges(starts, lengths):
+    offsets = np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return np.arange(lengths.sum()) - offsets + np.repeat(starts, lengths)
+
+
+# Market-basket affinity kept up to date from the joined stream instead of the
+# quadratic Fact_Sales self-join. Distinct customer x product purchases form a
+# sparse incidence matrix B; C = BᵀB counts the customers who bought each
+# product pair. A batch adding purchases D (B' = B + D) only touches its own
+# customers' rows: C grows by DᵀB' + B'ᵀD - DᵀD, computed with scipy.sparse
+# when installed and as a sorted-array join otherwise. Pairs are stored once
+# (lower product code first) as packed int64 keys.
+class ProductAffinity:
+    def __init__(self, top_k=AFFINITY_TOP_K, state_path=None):
+        self.top_k = top_k
+        self.state_path = state_path
+        self.customer_ids = pd.Index([], dtype='int64')
+        self.product_ids = pd.Index([], dtype=object)
+        self.purchases = np.empty(0, dtype='int64')
+        self.pair_keys = np.empty(0, dtype='int64')
+        self.pair_counts = np.empty(0, dtype='int64')
+        self.dirty = []
+        self.stats = {'batches': 0, 'new_purchases': 0, 'pair_updates': 0, 'seconds': 0.0}
+        if state_path and os.path.exists(state_path):
+            self.load(state_path)
+    
+    def update(self, joined):
+        if len(joined) == 0:
+            return
+        
+        start_time = time.time()
+        self.customer_ids, customers = extend_index(self.customer_ids, joined['Customer_ID'].astype('int64').to_numpy())
+        self.product_ids, products = extend_index(self.product_ids, joined['Product_ID'].astype(str).to_numpy())
+        keys = np.unique((customers << PACKED_KEY_BITS) | products)
+        new = keys[~np.isin(keys, self.purchases, assume_unique=True)]
+        if len(new):
+            self.purchases = np.union1d(self.purchases, new)
+            touched = np.unique(new >> PACKED_KEY_BITS)
+            starts = np.searchsorted(self.purchases, touched << PACKED_KEY_BITS)
+            ends = np.searchsorted(self.purchases, (touched + 1) << PACKED_KEY_BITS)
+            after = self.purchases[expand_ranges(starts, ends - starts)]
+            
+            counter = self.sparse_pair_counts if sparse is not None else self.joined_pair_counts
+            pair_keys, pair_counts = counter(new, after)
+            self.add_pairs(pair_keys, pair_counts)
+            self.dirty.append(np.unique(np.concatenate([pair_keys >> PACKED_KEY_BITS, pair_keys & PACKED_KEY_MASK])))
+            self.stats['new_purchases'] += len(new)
+            self.stats['pair_updates'] += len(pair_keys)
+        self.stats['batches'] += 1
+        self.stats['seconds'] += time.time() - start_time
+    
+    def sparse_pair_counts(self, new, after):
+        customers, rows = np.unique(after >> PACKED_KEY_BITS, return_inverse=True)
+        shape = (len(customers), len(self.product_ids))
+        incidence = sparse.csr_matrix((np.ones(len(after)), (rows, after & PACKED_KEY_MASK)), shape=shape)
+        delta = sparse.csr_matrix((np.ones(len(new)), (np.searchsorted(customers, new >> PACKED_KEY_BITS),
+                                                        new & PACKED_KEY_MASK)), shape=shape)
+        cross = delta.T @ incidence
+        counts = sparse.triu(cross + cross.T - delta.T @ delta, k=1).tocoo()
+        keep = counts.data > 0
+        keys = (counts.row[keep].astype('int64') << PACKED_KEY_BITS) | counts.col[keep]
+        order = np.argsort(keys)
+        return keys[order], counts.data[keep][order].astype('int64')
+    
+    def joined_pair_counts(self, new, after):
+        # Pairs each new purchase forms with the customer's other purchases; a
+        # pair of two new purchases is counted from its lower product only.
+        customer_keys = (new >> PACKED_KEY_BITS) << PACKED_KEY_BITS
+        starts = np.searchsorted(after, customer_keys)
+        lengths = np.searchsorted(after, customer_keys + (1 << PACKED_KEY_BITS)) - starts
+        positions = expand_ranges(starts, lengths)
+        left = np.repeat(new & PACKED_KEY_MASK, lengths)
+        right = after[positions] & PACKED_KEY_MASK
+        right_is_new = np.isin(after, new, assume_unique=True)[positions]
+        keep = (left != right) & (~right_is_new | (left < right))
+        low, high = np.minimum(left, right)[keep], np.maximum(left, right)[keep]
+        return np.unique((low << PACKED_KEY_BITS) | high, return_counts=True)
+    
+    # Folds in another instance's purchases and pair counts. Instances over
+    # disjoint customers (the shards of a Customer_ID-sharded join) just add
+    # their pair counts; customers seen by both are replayed through update()
+    # so their pairs are not counted twice.
+    def absorb(self, other):
+        if not len(other.purchases):
+            return
+        
+        start_time = time.time()
+        customers = other.customer_ids.to_numpy()[other.purchases >> PACKED_KEY_BITS]
+        products = other.product_ids.to_numpy()[other.purchases & PACKED_KEY_MASK]
+        if self.customer_ids.isin(customers).any():
+            self.update(pd.DataFrame({'Customer_ID': customers, 'Product_ID': products}))
+            return
+        
+        self.customer_ids, customer_codes = extend_index(self.customer_ids, customers)
+        self.product_ids, product_codes = extend_index(self.product_ids, products)
+        self.purchases = np.union1d(self.purchases, (customer_codes << PACKED_KEY_BITS) | product_codes)
+        
+        _, product_map = extend_index(self.product_ids, other.product_ids.to_numpy())
+        low = product_map[other.pair_keys >> PACKED_KEY_BITS]
+        high = product_map[other.pair_keys & PACKED_KEY_MASK]
+        keys = (np.minimum(low, high) << PACKED_KEY_BITS) | np.maximum(low, high)
+        order = np.argsort(keys)
+        self.add_pairs(keys[order], other.pair_counts[order])
+        self.dirty.append(np.unique(np.concatenate([low, high])))
+        self.stats['new_purchases'] += len(other.purchases)
+        self.stats['pair_updates'] += len(keys)
+        self.stats['batches'] += 1
+        self.stats['seconds'] += time.time() - start_time
+    
+    def add_pairs(self, keys, counts):
+        positions = np.searchsorted(self.pair_keys, keys)
+        found = positions < len(self.pair_keys)
+        found[found] = self.pair_keys[positions[found]] == keys[found]
+        self.pair_counts[positions[found]] += counts[found]
+        self.pair_keys = np.insert(self.pair_keys, positions[~found], keys[~found])
+        self.pair_counts = np.insert(self.pair_counts, positions[~found], counts[~found])
+    
+    # Top-K partners per product, both directions of each pair. One stable
+    # sort on (product, descending count) packed into an int64; ties keep
+    # pair-key order so ranks are stable across refreshes.
+    def top_partners(self, products=None):
+        low = self.pair_keys >> PACKED_KEY_BITS
+        high = self.pair_keys & PACKED_KEY_MASK
+        source = np.concatenate([low, high])
+        related = np.concatenate([high, low])
+        counts = np.concatenate([self.pair_counts, self.pair_counts])
+        if products is not None:
+            selected = np.isin(source, products)
+            source, related, counts = source[selected], related[selected], counts[selected]
+        
+        product_ids = self.product_ids.to_numpy()
+        order = np.argsort((source << PACKED_KEY_BITS) | (PACKED_KEY_MASK - counts), kind='stable')
+        source, related, counts = source[order], related[order], counts[order]
+        first = np.r_[True, source[1:] != source[:-1]]
+        ranks = np.arange(len(source)) - np.maximum.accumulate(np.where(first, np.arange(len(source)), 0)) + 1
+        keep = ranks <= self.top_k
+        return pd.DataFrame({
+            'Product_ID': product_ids[source[keep]],
+            'Related_Product_ID': product_ids[related[keep]],
+            'Co_Purchase_Count': counts[keep],
+            'Partner_Rank': ranks[keep]
+        })
+    
+    # Top-K rows for the products whose pair counts changed since the last
+    # call, plus the full list of those products (their old rows are replaced).
+    def changes(self):
+        dirty = np.unique(np.concatenate(self.dirty)) if self.dirty else np.empty(0, dtype='int64')
+        self.dirty = []
+        return self.top_partners(dirty), self.product_ids.to_numpy()[dirty].tolist()
+    
+    def save(self, path=None):
+        path = path or self.state_path
+        temp_path = f"{path}.tmp.npz"
+        np.savez(temp_path, customer_ids=self.customer_ids.to_numpy(),
+                 product_ids=self.product_ids.to_numpy().astype(str), purchases=self.purchases,
+                 pair_keys=self.pair_keys, pair_counts=self.pair_counts)
+        os.replace(temp_path, path)
+    
+    def load(self, path):
+        with np.load(path) as state:
+            self.customer_ids = pd.Index(state['customer_ids'].astype('int64'))
+            self.product_ids = pd.Index(state['product_ids'].astype(object))
+            self.purchases = state['purchases']
+            self.pair_keys = state['pair_keys']
+            self.pair_counts = state['pair_counts']
+
+
+ANOMALY_Z_THRESHOLD = 2.0
+ANOMALY_ALLOWED_LATENESS_DAYS = 1
+
+
+# Revenue alerts as JSON lines, flushed after every batch so a tail or log
+# shipper sees them as soon as the consumer has joined the rows.
+class AlertSink:
+    def __init__(self, path='revenue_alerts.jsonl'):
+        self.path = path
+        self.handle = open(path, 'a')
+        self.lock = threading.Lock()
+        self.stats = {'alerts': 0}
+    
+    def write(self, alerts):
+        with self.lock:
+            for record in alerts.to_dict('records'):
+                self.handle.write(json.dumps(record, default=str) + '\n')
+            self.handle.flush()
+            self.stats['alerts'] += len(alerts)
+    
+    def close(self):
+        self.handle.close()
+
+
+# Streaming form of the daily product revenue outlier query (Q19). Each
+# (product, day) keeps its running revenue total and each product the count,
+# sum and sum of squares of its daily totals, shifted by the product's first
+# daily total so the variance does not cancel catastrophically. A batch that
+# grows a day's total swaps the old total for the new one in its product's
+# sums, so mean and stdev always equal AVG/STDEV over the days seen so far.
+#
+# A partial day total is not scored: a day closes once the newest date seen
+# is more than allowed_lateness days past it (or at flush(), when the stream
+# ends), and is scored then. Rows arriving for a closed day re-score it; an
+# alerted day that no longer qualifies is sent to the sink as 'Retracted', and
+# a closed day that now qualifies is alerted. save()/load() carry the state
+# across incremental runs.
+class RevenueAnomalyDetector:
+    def __init__(self, sink=None, z_threshold=ANOMALY_Z_THRESHOLD, min_days=5,
+                 allowed_lateness=ANOMALY_ALLOWED_LATENESS_DAYS):
+        self.sink = sink
+        self.z_threshold = z_threshold
+        self.min_days = min_days
+        self.allowed_lateness = allowed_lateness
+        self.watermark = np.iinfo('int64').min
+        self.products = pd.Index([], dtype=object)
+        self.day_keys = pd.Index([], dtype='int64')
+        self.day_totals = np.empty(0)
+        self.day_closed = np.empty(0, dtype=bool)
+        self.day_alerted = np.empty(0, dtype=bool)
+        self.shift = np.empty(0)
+        self.days = np.empty(0, dtype='int64')
+        self.sums = np.empty(0)
+        self.squares = np.empty(0)
+        self.stats = {'batches': 0, 'alerts': 0, 'retractions': 0, 'late_rows': 0, 'seconds': 0.0}
+    
+    def update(self, joined):
+        if len(joined) == 0:
+            return
+        
+        start_time = time.time()
+        self.products, products = extend_index(self.products, joined['Product_ID'].astype(str).to_numpy())
+        dates = pd.to_datetime(joined['date']).to_numpy().astype('datetime64[D]').astype('int64')
+        keys, inverse = np.unique((products << PACKED_KEY_BITS) | dates, return_inverse=True)
+        revenue = np.bincount(inverse.reshape(-1), weights=joined['Total_Revenue'].astype(float).to_numpy())
+        
+        known_days = len(self.day_keys)
+        self.day_keys, slots = extend_index(self.day_keys, keys)
+        self.day_totals = np.concatenate([self.day_totals, np.zeros(len(self.day_keys) - known_days)])
+        self.day_closed = np.concatenate([self.day_closed, np.zeros(len(self.day_keys) - known_days, dtype=bool)])
+        self.day_alerted = np.concatenate([self.day_alerted, np.zeros(len(self.day_keys) - known_days, dtype=bool)])
+        grow = len(self.products) - len(self.days)
+        self.shift = np.concatenate([self.shift, np.full(grow, np.nan)])
+        self.days = np.concatenate([self.days, np.zeros(grow, dtype='int64')])
+        self.sums = np.concatenate([self.sums, np.zeros(grow)])
+        self.squares = np.concatenate([self.squares, np.zeros(grow)])
+        
+        product_slots = keys >> PACKED_KEY_BITS
+        first = slots >= known_days
+        old = self.day_totals[slots]
+        new = old + revenue
+        unset = np.isnan(self.shift[product_slots])
+        self.shift[product_slots[unset]] = new[unset]
+        shift = self.shift[product_slots]
+        np.add.at(self.days, product_slots, first.astype('int64'))
+        np.add.at(self.sums, product_slots, (new - shift) - np.where(first, 0.0, old - shift))
+        np.add.at(self.squares, product_slots, (new - shift) ** 2 - np.where(first, 0.0, (old - shift) ** 2))
+        self.day_totals[slots] = new
+        
+        late = slots[self.day_closed[slots]]
+        self.stats['late_rows'] += int(self.day_closed[slots][inverse.reshape(-1)].sum())
+        self.watermark = max(self.watermark, int(dates.max()))
+        closing = np.flatnonzero(~self.day_closed
+                                 & ((self.day_keys.to_numpy() & PACKED_KEY_MASK) < self.watermark - self.allowed_lateness))
+        self.day_closed[closing] = True
+        self.score(np.union1d(late, closing))
+        self.stats['batches'] += 1
+        self.stats['seconds'] += time.time() - start_time
+    
+    # End of stream: every open day is complete.
+    def flush(self):
+        closing = np.flatnonzero(~self.day_closed)
+        self.day_closed[closing] = True
+        self.score(closing)
+    
+    def score(self, slots):
+        if not len(slots):
+            return
+        keys = self.day_keys.to_numpy()[slots]
+        totals = self.day_totals[slots]
+        mean, std, days = self.product_stats(keys >> PACKED_KEY_BITS)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            z_scores = (totals - mean) / std
+        qualifies = (days >= self.min_days) & (std > 0) & (np.abs(z_scores) > self.z_threshold)
+        raised = qualifies & ~self.day_alerted[slots]
+        retracted = ~qualifies & self.day_alerted[slots]
+        self.day_alerted[slots] = qualifies
+        self.stats['alerts'] += int(raised.sum())
+        self.stats['retractions'] += int(retracted.sum())
+        METRICS.increment('revenue_alerts', int(raised.sum()))
+        changed = raised | retracted
+        if self.sink is not None and changed.any():
+            frame = self.alert_frame(keys[changed], totals[changed], mean[changed], std[changed],
+                                     z_scores[changed], days[changed])
+            frame.loc[retracted[changed], 'Revenue_Status'] = 'Retracted'
+            self.sink.write(frame)
+    
+    def product_stats(self, product_slots):
+        days = self.days[product_slots]
+        sums = self.sums[product_slots]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            variance = (self.squares[product_slots] - sums * sums / days) / (days - 1)
+            std = np.where(days > 1, np.sqrt(np.maximum(variance, 0.0)), np.nan).round(6)
+            return self.shift[product_slots] + sums / days, std, days
+    
+    def alert_frame(self, keys, totals, mean, std, z_scores, days):
+        return pd.DataFrame({
+            'Detected_At': datetime.now().isoformat(timespec='seconds'),
+            'Date': (keys & PACKED_KEY_MASK).astype('datetime64[D]').astype(str),
+            'Product_ID': self.products.to_numpy()[keys >> PACKED_KEY_BITS],
+            'Daily_Revenue': totals.round(2),
+            'Avg_Daily_Revenue': mean.round(2),
+            'Std_Dev_Revenue': std.round(2),
+            'Z_Score': z_scores.round(2),
+            'Revenue_Status': np.where(z_scores > 0, 'High Spike', 'Low Spike'),
+            'Days_Observed': days
+        })
+    
+    # Every (product, day) currently beyond the threshold, scored against the
+    # final statistics; with min_days=2 this is the result of Q19.
+    def outliers(self, min_days=None):
+        min_days = self.min_days if min_days is None else min_days
+        keys = self.day_keys.to_numpy()
+        mean, std, days = self.product_stats(keys >> PACKED_KEY_BITS)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            z_scores = (self.day_totals - mean) / std
+        flagged = (days >= min_days) & (std > 0) & (np.abs(z_scores) > self.z_threshold)
+        frame = self.alert_frame(keys[flagged], self.day_totals[flagged], mean[flagged], std[flagged],
+                                 z_scores[flagged], days[flagged]).drop(columns='Detected_At')
+        return frame.sort_values(['Date', 'Product_ID'], kind='stable').reset_index(drop=True)
+    
+    def save(self, path):
+        temp_path = f"{path}.tmp.npz"
+        np.savez(temp_path, watermark=self.watermark, products=self.products.to_numpy().astype(str),
+                 day_keys=self.day_keys.to_numpy(), day_totals=self.day_totals, day_closed=self.day_closed,
+                 day_alerted=self.day_alerted, shift=self.shift, days=self.days, sums=self.sums,
+                 squares=self.squares)
+        os.replace(temp_path, path)
+    
+    def load(self, path):
+        with np.load(path) as state:
+            self.watermark = int(state['watermark'])
+            self.products = pd.Index(state['products'].astype(object))
+            self.day_keys = pd.Index(state['day_keys'])
+            self.day_totals = state['day_totals']
+            self.day_closed = state['day_closed']
+            self.day_alerted = state['day_alerted']
+            self.shift = state['shift']
+            self.days = state['days']
+            self.sums = state['sums']
+            self.squares = state['squares']
@@ -0,0 +1,1152 @@
+import pandas as pd
+import numpy as np
+import threading
+import time
+import os
+import json
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
+from collections import OrderedDict
+
+from ETL_Metrics import METRICS
+from ETL_Transport import (AdaptiveBatcher, CUSTOMER_ATTRIBUTES, ENRICHED_COLUMNS, PRODUCT_ATTRIBUTES,
+                           SpillQueue, StreamTransport, open_stream_source, source_fingerprint)
+from ETL_Analytics import ProductAffinity, StreamingAggregates
+
+
+def smallest_code_dtype(cardinality):
+    for dtype in ('<u1', '<u2', '<u4'):
+        if cardinality <= np.iinfo(dtype).max + 1:
+            return dtype
+    return '<i8'
+
+
+def smallest_int_dtype(low, high):
+    for dtype in ('<i1', '<i2', '<i4'):
+        if np.iinfo(dtype).min <= low and high <= np.iinfo(dtype).max:
+            return dtype
+    return '<i8'
+
+
+# Record layout of a snapshot, built up from every chunk of the source before
+# any record is encoded: integer ranges (for the downcast), text key widths and
+# the distinct values of each dictionary-encoded column. Only those summaries
+# are kept, so the layout costs memory per distinct value, not per record.
+class SnapshotLayout:
+    def __init__(self, key, attributes):
+        self.key = key
+        self.columns = [key] + list(attributes)
+        self.kinds = {}
+        self.ranges = {}
+        self.source_dtypes = {}
+        self.key_width = 1
+        self.values = {column: set() for column in attributes}
+    
+    def normalize(self, frame):
+        frame = frame.drop_duplicates(self.key, keep='last')[self.columns]
+        if not pd.api.types.is_numeric_dtype(frame[self.key]):
+            frame = frame.assign(**{self.key: frame[self.key].astype(str)})
+        return frame
+    
+    def observe(self, frame):
+        for column in self.columns:
+            values = frame[column]
+            if pd.api.types.is_integer_dtype(values):
+                kind = 'int'
+            elif pd.api.types.is_float_dtype(values):
+                kind = 'float'
+            else:
+                kind = 'text'
+            if not len(values):
+                continue
+            self.kinds[column] = max(self.kinds.get(column, kind), kind, key=('int', 'float', 'text').index)
+            
+            if kind == 'int':
+                low, high = self.ranges.get(column, (values.min(), values.max()))
+                self.ranges[column] = (min(low, values.min()), max(high, values.max()))
+                known = self.source_dtypes.get(column, values.dtype)
+                self.source_dtypes[column] = np.result_type(known, values.dtype)
+            if column == self.key:
+                self.key_width = max(self.key_width, int(values.astype(str).str.encode('utf-8').str.len().max()))
+            else:
+                self.values[column].update(values.astype(str).unique())
+    
+    def finish(self):
+        self.fields = []
+        self.dictionaries = {}
+        for column in self.columns:
+            kind = self.kinds.get(column, 'text')
+            if kind == 'int':
+                self.fields.append((column, np.dtype(smallest_int_dtype(*self.ranges.get(column, (0, 0)))).str))
+            elif kind == 'float':
+                self.fields.append((column, '<f8'))
+            elif column == self.key:
+                self.fields.append((column, f'S{self.key_width}'))
+            else:
+                uniques = sorted(self.values[column])
+                self.fields.append((column, smallest_code_dtype(len(uniques))))
+                self.dictionaries[column] = pd.Index(uniques)
+        self.dtype = np.dtype(self.fields)
+        self.source_dtypes = {column: dtype for column, dtype in self.source_dtypes.items()
+                              if self.kinds[column] == 'int'}
+        self.values = None
+        return self
+    
+    # Encodes a normalised chunk and returns it sorted by key.
+    def encode(self, frame):
+        data = np.empty(len(frame), dtype=self.dtype)
+        for column, _ in self.fields:
+            values = frame[column]
+            if column in self.dictionaries:
+                data[column] = self.dictionaries[column].get_indexer(values.astype(str))
+            elif column == self.key and self.kinds.get(column, 'text') == 'text':
+                data[column] = values.astype(str).str.encode('utf-8').to_numpy()
+            else:
+                data[column] = values.to_numpy()
+        return data[np.argsort(data[self.key], kind='stable')]
+
+
+# k-way merge of key-sorted runs (each free of duplicate keys) into one sorted
+# file, a block per run at a time. Every record up to the smallest last key of
+# the current blocks is final, so it is written out; a key found in several
+# runs keeps the record from the latest run, as drop_duplicates(keep='last')
+# would over the whole source.
+def merge_sorted_runs(runs, key, path, block_size=65536):
+    cursors = [0] * len(runs)
+    written = 0
+    with open(path, 'wb') as out:
+        while True:
+            live = [i for i, run in enumerate(runs) if cursors[i] < len(run)]
+            if not live:
+                break
+            blocks = {i: runs[i][cursors[i]:cursors[i] + block_size] for i in live}
+            cutoff = min(block[key][-1] for block in blocks.values())
+            
+            parts = []
+            origins = []
+            for i, block in blocks.items():
+                take = int(np.searchsorted(block[key], cutoff, side='right'))
+                parts.append(np.array(block[:take]))
+                origins.append(np.full(take, i))
+                cursors[i] += take
+            merged = np.concatenate(parts)
+            merged = merged[np.lexsort((np.concatenate(origins), merged[key]))]
+            keys = merged[key]
+            last = np.r_[keys[1:] != keys[:-1], True]
+            merged[last].tofile(out)
+            written += int(last.sum())
+    return written
+
+
+# Key-sorted, page-partitioned master relation stored as fixed-width records in
+# a memory-mapped file. Only the first key of each partition (the fence keys) is
+# kept resident; records are read from disk one partition at a time.
+#
+# Text attributes are dictionary-encoded: the file holds small integer codes
+# and <name>.meta.json holds the code -> value arrays, so a record is a few
+# bytes wide. Integer columns are stored downcast; the meta file keeps their
+# source dtype so column() hands back the same dtypes tuple mode produces. The
+# meta file also records the source CSV's size and mtime; from_csv() reuses the
+# snapshot until the CSV changes.
+#
+# A snapshot is built as an external sort: one pass over the source chunks
+# fixes the SnapshotLayout, a second encodes each chunk as a sorted run file,
+# and the runs are merged into the snapshot. Building from a CSV therefore
+# holds one chunk (plus a block per run) in memory, never the whole file.
+#
+# Tuple mode reads whole partitions (read_partition); batch mode fetches the
+# matched records directly and counts each distinct partition it touches as
+# one partition read.
+class DiskRelation:
+    def __init__(self, name, df, key, attributes, partition_size, disk_dir, source=None, read_chunks=None):
+        self.name = name
+        self.key = key
+        self.attributes = list(attributes)
+        self.partition_size = partition_size
+        self.path = os.path.join(disk_dir, f"{name}.dat")
+        self.meta_path = os.path.join(disk_dir, f"{name}.meta.json")
+        
+        if df is not None:
+            read_chunks = lambda: [df]
+        if read_chunks is not None:
+            os.makedirs(disk_dir, exist_ok=True)
+            self.write_snapshot(read_chunks, source)
+        self.open_snapshot()
+        
+        self.stats = {
+            'partition_reads': 0,
+            'bytes_read': 0,
+            'partition_hits': 0
+        }
+    
+    @classmethod
+    def from_csv(cls, name, csv_path, key, attributes, partition_size, disk_dir, chunk_size=100000):
+        source = source_fingerprint(csv_path)
+        meta_path = os.path.join(disk_dir, f"{name}.meta.json")
+        if os.path.exists(meta_path) and os.path.exists(os.path.join(disk_dir, f"{name}.dat")):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            if (meta.get('source') == source and meta['key'] == key and meta['attributes'] == list(attributes)
+                    and 'source_dtypes' in meta):
+                return cls(name, None, key, attributes, partition_size, disk_dir)
+        
+        columns = [key] + list(attributes)
+        read_chunks = lambda: pd.read_csv(csv_path, usecols=columns, chunksize=chunk_size)
+        return cls(name, None, key, attributes, partition_size, disk_dir, source=source, read_chunks=read_chunks)
+    
+    # read_chunks() yields the source frames in order and is called twice:
+    # once for the layout, once to write the sorted runs.
+    def write_snapshot(self, read_chunks, source):
+        layout = SnapshotLayout(self.key, self.attributes)
+        for chunk in read_chunks():
+            layout.observe(layout.normalize(chunk))
+        layout.finish()
+        
+        # The meta file is written last so a crash mid-write leaves a snapshot
+        # from_csv() will not trust.
+        if os.path.exists(self.meta_path):
+            os.remove(self.meta_path)
+        run_paths = []
+        runs = []
+        try:
+            for chunk in read_chunks():
+                data = layout.encode(layout.normalize(chunk))
+                if not len(data):
+                    continue
+                run_path = f"{self.path}.run{len(run_paths)}"
+                data.tofile(run_path)
+                run_paths.append(run_path)
+                runs.append(np.memmap(run_path, dtype=layout.dtype, mode='r', shape=(len(data),)))
+            num_records = merge_sorted_runs(runs, self.key, self.path)
+        finally:
+            del runs
+            for run_path in run_paths:
+                os.remove(run_path)
+        
+        meta = {
+            'key': self.key,
+            'key_is_text': layout.kinds.get(self.key, 'text') == 'text',
+            'attributes': self.attributes,
+            'fields': layout.fields,
+            'num_records': num_records,
+            'dictionaries': {column: uniques.tolist() for column, uniques in layout.dictionaries.items()},
+            'source_dtypes': {column: dtype.str for column, dtype in layout.source_dtypes.items()},
+            'source': source
+        }
+        temp_path = self.meta_path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(meta, f)
+        os.replace(temp_path, self.meta_path)
+    
+    def open_snapshot(self):
+        with open(self.meta_path) as f:
+            meta = json.load(f)
+        
+        self.dtype = np.dtype([tuple(field) for field in meta['fields']])
+        self.dictionaries = {column: np.array(values, dtype=object)
+                             for column, values in meta['dictionaries'].items()}
+        self.source_dtypes = {column: np.dtype(dtype) for column, dtype in meta['source_dtypes'].items()}
+        self.text_fields = set(self.dictionaries)
+        if meta['key_is_text']:
+            self.text_fields.add(self.key)
+        self.num_records = meta['num_records']
+        
+        if self.num_records:
+            self.records = np.memmap(self.path, dtype=self.dtype, mode='r', shape=(self.num_records,))
+        else:
+            self.records = np.empty(0, dtype=self.dtype)
+        self.fence_keys = np.array(self.records[self.key][::self.partition_size])
+        self.num_partitions = len(self.fence_keys)
+        self.partition_bytes = self.partition_size * self.dtype.itemsize
+    
+    def encode_key(self, key):
+        if self.key in self.text_fields:
+            return str(key).encode('utf-8')
+        return key
+    
+    def partition_for(self, key):
+        page = int(np.searchsorted(self.fence_keys, self.encode_key(key), side='right')) - 1
+        return max(page, 0)
+    
+    def read_partition(self, page):
+        start = page * self.partition_size
+        chunk = np.array(self.records[start:start + self.partition_size])
+        self.stats['partition_reads'] += 1
+        self.stats['bytes_read'] += chunk.nbytes
+        
+        partition = {}
+        for row in chunk:
+            record = {}
+            for column in self.dtype.names:
+                value = row[column]
+                if column in self.dictionaries:
+                    record[column] = self.dictionaries[column][value]
+                elif column == self.key and column in self.text_fields:
+                    record[column] = value.decode('utf-8')
+                else:
+                    record[column] = value.item()
+            partition[record[self.key]] = record
+        return partition
+    
+    def lookup(self, keys):
+        keys = np.asarray(keys)
+        if self.key in self.text_fields:
+            keys = np.char.encode(keys.astype(str), 'utf-8')
+        if not self.num_records:
+            return np.full(len(keys), -1)
+        
+        sorted_keys = self.records[self.key]
+        positions = np.minimum(np.searchsorted(sorted_keys, keys), self.num_records - 1)
+        positions[sorted_keys[positions] != keys] = -1
+        return positions
+    
+    def fetch(self, positions):
+        rows = self.records[positions]
+        self.stats['partition_reads'] += len(np.unique(positions // self.partition_size))
+        self.stats['partition_hits'] += len(positions)
+        self.stats['bytes_read'] += rows.nbytes
+        return rows
+    
+    def column(self, rows, column):
+        if column in self.dictionaries:
+            return self.dictionaries[column][rows[column]]
+        if column in self.text_fields:
+            return np.char.decode(rows[column], 'utf-8')
+        if column in self.source_dtypes:
+            return rows[column].astype(self.source_dtypes[column])
+        return rows[column]
+    
+    def snapshot_bytes(self):
+        return self.dtype.itemsize * self.num_records
+    
+    def hit_rate(self):
+        if not self.stats['partition_reads']:
+            return 0.0
+        return self.stats['partition_hits'] / self.stats['partition_reads']
+
+
+class LRUEviction:
+    def __init__(self):
+        self.order = OrderedDict()
+    
+    def on_insert(self, key):
+        self.order[key] = None
+    
+    def on_access(self, key):
+        self.order.move_to_end(key)
+    
+    def on_remove(self, key):
+        self.order.pop(key, None)
+    
+    def victim(self):
+        return next(iter(self.order))
+
+
+class LFUEviction:
+    def __init__(self):
+        self.frequency = {}
+        self.buckets = {}
+        self.min_frequency = 0
+    
+    def on_insert(self, key):
+        self.frequency[key] = 1
+        self.buckets.setdefault(1, OrderedDict())[key] = None
+        self.min_frequency = 1
+    
+    def on_access(self, key):
+        count = self.frequency[key]
+        bucket = self.buckets[count]
+        del bucket[key]
+        if not bucket:
+            del self.buckets[count]
+            if self.min_frequency == count:
+                self.min_frequency = count + 1
+        self.frequency[key] = count + 1
+        self.buckets.setdefault(count + 1, OrderedDict())[key] = None
+    
+    def on_remove(self, key):
+        count = self.frequency.pop(key, None)
+        if count is None:
+            return
+        bucket = self.buckets[count]
+        del bucket[key]
+        if not bucket:
+            del self.buckets[count]
+            if self.buckets and self.min_frequency == count:
+                self.min_frequency = min(self.buckets)
+    
+    def victim(self):
+        return next(iter(self.buckets[self.min_frequency]))
+
+
+# HYBRIDJOIN queue-age policy: entries leave in the order they were loaded,
+# regardless of how often they are probed.
+class QueueAgeEviction(LRUEviction):
+    def on_access(self, key):
+        pass
+
+
+EVICTION_POLICIES = {
+    'lru': LRUEviction,
+    'lfu': LFUEviction,
+    'queue_age': QueueAgeEviction
+}
+
+
+# Bounded multi-map keyed by the full (Customer_ID, Product_ID) join key.
+# Colliding keys are chained inside their bucket and compared exactly, so a
+# shared bucket is never mistaken for a match.
+class JoinHashTable:
+    def __init__(self, capacity, eviction_policy='queue_age'):
+        if eviction_policy not in EVICTION_POLICIES:
+            raise ValueError(f"Unknown eviction_policy '{eviction_policy}' "
+                             f"(expected one of {', '.join(EVICTION_POLICIES)})")
+        
+        self.capacity = capacity
+        self.eviction_policy = eviction_policy
+        self.policy = EVICTION_POLICIES[eviction_policy]()
+        self.buckets = [None] * capacity
+        self.size = 0
+        
+        self.stats = {
+            'lookups': 0,
+            'probes': 0,
+            'hits': 0,
+            'inserts': 0,
+            'evictions': 0,
+            'collisions': 0
+        }
+    
+    def __len__(self):
+        return self.size
+    
+    def __contains__(self, key):
+        return self.find(key) is not None
+    
+    def bucket_for(self, key):
+        return hash(key) % self.capacity
+    
+    def find(self, key):
+        chain = self.buckets[self.bucket_for(key)]
+        if chain:
+            for entry in chain:
+                if entry[0] == key:
+                    return entry
+        return None
+    
+    def get(self, key):
+        self.stats['lookups'] += 1
+        chain = self.buckets[self.bucket_for(key)]
+        if chain:
+            for entry in chain:
+                self.stats['probes'] += 1
+                if entry[0] == key:
+                    self.stats['hits'] += 1
+                    self.policy.on_access(key)
+                    return entry[1]
+        return None
+    
+    def put(self, key, value):
+        bucket = self.bucket_for(key)
+        chain = self.buckets[bucket]
+        if chain:
+            for entry in chain:
+                if entry[0] == key:
+                    entry[1] = value
+                    self.policy.on_access(key)
+                    return
+        
+        if self.size >= self.capacity:
+            self.remove(self.policy.victim())
+            self.stats['evictions'] += 1
+            chain = self.buckets[bucket]
+        
+        if chain is None:
+            chain = self.buckets[bucket] = []
+        elif chain:
+            self.stats['collisions'] += 1
+        chain.append([key, value])
+        self.size += 1
+        self.stats['inserts'] += 1
+        self.policy.on_insert(key)
+    
+    def remove(self, key):
+        bucket = self.bucket_for(key)
+        chain = self.buckets[bucket]
+        for index, entry in enumerate(chain or []):
+            if entry[0] == key:
+                del chain[index]
+                if not chain:
+                    self.buckets[bucket] = None
+                self.size -= 1
+                self.policy.on_remove(key)
+                return True
+        return False
+    
+    def load_factor(self):
+        return self.size / self.capacity
+    
+    def occupied_buckets(self):
+        return sum(1 for chain in self.buckets if chain)
+    
+    def probes_per_lookup(self):
+        if not self.stats['lookups']:
+            return 0.0
+        return self.stats['probes'] / self.stats['lookups']
+
+
+# join_mode='tuple' runs HYBRIDJOIN proper: unmatched tuples wait in the
+# bounded processing queue (overflow spills to disk) and the oldest one picks
+# the master partition read next. join_mode='batch' resolves each stream batch
+# with vectorised lookups into the memory-mapped relations instead; it keeps
+# no queue and never spills, and its memory is bounded by the batch size and
+# hash_slots resolved keys (plus the OS page cache for the snapshots), not by
+# queue_size. Both modes report the same counters.
+class HybridJoinThreaded:
+    def __init__(self, hash_slots=10000, queue_size=5000, disk_partition_size=500,
+                 join_mode='tuple', batch_size=1000, disk_dir='disk_buffer', eviction_policy='queue_age',
+                 maintain_aggregates=False, maintain_affinity=False, trace_tuples=False, metrics=None,
+                 min_batch_size=None, max_batch_size=None, spill_threshold=None, anomaly_detector=None,
+                 stage=None):
+        if join_mode not in ('tuple', 'batch'):
+            raise ValueError(f"Unknown join_mode '{join_mode}' (expected 'tuple' or 'batch')")
+        
+        self.hash_slots = hash_slots
+        self.queue_size = queue_size
+        self.disk_partition_size = disk_partition_size
+        self.join_mode = join_mode
+        self.batch_size = batch_size
+        self.min_batch_size = min_batch_size or max(1, batch_size // 8)
+        self.max_batch_size = max_batch_size or batch_size * 4
+        self.disk_dir = disk_dir
+        self.trace_tuples = trace_tuples
+        self.metrics = metrics if metrics is not None else METRICS
+        
+        self.hash_table = JoinHashTable(hash_slots, eviction_policy)
+        self.resolved_keys = np.empty(0, dtype='int64')
+        self.processing_queue = OrderedDict()
+        self.spill = SpillQueue(os.path.join(disk_dir, 'spill'))
+        self.spill_threshold = spill_threshold or max(1, queue_size // 10)
+        self.spilled_since_load = 0
+        self.waiting_customers = {}
+        self.waiting_products = {}
+        self.next_sequence = 0
+        self.result = []
+        
+        self.result_batches = []
+        self.output = None
+        self.thread_error = None
+        self.aggregates = StreamingAggregates() if maintain_aggregates else None
+        self.affinity = ProductAffinity() if maintain_affinity else None
+        self.anomalies = anomaly_detector
+        self.stage = stage
+        
+        self.stream_buffer = StreamTransport(capacity=max(2, 10000 // batch_size))
+        self.producer_stats = {'records': 0, 'batches': 0, 'resizes': 0, 'batch_size': batch_size}
+        self.consumer_stats = {'records': 0, 'batches': 0}
+        
+        self.stats = {
+            'processed': 0,
+            'joined': 0,
+            'dropped': 0,
+            'hash_hits': 0,
+            'queue_hits': 0,
+            'snapshot_lookups': 0
+        }
+    
+    def collect_metrics(self):
+        gauges = {f"join_{name}": value for name, value in self.stats.items()}
+        gauges.update({f"producer_{name}": value for name, value in self.producer_stats.items()})
+        gauges.update({f"consumer_{name}": value for name, value in self.consumer_stats.items()})
+        gauges.update({f"stream_buffer_{name}": round(value, 6) for name, value in self.stream_buffer.stats.items()})
+        gauges.update({f"spill_{name}": value for name, value in self.spill.stats.items()})
+        gauges.update({
+            'stream_buffer_depth': len(self.stream_buffer),
+            'stream_buffer_peak': self.stream_buffer.peak,
+            'processing_queue_depth': len(self.processing_queue),
+            'spill_backlog': len(self.spill),
+            'pending_backlog': len(self.processing_queue) + len(self.spill),
+            'hash_table_entries': len(self.hash_table),
+            'hash_table_load_factor': round(self.hash_table.load_factor(), 4),
+            'hash_table_probes_per_lookup': round(self.hash_table.probes_per_lookup(), 4),
+            'hash_table_evictions': self.hash_table.stats['evictions'],
+        })
+        for relation in (getattr(self, 'customer_disk', None), getattr(self, 'product_disk', None)):
+            if relation is not None:
+                gauges[f"{relation.name}_partition_reads"] = relation.stats['partition_reads']
+                gauges[f"{relation.name}_bytes_read"] = relation.stats['bytes_read']
+        return gauges
+    
+    def load_master_data_to_disk(self, customer_df, product_df):
+        print("Loading Master Data to Disk Buffer...")
+        
+        # Master data may be given as DataFrames or as CSV paths; paths reuse
+        # the memory-mapped snapshot in disk_dir while the CSV is unchanged.
+        relations = []
+        for name, source, key, attributes in (('customer_master', customer_df, 'Customer_ID', CUSTOMER_ATTRIBUTES),
+                                              ('product_master', product_df, 'Product_ID', PRODUCT_ATTRIBUTES)):
+            if isinstance(source, str):
+                relation = DiskRelation.from_csv(name, source, key, attributes, self.disk_partition_size, self.disk_dir)
+            else:
+                relation = DiskRelation(name, source, key, attributes, self.disk_partition_size, self.disk_dir)
+            relations.append(relation)
+        self.customer_disk, self.product_disk = relations
+        
+        print(f"Loaded {self.customer_disk.num_records} customers and {self.product_disk.num_records} products")
+        print(f"   Snapshot: {self.customer_disk.snapshot_bytes()/1024:,.1f} KB customer / "
+              f"{self.product_disk.snapshot_bytes()/1024:,.1f} KB product "
+              f"({self.customer_disk.dtype.itemsize} / {self.product_disk.dtype.itemsize} bytes per record)")
+        print(f"   Partitions: {self.customer_disk.num_partitions:,} customer / "
+              f"{self.product_disk.num_partitions:,} product "
+              f"({self.disk_partition_size:,} records per partition)")
+        return self
+    
+    def join_key(self, customer_id, product_id):
+        return (customer_id, product_id)
+    
+    # A failure in either thread is kept in thread_error and re-raised by
+    # execute_join_threaded once both threads have stopped.
+    def producer_thread(self, source):
+        print("\nTHREAD 1 (PRODUCER): Started - Feeding stream buffer...")
+        
+        batcher = AdaptiveBatcher(self.stream_buffer, self.batch_size, self.min_batch_size, self.max_batch_size)
+        try:
+            for chunk_number, chunk in enumerate(source.chunks()):
+                if self.stream_buffer.cancelled or (self.output is not None and self.output.cancelled):
+                    break
+                with self.metrics.timer('producer_enqueue'):
+                    batcher.add(chunk)
+                self.producer_stats.update(batcher.stats, batch_size=batcher.target)
+                
+                if chunk_number % 50 == 0:
+                    print(f"   Producer: Fed {batcher.stats['records']:,} records into stream buffer "
+                          f"(batch size {batcher.target:,})")
+            batcher.flush()
+        except Exception as e:
+            self.thread_error = self.thread_error or e
+            return
+        finally:
+            self.stream_buffer.close()
+        
+        self.producer_stats.update(batcher.stats, batch_size=batcher.target)
+        self.metrics.increment('records_fed', batcher.stats['records'])
+        print("\nTHREAD 1 (PRODUCER): Finished - All data fed into stream buffer")
+    
+    # A failed consumer cancels the stream buffer so the producer is never
+    # left blocked on a full transport.
+    def consumer_thread(self):
+        try:
+            self.consume()
+        except Exception as e:
+            self.thread_error = e
+            self.stream_buffer.cancel()
+        finally:
+            self.spill.close()
+    
+    def consume(self):
+        print("\nTHREAD 2 (CONSUMER): Started - Running HYBRIDJOIN algorithm...")
+        
+        processed_count = 0
+        
+        while True:
+            batch = self.stream_buffer.get()
+            if batch is None:
+                break
+            self.consumer_stats['batches'] += 1
+            
+            if self.join_mode == 'batch':
+                self.process_stream_batch(batch)
+                processed_count += len(batch)
+                self.consumer_stats['records'] = processed_count
+                continue
+            
+            with self.metrics.timer('tuple_batch'):
+                for stream_tuple in batch.to_dict('records'):
+                    self.process_stream_tuple(stream_tuple)
+                    processed_count += 1
+                    
+                    if processed_count % 1000 == 0 or self.spilled_since_load >= self.spill_threshold:
+                        self.load_disk_partition()
+                        self.flush_results()
+                        
+                        if processed_count % 10000 == 0:
+                            print(f"   Consumer: Processed {processed_count:,} | "
+                                  f"Joined: {self.stats['joined']:,} | "
+                                  f"Hash: {len(self.hash_table):,} slots | "
+                                  f"Queue: {len(self.processing_queue):,} | "
+                                  f"Spilled: {len(self.spill):,}")
+            self.consumer_stats['records'] = processed_count
+        
+        while self.processing_queue or len(self.spill):
+            self.load_disk_partition()
+        self.flush_results()
+        
+        print("\nTHREAD 2 (CONSUMER): Finished - HYBRIDJOIN complete")
+    
+    def process_stream_tuple(self, stream_tuple, from_spill=False):
+        customer_id = stream_tuple['Customer_ID']
+        product_id = stream_tuple['Product_ID']
+        join_key = self.join_key(customer_id, product_id)
+        if self.trace_tuples:
+            print(customer_id, product_id, self.hash_table.bucket_for(join_key))
+        with self.metrics.sampled_timer('hash_probe'):
+            master_record = self.hash_table.get(join_key)
+        if master_record is not None:
+            joined_record = self.perform_join(stream_tuple, master_record)
+            if joined_record:
+                self.result.append(joined_record)
+                self.stats['joined'] += 1
+                self.stats['hash_hits'] += 1
+        else:
+            self.enqueue_pending(stream_tuple, from_spill)
+    
+    def enqueue_pending(self, stream_tuple, from_spill=False):
+        # The in-memory queue is bounded by queue_size; overflow goes to the
+        # spill segments, and once anything is spilled later tuples follow it
+        # so they are read back in arrival order.
+        if not from_spill and (len(self.processing_queue) >= self.queue_size or len(self.spill)):
+            with self.metrics.sampled_timer('spill'):
+                self.spill.append(stream_tuple)
+            self.spilled_since_load += 1
+            return
+        
+        sequence = self.next_sequence
+        self.next_sequence += 1
+        
+        self.processing_queue[sequence] = {'tuple': stream_tuple, 'customer': None, 'product': None}
+        self.waiting_customers.setdefault(stream_tuple['Customer_ID'], []).append(sequence)
+        self.waiting_products.setdefault(stream_tuple['Product_ID'], []).append(sequence)
+    
+    def process_stream_batch(self, batch):
+        with self.metrics.timer('join'):
+            joined = self.join_batch(batch)
+        self.emit(joined)
+    
+    # Joined output goes to self.output when a pipeline is attached (so memory
+    # stays bounded by the channel), is written to self.stage when one is
+    # attached, and is collected in result_batches otherwise.
+    def emit(self, joined):
+        if self.aggregates is not None:
+            self.aggregates.update(joined)
+        if self.affinity is not None:
+            self.affinity.update(joined)
+        if self.anomalies is not None:
+            self.anomalies.update(joined)
+        if self.stage is not None:
+            self.stage.append(joined)
+        if self.output is not None:
+            self.output.put(joined)
+        elif self.stage is None:
+            self.result_batches.append(joined)
+    
+    def flush_results(self):
+        if not self.result:
+            return
+        joined = pd.DataFrame(self.result, columns=ENRICHED_COLUMNS)
+        self.result = []
+        self.emit(joined)
+    
+    def join_batch(self, batch, count_processed=False):
+        customer_pos = self.customer_disk.lookup(batch['Customer_ID'].to_numpy())
+        product_pos = self.product_disk.lookup(batch['Product_ID'].to_numpy())
+        matched = (customer_pos >= 0) & (product_pos >= 0)
+        
+        stream = batch[matched]
+        customers = self.customer_disk.fetch(customer_pos[matched])
+        products = self.product_disk.fetch(product_pos[matched])
+        customer_col = lambda column: self.customer_disk.column(customers, column)
+        product_col = lambda column: self.product_disk.column(products, column)
+        
+        joined = pd.DataFrame({
+            'orderID': stream['orderID'].to_numpy(),
+            'Customer_ID': stream['Customer_ID'].to_numpy(),
+            'Product_ID': stream['Product_ID'].to_numpy(),
+            'quantity': stream['quantity'].to_numpy(),
+            'date': stream['date'].to_numpy(),
+            
+            'Gender': customer_col('Gender'),
+            'Age': customer_col('Age'),
+            'Occupation': customer_col('Occupation'),
+            'City_Category': customer_col('City_Category'),
+            'Stay_In_Current_City_Years': customer_col('Stay_In_Current_City_Years'),
+            'Marital_Status': customer_col('Marital_Status'),
+            
+            'Product_Category': product_col('Product_Category'),
+            'price': product_col('price$'),
+            'storeID': product_col('storeID'),
+            'supplierID': product_col('supplierID'),
+            'storeName': product_col('storeName'),
+            'supplierName': product_col('supplierName'),
+        })
+        joined['Total_Revenue'] = joined['quantity'] * joined['price']
+        joined.attrs = dict(batch.attrs)
+        
+        # Batch lookups go straight to the snapshots, but hash/queue hits are
+        # counted as tuple mode counts them: a join key among the last
+        # hash_slots distinct keys resolved (what the queue-age hash table
+        # would still hold) is a hash hit, any other joined row a queue hit.
+        join_keys = customer_pos[matched] * max(self.product_disk.num_records, 1) + product_pos[matched]
+        unique_keys, first = np.unique(join_keys, return_index=True)
+        new_keys = join_keys[np.sort(first[~np.isin(unique_keys, self.resolved_keys)])]
+        self.resolved_keys = np.concatenate([self.resolved_keys, new_keys])[-self.hash_slots:]
+        
+        if count_processed:
+            self.stats['processed'] += len(batch)
+        self.stats['joined'] += len(joined)
+        self.stats['dropped'] += int((~matched).sum())
+        self.stats['hash_hits'] += len(joined) - len(new_keys)
+        self.stats['queue_hits'] += len(new_keys)
+        self.stats['snapshot_lookups'] += len(batch)
+        
+        return joined
+    
+    def refill_from_spill(self):
+        while len(self.spill) and len(self.processing_queue) < self.queue_size:
+            with self.metrics.sampled_timer('unspill'):
+                stream_tuple = self.spill.popleft()
+            # Partitions loaded since the tuple spilled may have cached its key.
+            self.process_stream_tuple(stream_tuple, from_spill=True)
+    
+    def load_disk_partition(self):
+        if not self.processing_queue:
+            self.refill_from_spill()
+            if not self.processing_queue:
+                return
+        
+        # HYBRIDJOIN: the oldest tuple in the queue picks which partition of
+        # each master relation is read from disk on this iteration.
+        with self.metrics.timer('partition_load'):
+            oldest_sequence, oldest = next(iter(self.processing_queue.items()))
+            if oldest['customer'] is None:
+                self.probe_partition(self.customer_disk, self.waiting_customers, 'customer',
+                                     oldest['tuple']['Customer_ID'])
+            if oldest['product'] is None and oldest_sequence in self.processing_queue:
+                self.probe_partition(self.product_disk, self.waiting_products, 'product',
+                                     oldest['tuple']['Product_ID'])
+        self.spilled_since_load = 0
+        self.refill_from_spill()
+    
+    def probe_partition(self, relation, waiting, side, oldest_key):
+        partition = relation.read_partition(relation.partition_for(oldest_key))
+        
+        hits = 0
+        for key, record in partition.items():
+            sequences = waiting.pop(key, None)
+            if not sequences:
+                continue
+            for sequence in sequences:
+                entry = self.processing_queue[sequence]
+                entry[side] = record
+                hits += 1
+                if entry['customer'] is not None and entry['product'] is not None:
+                    self.complete_pending(sequence)
+        relation.stats['partition_hits'] += hits
+        
+        if oldest_key not in partition:
+            for sequence in waiting.pop(oldest_key, []):
+                self.drop_pending(sequence)
+    
+    def complete_pending(self, sequence):
+        entry = self.processing_queue.pop(sequence)
+        stream_tuple = entry['tuple']
+        
+        master_record = {**entry['customer'], **entry['product']}
+        self.hash_table.put(self.join_key(stream_tuple['Customer_ID'], stream_tuple['Product_ID']), master_record)
+        
+        joined_record = self.perform_join(stream_tuple, master_record)
+        if joined_record:
+            self.result.append(joined_record)
+            self.stats['joined'] += 1
+            self.stats['queue_hits'] += 1
+    
+    def drop_pending(self, sequence):
+        entry = self.processing_queue.pop(sequence)
+        stream_tuple = entry['tuple']
+        
+        for waiting, key in ((self.waiting_customers, stream_tuple['Customer_ID']),
+                             (self.waiting_products, stream_tuple['Product_ID'])):
+            sequences = waiting.get(key)
+            if sequences and sequence in sequences:
+                sequences.remove(sequence)
+                if not sequences:
+                    del waiting[key]
+        
+        self.stats['dropped'] += 1
+    
+    def perform_join(self, stream_tuple, master_record):
+        with self.metrics.sampled_timer('join'):
+            return self.join_tuple(stream_tuple, master_record)
+    
+    def join_tuple(self, stream_tuple, master_record):
+        try:
+            quantity = stream_tuple['quantity']
+            price = master_record.get('price$', 0)
+            total_revenue = quantity * price
+            
+            joined = {
+                'orderID': stream_tuple['orderID'],
+                'Customer_ID': stream_tuple['Customer_ID'],
+                'Product_ID': stream_tuple['Product_ID'],
+                'quantity': quantity,
+                'date': stream_tuple['date'],
+                
+                'Gender': master_record.get('Gender', 'Unknown'),
+                'Age': master_record.get('Age', 'Unknown'),
+                'Occupation': master_record.get('Occupation', 0),
+                'City_Category': master_record.get('City_Category', 'Unknown'),
+                'Stay_In_Current_City_Years': master_record.get('Stay_In_Current_City_Years', 0),
+                'Marital_Status': master_record.get('Marital_Status', 0),
+                
+                'Product_Category': master_record.get('Product_Category', 'Unknown'),
+                'price': price,
+                'storeID': master_record.get('storeID', 0),
+                'supplierID': master_record.get('supplierID', 0),
+                'storeName': master_record.get('storeName', 'Unknown'),
+                'supplierName': master_record.get('supplierName', 'Unknown'),
+                
+                'Total_Revenue': total_revenue
+            }
+            if self.trace_tuples:
+                print(joined)
+            return joined
+        except Exception as e:
+            print(f"Join error: {e}")
+            return None
+    
+    def execute_join_threaded(self, transactional_df):
+        source = open_stream_source(transactional_df, self.batch_size)
+        
+        print("\n" + "="*80)
+        print("EXECUTING MULTI-THREADED HYBRIDJOIN ALGORITHM")
+        print("="*80)
+        print(f"\nStream Input: {source.describe()}")
+        print(f"Disk Buffer: {self.customer_disk.num_records:,} customers × {self.product_disk.num_records:,} products")
+        print(f"Configuration:")
+        print(f"   • Hash Table Size: {self.hash_slots:,} slots ({self.hash_table.eviction_policy} eviction)")
+        print(f"   • Queue Capacity: {self.queue_size:,} tuples")
+        print(f"   • Stream Transport: {self.stream_buffer.capacity:,} batches in flight "
+              f"(adaptive batch size {self.min_batch_size:,}-{self.max_batch_size:,})")
+        print(f"   • Disk Partition Size: {self.disk_partition_size:,} tuples/load")
+        if self.join_mode == 'batch':
+            print(f"   • Join Mode: batch ({self.batch_size:,} tuples/batch, vectorised lookups, no partition queue)")
+        else:
+            print(f"   • Join Mode: tuple ({self.batch_size:,} tuples/batch)")
+        print("\n" + "─"*80)
+        
+        self.metrics.register_collector('join', self.collect_metrics)
+        
+        producer = threading.Thread(
+            target=self.producer_thread,
+            args=(source,),
+            name="ProducerThread"
+        )
+        
+        consumer = threading.Thread(
+            target=self.consumer_thread,
+            name="ConsumerThread"
+        )
+        
+        start_time = time.time()
+        
+        producer.start()
+        consumer.start()
+        
+        producer.join()
+        consumer.join()
+        if self.thread_error is not None:
+            raise self.thread_error
+        if self.stage is not None:
+            self.stage.close()
+        if self.anomalies is not None:
+            self.anomalies.flush()
+        
+        elapsed_time = time.time() - start_time
+        self.stats['processed'] += self.producer_stats['records']
+        
+        print("\n" + "─"*80)
+        print(f"\nMULTI-THREADED HYBRIDJOIN COMPLETE!")
+        print(f"\nFinal Statistics:")
+        processed = max(self.stats['processed'], 1)
+        print(f"   • Total Records Processed: {self.stats['processed']:,}")
+        print(f"   • Successfully Joined: {self.stats['joined']:,} ({(self.stats['joined']/processed*100):.2f}%)")
+        print(f"   • Dropped (No Match): {self.stats['dropped']:,} ({(self.stats['dropped']/processed*100):.2f}%)")
+        print(f"   • Hash Table Hits: {self.stats['hash_hits']:,}")
+        print(f"   • Queue Processing Hits: {self.stats['queue_hits']:,}")
+        if self.join_mode == 'batch':
+            print(f"   • Snapshot Lookups: {self.stats['snapshot_lookups']:,} (batch mode: hits counted as tuple mode would)")
+        transport = self.stream_buffer.stats
+        print(f"   • Stream Transport: {self.producer_stats['batches']:,} batches "
+              f"(final batch size {self.producer_stats['batch_size']:,}, {self.producer_stats['resizes']:,} resizes, "
+              f"peak depth {self.stream_buffer.peak:,}) | "
+              f"producer blocked {transport['producer_wait_seconds']:.2f}s, "
+              f"consumer idle {transport['consumer_wait_seconds']:.2f}s")
+        unaccounted = (self.stats['processed'] - self.stats['joined'] - self.stats['dropped']
+                       - len(self.processing_queue) - len(self.spill))
+        print(f"   • Overflow Spill: {self.spill.stats['spilled']:,} tuples "
+              f"({self.spill.stats['spill_bytes']/1024:,.1f} KB, {self.spill.stats['segments']:,} segments, "
+              f"peak backlog {self.spill.stats['peak_backlog']:,}) | Unaccounted: {unaccounted:,}")
+        if self.join_mode == 'tuple':
+            print(f"   • Hash Table Utilization: {len(self.hash_table):,} / {self.hash_slots:,} entries "
+                  f"(load factor {self.hash_table.load_factor():.2f}, "
+                  f"{self.hash_table.occupied_buckets():,} buckets occupied)")
+            print(f"   • Hash Table Probes: {self.hash_table.probes_per_lookup():.2f} per lookup "
+                  f"({self.hash_table.stats['lookups']:,} lookups, {self.hash_table.stats['collisions']:,} chained collisions)")
+            print(f"   • Hash Table Evictions: {self.hash_table.stats['evictions']:,} ({self.hash_table.eviction_policy})")
+        else:
+            print("   • Hash Table: not probed in batch mode (re-run with --join-mode=tuple for its "
+                  "utilization, probe and eviction statistics)")
+        if self.anomalies is not None:
+            print(f"   • Revenue Alerts: {self.anomalies.stats['alerts']:,} raised, "
+                  f"{self.anomalies.stats['retractions']:,} retracted (|z| > {self.anomalies.z_threshold}, "
+                  f"{len(self.anomalies.day_keys):,} product-days tracked, "
+                  f"{self.anomalies.stats['late_rows']:,} late rows, {self.anomalies.stats['seconds']:.2f}s)")
+        if self.stage is not None:
+            print(f"   • Enriched Stage: {len(self.stage):,} rows in {self.stage.stats['partitions']:,} "
+                  f"{self.stage.partition_by} partitions ({self.stage.stats['bytes']/1024/1024:,.1f} MB Parquet, "
+                  f"{self.stage.stats['seconds']:.2f}s) -> {self.stage.directory}/")
+        for relation in (self.customer_disk, self.product_disk):
+            print(f"   • {relation.name}: {relation.stats['partition_reads']:,} partition reads, "
+                  f"{relation.stats['bytes_read']/1024:,.1f} KB read, "
+                  f"{relation.hit_rate():.2f} hits/partition")
+        print(f"   • Execution Time: {elapsed_time:.2f} seconds")
+        print(f"   • Throughput: {(self.stats['processed']/elapsed_time):,.0f} records/second")
+        print("="*80)
+        
+        if not self.result_batches:
+            return pd.DataFrame(columns=ENRICHED_COLUMNS)
+        return pd.concat(self.result_batches, ignore_index=True)
+
+
+def shard_assignments(keys, num_workers):
+    # Stable across processes, unlike hash() on str which is salted per interpreter.
+    return (pd.util.hash_pandas_object(keys, index=False).to_numpy() % num_workers).astype(int)
+
+
+def run_join_shard(shard_id, customer_df, product_df, transactional_df, join_config):
+    config = dict(join_config)
+    config['disk_dir'] = os.path.join(config.get('disk_dir', 'disk_buffer'), f"shard_{shard_id}")
+    
+    hybrid_join = HybridJoinThreaded(**config)
+    start_time = time.time()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        hybrid_join.load_master_data_to_disk(customer_df, product_df)
+        enriched = hybrid_join.execute_join_threaded(transactional_df)
+    
+    report = {
+        'shard': shard_id,
+        'stats': dict(hybrid_join.stats),
+        'hash_table': dict(hybrid_join.hash_table.stats),
+        'elapsed': time.time() - start_time
+    }
+    return enriched, report, hybrid_join.aggregates, hybrid_join.affinity
+
+
+# Each shard keeps its own summary-table and affinity state, folded into
+# aggregates/affinity when they are passed. Customer_ID shards hold disjoint
+# customers, so their pair counts add; Product_ID shards split a customer's
+# basket, so affinity is then built once from the merged output. The anomaly
+# detector and stage stay with the caller.
+def execute_join_parallel(customer_df, product_df, transactional_df, num_workers=None,
+                          shard_by='Customer_ID', verbose=True, aggregates=None, affinity=None, **join_config):
+    if shard_by not in ('Customer_ID', 'Product_ID'):
+        raise ValueError(f"Unknown shard_by '{shard_by}' (expected 'Customer_ID' or 'Product_ID')")
+    num_workers = num_workers or os.cpu_count() or 1
+    
+    if verbose:
+        print("\n" + "="*80)
+        print("EXECUTING SHARDED MULTI-PROCESS HYBRIDJOIN")
+        print("="*80)
+        print(f"\nStream Input: {len(transactional_df):,} transactional records")
+        print(f"Workers: {num_workers} processes, sharded by {shard_by}")
+    
+    master_df = customer_df if shard_by == 'Customer_ID' else product_df
+    stream_shards = shard_assignments(transactional_df[shard_by], num_workers)
+    master_shards = shard_assignments(master_df[shard_by], num_workers)
+    
+    shard_config = dict(join_config, anomaly_detector=None, stage=None,
+                        maintain_aggregates=aggregates is not None,
+                        maintain_affinity=affinity is not None and shard_by == 'Customer_ID')
+    
+    start_time = time.time()
+    futures = []
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        for shard_id in range(num_workers):
+            shard_stream = transactional_df[stream_shards == shard_id]
+            if shard_stream.empty:
+                continue
+            shard_master = master_df[master_shards == shard_id]
+            if shard_by == 'Customer_ID':
+                args = (shard_master, product_df)
+            else:
+                args = (customer_df, shard_master)
+            futures.append(executor.submit(run_join_shard, shard_id, *args, shard_stream, shard_config))
+        results = [future.result() for future in futures]
+    elapsed_time = time.time() - start_time
+    
+    stats = {}
+    reports = []
+    for _, report, shard_aggregates, shard_affinity in results:
+        reports.append(report)
+        for counter, value in report['stats'].items():
+            stats[counter] = stats.get(counter, 0) + value
+        if aggregates is not None:
+            aggregates.absorb(shard_aggregates)
+        if shard_affinity is not None:
+            affinity.absorb(shard_affinity)
+    
+    frames = [enriched for enriched, _, _, _ in results if not enriched.empty]
+    if frames:
+        enriched_data = pd.concat(frames, ignore_index=True)
+    else:
+        enriched_data = pd.DataFrame(columns=ENRICHED_COLUMNS)
+    if affinity is not None and shard_by == 'Product_ID':
+        affinity.update(enriched_data)
+    
+    if verbose:
+        print("\n" + "─"*80)
+        for report in reports:
+            print(f"   Shard {report['shard']:>2}: {report['stats']['processed']:>10,} processed | "
+                  f"Joined: {report['stats']['joined']:,} | "
+                  f"Dropped: {report['stats']['dropped']:,} | "
+                  f"{report['elapsed']:.2f}s")
+        print(f"\nFinal Statistics:")
+        print(f"   • Total Records Processed: {stats.get('processed', 0):,}")
+        print(f"   • Successfully Joined: {stats.get('joined', 0):,}")
+        print(f"   • Dropped (No Match): {stats.get('dropped', 0):,}")
+        print(f"   • Hash Table Hits: {stats.get('hash_hits', 0):,}")
+        print(f"   • Queue Processing Hits: {stats.get('queue_hits', 0):,}")
+        if join_config.get('join_mode') == 'batch':
+            print(f"   • Snapshot Lookups: {stats.get('snapshot_lookups', 0):,} (batch mode: hits counted as tuple mode would)")
+        print(f"   • Execution Time: {elapsed_time:.2f} seconds")
+        print(f"   • Throughput: {(stats.get('processed', 0)/elapsed_time):,.0f} records/second")
+        print("="*80)
+    
+    return enriched_data, stats, elapsed_time
+
+
+def measure_parallel_scaling(customer_df, product_df, transactional_df, max_workers=None,
+                             shard_by='Customer_ID', **join_config):
+    max_workers = max_workers or os.cpu_count() or 1
+    
+    print("\n" + "="*80)
+    print("PARALLEL HYBRIDJOIN SCALING")
+    print("="*80)
+    print(f"\n{'Workers':>8} {'Seconds':>10} {'Records/s':>14} {'Speedup':>9}")
+    
+    scaling = []
+    for num_workers in range(1, max_workers + 1):
+        _, stats, elapsed_time = execute_join_parallel(customer_df, product_df, transactional_df,
+                                                       num_workers=num_workers, shard_by=shard_by,
+                                                       verbose=False, **join_config)
+        throughput = stats.get('processed', 0) / elapsed_time
+        speedup = throughput / scaling[0]['throughput'] if scaling else 1.0
+        scaling.append({
+            'workers': num_workers,
+            'elapsed': elapsed_time,
+            'throughput': throughput,
+            'speedup': speedup
+        })
+        print(f"{num_workers:>8} {elapsed_time:>10.2f} {throughput:>14,.0f} {speedup:>8.2f}x")
+    
+    print("="*80)
+    return scaling
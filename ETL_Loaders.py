@@ -0,0 +1,1241 @@
+import pandas as pd
+import numpy as np
+import threading
+import time
+import getpass
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+
+from ETL_Metrics import METRICS
+from ETL_Transport import CUSTOMER_ATTRIBUTES, read_enriched
+from ETL_Analytics import AGGREGATE_MEASURES, AGGREGATE_SPECS
+
+try:
+    import pyodbc
+except ImportError:
+    pyodbc = None
+
+
+def get_connection_details():
+    print("\n" + "="*80)
+    print("SQL SERVER CONNECTION SETUP")
+    print("="*80)
+    
+    print("\nEnter SQL Server Connection Details:")
+    print("   (Press Enter for default values shown in brackets)")
+    print("")
+    
+    server = input("Server name [localhost\\SQLEXPRESS]: ").strip()
+    if not server:
+        server = "localhost\\SQLEXPRESS"
+    
+    database = input("Database name [November2025DW]: ").strip()
+    if not database:
+        database = "November2025DW"
+    
+    print("\nAuthentication Type:")
+    print("  1. Windows Authentication (Trusted Connection)")
+    print("  2. SQL Server Authentication (Username/Password)")
+    
+    auth_choice = input("Select authentication type [1]: ").strip()
+    if not auth_choice:
+        auth_choice = "1"
+    
+    username = None
+    password = None
+    
+    if auth_choice == "2":
+        username = input("Username [sa]: ").strip()
+        if not username:
+            username = "sa"
+        password = getpass.getpass("Password: ")
+    
+    return server, database, auth_choice, username, password
+
+
+def connect_to_sql_server(details=None):
+    conn, _ = find_sql_server_connection(details or get_connection_details())
+    return conn
+
+
+# Probes the installed ODBC drivers once and returns the first working
+# connection with its connection string, so pooled and loader connections
+# reconnect directly instead of repeating the probe.
+def find_sql_server_connection(details):
+    if pyodbc is None:
+        raise Exception("pyodbc is not installed (pip install pyodbc)")
+    
+    server, database, auth_choice, username, password = details
+    
+    print("\nConnecting to SQL Server...")
+    print(f"   Server: {server}")
+    print(f"   Database: {database}")
+    print(f"   Authentication: {'Windows' if auth_choice == '1' else 'SQL Server'}")
+    
+    drivers = [
+        "ODBC Driver 18 for SQL Server",
+        "ODBC Driver 17 for SQL Server",
+        "SQL Server",
+        "SQL Server Native Client 11.0"
+    ]
+    
+    for driver in drivers:
+        try:
+            if auth_choice == "1":
+                conn_str = f"DRIVER={{{driver}}};SERVER={server};DATABASE={database};Trusted_Connection=yes;"
+                if "18" in driver:
+                    conn_str += "TrustServerCertificate=yes;"
+            else:
+                conn_str = f"DRIVER={{{driver}}};SERVER={server};DATABASE={database};UID={username};PWD={password};"
+                if "18" in driver:
+                    conn_str += "TrustServerCertificate=yes;"
+            
+            conn = pyodbc.connect(conn_str, timeout=10)
+            print(f"   Connected successfully using: {driver}")
+            return conn, conn_str
+        except Exception as e:
+            continue
+    
+    print("\nCould not connect to SQL Server.")
+    print("\nPlease check:")
+    print("  1. SQL Server Express is running")
+    print("  2. Server name is correct (e.g., localhost\\SQLEXPRESS)")
+    print("  3. Database 'November2025DW' exists (run create_star_schema.sql first)")
+    print("  4. Credentials are correct (if using SQL Auth)")
+    print("  5. ODBC Driver is installed")
+    raise Exception("Database connection failed")
+
+
+DIMENSION_SPECS = {
+    'Dim_Customer': {
+        'surrogate_key': 'Customer_SK',
+        'natural_key': 'Customer_ID',
+        'columns': [
+            ('Customer_ID', 'INT'),
+            ('Gender', 'VARCHAR(10)'),
+            ('Age', 'VARCHAR(10)'),
+            ('Occupation', 'INT'),
+            ('City_Category', 'VARCHAR(5)'),
+            ('Stay_In_Current_City_Years', 'VARCHAR(10)'),
+            ('Marital_Status', 'INT')
+        ]
+    },
+    'Dim_Product': {
+        'surrogate_key': 'Product_SK',
+        'natural_key': 'Product_ID',
+        'columns': [
+            ('Product_ID', 'VARCHAR(50)'),
+            ('Product_Category', 'VARCHAR(100)'),
+            ('Price', 'DECIMAL(10, 2)')
+        ]
+    },
+    'Dim_Date': {
+        'surrogate_key': 'Date_SK',
+        'natural_key': 'Date',
+        'columns': [
+            ('Date', 'DATE'),
+            ('Year', 'INT'),
+            ('Month', 'INT'),
+            ('Day', 'INT'),
+            ('Quarter', 'INT'),
+            ('Day_of_Week', 'INT'),
+            ('Day_Name', 'VARCHAR(20)'),
+            ('Day_Type', 'VARCHAR(20)'),
+            ('Month_Name', 'VARCHAR(20)')
+        ]
+    },
+    'Dim_Store': {
+        'surrogate_key': 'Store_SK',
+        'natural_key': 'Store_ID',
+        'columns': [
+            ('Store_ID', 'INT'),
+            ('Store_Name', 'VARCHAR(100)')
+        ]
+    },
+    'Dim_Supplier': {
+        'surrogate_key': 'Supplier_SK',
+        'natural_key': 'Supplier_ID',
+        'columns': [
+            ('Supplier_ID', 'INT'),
+            ('Supplier_Name', 'VARCHAR(100)')
+        ]
+    }
+}
+
+
+DIMENSION_SOURCE_COLUMNS = ['Customer_ID'] + CUSTOMER_ATTRIBUTES + [
+    'Product_ID', 'Product_Category', 'price', 'date', 'storeID', 'storeName', 'supplierID', 'supplierName'
+]
+FACT_SOURCE_COLUMNS = ['orderID', 'Customer_ID', 'Product_ID', 'date', 'storeID', 'supplierID', 'quantity', 'Total_Revenue']
+
+
+def dimension_frames(enriched_data):
+    enriched_data = read_enriched(enriched_data, DIMENSION_SOURCE_COLUMNS)
+    customers = enriched_data[['Customer_ID'] + CUSTOMER_ATTRIBUTES]
+    
+    products = pd.DataFrame({
+        'Product_ID': enriched_data['Product_ID'],
+        'Product_Category': enriched_data['Product_Category'],
+        'Price': enriched_data['price']
+    })
+    
+    dates = pd.Series(pd.to_datetime(enriched_data['date']).dt.normalize().unique())
+    weekday = dates.dt.weekday
+    dates = pd.DataFrame({
+        'Date': dates,
+        'Year': dates.dt.year,
+        'Month': dates.dt.month,
+        'Day': dates.dt.day,
+        'Quarter': (dates.dt.month - 1) // 3 + 1,
+        'Day_of_Week': weekday,
+        'Day_Name': dates.dt.strftime('%A'),
+        'Day_Type': weekday.map(lambda day: 'Weekend' if day >= 5 else 'Weekday'),
+        'Month_Name': dates.dt.strftime('%B')
+    })
+    
+    stores = enriched_data[['storeID', 'storeName']].rename(columns={'storeID': 'Store_ID', 'storeName': 'Store_Name'})
+    suppliers = enriched_data[['supplierID', 'supplierName']].rename(columns={'supplierID': 'Supplier_ID', 'supplierName': 'Supplier_Name'})
+    
+    return {
+        'Dim_Customer': customers,
+        'Dim_Product': products,
+        'Dim_Date': dates,
+        'Dim_Store': stores,
+        'Dim_Supplier': suppliers
+    }
+
+
+def normalize_dimension_frame(dimension, frame):
+    spec = DIMENSION_SPECS[dimension]
+    normalized = {}
+    for column, sql_type in spec['columns']:
+        values = frame[column]
+        if sql_type == 'INT':
+            values = values.astype('int64')
+        elif sql_type.startswith('DECIMAL'):
+            values = values.astype(float).round(2)
+        elif sql_type == 'DATE':
+            values = pd.to_datetime(values).dt.normalize()
+        else:
+            values = values.astype(str)
+        normalized[column] = values.to_numpy()
+    
+    normalized = pd.DataFrame(normalized)
+    return normalized.drop_duplicates(spec['natural_key'], keep='last').reset_index(drop=True)
+
+
+def dimension_rows(dimension, frame):
+    columns = []
+    for column, sql_type in DIMENSION_SPECS[dimension]['columns']:
+        values = frame[column]
+        columns.append(values.dt.date.tolist() if sql_type == 'DATE' else values.tolist())
+    return list(zip(*columns))
+
+
+# Natural key -> surrogate key and current attributes of every dimension row
+# already in the warehouse. Seeded with one bulk read per dimension and kept
+# current after each MERGE, so repeat loads only send the delta.
+class DimensionCache:
+    def __init__(self):
+        self.frames = {}
+    
+    def seed(self, conn, dimension, schema='dbo.'):
+        spec = DIMENSION_SPECS[dimension]
+        columns = [spec['surrogate_key']] + [column for column, _ in spec['columns']]
+        
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT {', '.join(columns)} FROM {schema}{dimension}")
+        rows = [tuple(row) for row in cursor.fetchall()]
+        cursor.close()
+        
+        existing = pd.DataFrame(rows, columns=columns)
+        normalized = normalize_dimension_frame(dimension, existing)
+        normalized.insert(0, spec['surrogate_key'], existing[spec['surrogate_key']].astype('int64').to_numpy())
+        self.frames[dimension] = normalized
+    
+    def diff(self, dimension, frame):
+        spec = DIMENSION_SPECS[dimension]
+        incoming = normalize_dimension_frame(dimension, frame)
+        attributes = [column for column, _ in spec['columns'] if column != spec['natural_key']]
+        
+        merged = incoming.merge(self.frames[dimension], on=spec['natural_key'], how='left',
+                                suffixes=('', '_cached'), indicator=True)
+        new = merged['_merge'] == 'left_only'
+        changed = pd.Series(False, index=merged.index)
+        for column in attributes:
+            changed |= merged[column] != merged[f"{column}_cached"]
+        changed &= ~new
+        
+        return incoming[new.to_numpy()], incoming[changed.to_numpy()]
+    
+    def apply(self, dimension, delta, merged_keys):
+        spec = DIMENSION_SPECS[dimension]
+        natural_key = spec['natural_key']
+        
+        lookup = pd.Series([sk for _, sk in merged_keys], index=[key for key, _ in merged_keys], dtype='int64')
+        if spec['columns'][0][1] == 'DATE':
+            lookup.index = pd.to_datetime(lookup.index)
+        
+        delta = delta.copy()
+        delta.insert(0, spec['surrogate_key'], delta[natural_key].map(lookup).astype('int64').to_numpy())
+        
+        cached = self.frames[dimension]
+        cached = cached[~cached[natural_key].isin(delta[natural_key])]
+        self.frames[dimension] = pd.concat([cached, delta], ignore_index=True)
+    
+    def key_maps(self):
+        key_maps = {}
+        for dimension, spec in DIMENSION_SPECS.items():
+            frame = self.frames[dimension]
+            key_maps[spec['surrogate_key']] = pd.Series(frame[spec['surrogate_key']].to_numpy(),
+                                                        index=frame[spec['natural_key']].to_numpy(), dtype='int64')
+        return key_maps
+
+
+def upsert_dimensions(conn, enriched_data, cache=None, verbose=True):
+    log = print if verbose else (lambda *args, **kwargs: None)
+    log("\n" + "="*80)
+    log("UPSERTING DIMENSION TABLES (INCREMENTAL MERGE)")
+    log("="*80)
+    
+    if cache is None:
+        cache = DimensionCache()
+    
+    cursor = conn.cursor()
+    cursor.fast_executemany = True
+    
+    for dimension, frame in dimension_frames(enriched_data).items():
+        spec = DIMENSION_SPECS[dimension]
+        if dimension not in cache.frames:
+            cache.seed(conn, dimension)
+        
+        new_rows, changed_rows = cache.diff(dimension, frame)
+        log(f"\n{dimension}: {len(new_rows):,} new | {len(changed_rows):,} changed | "
+              f"{len(cache.frames[dimension]):,} cached")
+        
+        delta = pd.concat([new_rows, changed_rows], ignore_index=True)
+        if delta.empty:
+            continue
+        
+        columns = [column for column, _ in spec['columns']]
+        attributes = columns[1:]
+        staging = f"#{dimension}_Staging"
+        
+        cursor.execute(f"""
+            IF OBJECT_ID('tempdb..{staging}') IS NOT NULL DROP TABLE {staging};
+            CREATE TABLE {staging} ({', '.join(f'{column} {sql_type}' for column, sql_type in spec['columns'])});
+        """)
+        cursor.executemany(f"INSERT INTO {staging} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+                           dimension_rows(dimension, delta))
+        cursor.execute(f"""
+            SET NOCOUNT ON;
+            MERGE dbo.{dimension} AS target
+            USING {staging} AS source
+            ON target.{spec['natural_key']} = source.{spec['natural_key']}
+            WHEN MATCHED THEN
+                UPDATE SET {', '.join(f'target.{column} = source.{column}' for column in attributes)}
+            WHEN NOT MATCHED BY TARGET THEN
+                INSERT ({', '.join(columns)})
+                VALUES ({', '.join(f'source.{column}' for column in columns)})
+            OUTPUT inserted.{spec['natural_key']}, inserted.{spec['surrogate_key']};
+        """)
+        merged_keys = [tuple(row) for row in cursor.fetchall()]
+        cursor.execute(f"DROP TABLE {staging}")
+        conn.commit()
+        
+        cache.apply(dimension, delta, merged_keys)
+        log(f"   Merged {len(delta):,} rows")
+    
+    cursor.close()
+    log("\n" + "="*80)
+    return cache
+
+
+def merge_aggregates(conn, aggregates):
+    print("\n" + "="*80)
+    print("MERGING STREAM AGGREGATES INTO SUMMARY TABLES")
+    print("="*80)
+    
+    cursor = conn.cursor()
+    cursor.fast_executemany = True
+    
+    for table, frame in aggregates.frames().items():
+        if frame.empty:
+            continue
+        
+        keys = [column for column, _ in AGGREGATE_SPECS[table]]
+        measures = [column for column, _ in AGGREGATE_MEASURES]
+        columns = keys + measures
+        staging = f"#{table}_Staging"
+        
+        cursor.execute(f"""
+            IF OBJECT_ID('tempdb..{staging}') IS NOT NULL DROP TABLE {staging};
+            CREATE TABLE {staging} ({', '.join(f'{column} {sql_type}' for column, sql_type in AGGREGATE_SPECS[table] + AGGREGATE_MEASURES)});
+        """)
+        cursor.executemany(f"INSERT INTO {staging} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+                           list(zip(*(frame[column].tolist() for column in columns))))
+        cursor.execute(f"""
+            MERGE dbo.{table} AS target
+            USING {staging} AS source
+            ON {' AND '.join(f'target.{column} = source.{column}' for column in keys)}
+            WHEN MATCHED THEN
+                UPDATE SET {', '.join(f'target.{column} = target.{column} + source.{column}' for column in measures)}
+            WHEN NOT MATCHED BY TARGET THEN
+                INSERT ({', '.join(columns)})
+                VALUES ({', '.join(f'source.{column}' for column in columns)});
+        """)
+        cursor.execute(f"DROP TABLE {staging}")
+        conn.commit()
+        print(f"   {table}: merged {len(frame):,} groups")
+    
+    cursor.close()
+    print("="*80)
+
+
+AGGREGATE_KEY_SOURCES = {
+    'Year': 'd.Year',
+    'Quarter': 'd.Quarter',
+    'Month': 'd.Month',
+    'Day_Type': 'd.Day_Type',
+    'Store_ID': 's.Store_ID',
+    'Supplier_ID': 'sup.Supplier_ID',
+    'Product_ID': 'p.Product_ID',
+    'Product_Category': 'p.Product_Category'
+}
+
+
+# Recomputes the groups of one summary table listed in keys_table (every
+# group when keys_table is None) from the base tables. Unlike the additive
+# merge this is idempotent, so it repairs groups whose facts were loaded
+# without their aggregates being merged. Months archived out of Fact_Sales
+# still count towards their groups, so with archive=True the facts are read
+# from Fact_Sales UNION ALL Fact_Sales_Archive.
+def aggregate_rebuild_statements(table, keys_table, schema='dbo.', archive=False):
+    keys = [column for column, _ in AGGREGATE_SPECS[table]]
+    columns = keys + [column for column, _ in AGGREGATE_MEASURES]
+    sources = ', '.join(AGGREGATE_KEY_SOURCES[column] for column in keys)
+    if archive:
+        fact_columns = 'Date_SK, Product_SK, Store_SK, Supplier_SK, Quantity, Total_Revenue'
+        facts = (f"(SELECT {fact_columns} FROM {schema}Fact_Sales "
+                 f"UNION ALL SELECT {fact_columns} FROM {schema}Fact_Sales_Archive) f")
+    else:
+        facts = f"{schema}Fact_Sales f"
+    
+    if keys_table is None:
+        delete_sql = f"DELETE FROM {schema}{table}"
+        key_join = ''
+    else:
+        delete_sql = (f"DELETE FROM {schema}{table} WHERE EXISTS (SELECT 1 FROM {keys_table} k WHERE "
+                      f"{' AND '.join(f'k.{column} = {table}.{column}' for column in keys)})")
+        key_join = (f"JOIN {keys_table} k ON "
+                    f"{' AND '.join(f'k.{column} = {AGGREGATE_KEY_SOURCES[column]}' for column in keys)}")
+    insert_sql = f"""
+        INSERT INTO {schema}{table} ({', '.join(columns)})
+        SELECT {sources}, ROUND(SUM(f.Total_Revenue), 2), SUM(f.Quantity), COUNT(*)
+        FROM {facts}
+        JOIN {schema}Dim_Date d ON f.Date_SK = d.Date_SK
+        JOIN {schema}Dim_Product p ON f.Product_SK = p.Product_SK
+        JOIN {schema}Dim_Store s ON f.Store_SK = s.Store_SK
+        JOIN {schema}Dim_Supplier sup ON f.Supplier_SK = sup.Supplier_SK
+        {key_join}
+        GROUP BY {sources}
+    """
+    return delete_sql, insert_sql
+
+
+# aggregates=None rebuilds every group, e.g. for a warehouse whose facts
+# were loaded by something other than this ETL.
+def rebuild_aggregates(conn, aggregates):
+    print("\n" + "="*80)
+    print("REBUILDING SUMMARY TABLE GROUPS FROM FACT_SALES")
+    print("="*80)
+    
+    cursor = conn.cursor()
+    cursor.fast_executemany = True
+    cursor.execute("SELECT OBJECT_ID('dbo.Fact_Sales_Archive', 'U')")
+    archive = cursor.fetchone()[0] is not None
+    
+    for table in AGGREGATE_SPECS:
+        if aggregates is None:
+            for statement in aggregate_rebuild_statements(table, None, archive=archive):
+                cursor.execute(statement)
+            conn.commit()
+            print(f"   {table}: rebuilt every group")
+            continue
+        
+        frame = aggregates.frame(table)
+        if frame.empty:
+            continue
+        
+        keys = [column for column, _ in AGGREGATE_SPECS[table]]
+        staging = f"#{table}_Keys"
+        cursor.execute(f"""
+            IF OBJECT_ID('tempdb..{staging}') IS NOT NULL DROP TABLE {staging};
+            CREATE TABLE {staging} ({', '.join(f'{column} {sql_type}' for column, sql_type in AGGREGATE_SPECS[table])});
+        """)
+        cursor.executemany(f"INSERT INTO {staging} ({', '.join(keys)}) VALUES ({', '.join('?' for _ in keys)})",
+                           list(zip(*(frame[column].tolist() for column in keys))))
+        for statement in aggregate_rebuild_statements(table, staging, archive=archive):
+            cursor.execute(statement)
+        cursor.execute(f"DROP TABLE {staging}")
+        conn.commit()
+        print(f"   {table}: rebuilt {len(frame):,} groups")
+    
+    cursor.close()
+    print("="*80)
+
+
+# Streamed aggregates are merged additively when the load inserted exactly
+# the rows they were built from. When it skipped some (a replayed batch,
+# unresolved surrogate keys) the affected groups are rebuilt from Fact_Sales.
+def apply_aggregates(warehouse, aggregates, load_result):
+    if load_result['loaded'] == aggregates.rows_aggregated:
+        warehouse.merge_aggregates(aggregates)
+    else:
+        warehouse.rebuild_aggregates(aggregates)
+
+
+def write_product_affinity(conn, affinity, verbose=True):
+    frame, products = affinity.changes()
+    if not products:
+        return 0
+    
+    cursor = conn.cursor()
+    cursor.fast_executemany = True
+    cursor.execute("""
+        IF OBJECT_ID('tempdb..#Affinity_Products') IS NOT NULL DROP TABLE #Affinity_Products;
+        CREATE TABLE #Affinity_Products (Product_ID VARCHAR(50) PRIMARY KEY);
+    """)
+    cursor.executemany("INSERT INTO #Affinity_Products (Product_ID) VALUES (?)", [(product,) for product in products])
+    cursor.execute("""
+        DELETE a FROM dbo.Product_Affinity a
+        JOIN #Affinity_Products p ON a.Product_ID = p.Product_ID;
+    """)
+    if not frame.empty:
+        cursor.executemany("INSERT INTO dbo.Product_Affinity (Product_ID, Related_Product_ID, Co_Purchase_Count, Partner_Rank) "
+                           "VALUES (?, ?, ?, ?)", list(zip(*(frame[column].tolist() for column in frame.columns))))
+    cursor.execute("DROP TABLE #Affinity_Products")
+    conn.commit()
+    cursor.close()
+    
+    if verbose:
+        print(f"   Product_Affinity: refreshed top-{affinity.top_k} partners for {len(products):,} products "
+              f"({len(frame):,} rows)")
+    return len(frame)
+
+
+FACT_COLUMNS = ['Order_ID', 'Customer_SK', 'Product_SK', 'Date_SK', 'Store_SK', 'Supplier_SK', 'Quantity', 'Total_Revenue']
+
+
+def load_surrogate_key_maps(conn):
+    cursor = conn.cursor()
+    
+    key_maps = {}
+    for name, query in (
+        ('Customer_SK', "SELECT Customer_ID, Customer_SK FROM dbo.Dim_Customer"),
+        ('Product_SK', "SELECT Product_ID, Product_SK FROM dbo.Dim_Product"),
+        ('Date_SK', "SELECT Date, Date_SK FROM dbo.Dim_Date"),
+        ('Store_SK', "SELECT Store_ID, Store_SK FROM dbo.Dim_Store"),
+        ('Supplier_SK', "SELECT Supplier_ID, Supplier_SK FROM dbo.Dim_Supplier")
+    ):
+        cursor.execute(query)
+        rows = cursor.fetchall()
+        natural_keys = [row[0] for row in rows]
+        if name == 'Date_SK':
+            natural_keys = pd.to_datetime(natural_keys)
+        key_maps[name] = pd.Series([row[1] for row in rows], index=natural_keys, dtype='int64')
+    
+    cursor.close()
+    return key_maps
+
+
+def resolve_surrogate_keys(enriched_data, key_maps):
+    enriched_data = read_enriched(enriched_data, FACT_SOURCE_COLUMNS)
+    dates = pd.to_datetime(enriched_data['date']).dt.normalize()
+    
+    fact = pd.DataFrame({
+        'Order_ID': enriched_data['orderID'].astype('int64').to_numpy(),
+        'Customer_SK': enriched_data['Customer_ID'].map(key_maps['Customer_SK']).to_numpy(),
+        'Product_SK': enriched_data['Product_ID'].map(key_maps['Product_SK']).to_numpy(),
+        'Date_SK': dates.map(key_maps['Date_SK']).to_numpy(),
+        'Store_SK': enriched_data['storeID'].map(key_maps['Store_SK']).to_numpy(),
+        'Supplier_SK': enriched_data['supplierID'].map(key_maps['Supplier_SK']).to_numpy(),
+        'Quantity': enriched_data['quantity'].astype('int64').to_numpy(),
+        'Total_Revenue': enriched_data['Total_Revenue'].astype(float).round(2).to_numpy()
+    })
+    
+    resolved = fact[FACT_COLUMNS[1:6]].notna().all(axis=1)
+    fact = fact[resolved].astype({column: 'int64' for column in FACT_COLUMNS[1:6]})
+    return fact, int((~resolved).sum())
+
+
+def fact_rows(fact):
+    return list(zip(*(fact[column].tolist() for column in FACT_COLUMNS)))
+
+
+def load_fact_table_bulk(conn, enriched_data, batch_size=10000, commit_interval=5, method='executemany',
+                         key_maps=None, idempotent=False, fact=None, failed=0, verbose=True):
+    log = print if verbose else (lambda *args, **kwargs: None)
+    if method not in ('executemany', 'staging'):
+        raise ValueError(f"Unknown method '{method}' (expected 'executemany' or 'staging')")
+    if idempotent:
+        method = 'staging'
+    
+    log("\n" + "="*80)
+    log("BULK LOADING FACT_SALES TABLE")
+    log("="*80)
+    
+    # Callers that already resolved surrogate keys (the pipelined executor)
+    # pass the fact rows directly.
+    start_time = time.time()
+    if fact is None:
+        if key_maps is None:
+            key_maps = load_surrogate_key_maps(conn)
+        fact, failed = resolve_surrogate_keys(enriched_data, key_maps)
+    if idempotent:
+        fact = fact.drop_duplicates('Order_ID', keep='last')
+    
+    total_rows = len(fact)
+    log(f"\nResolved surrogate keys client-side in {time.time() - start_time:.2f}s")
+    log(f"   Rows to load: {total_rows:,} | Unresolved (skipped): {failed:,}")
+    log(f"   Method: {method} | Batch size: {batch_size:,} | Commit every {commit_interval} batches\n")
+    
+    cursor = conn.cursor()
+    cursor.fast_executemany = True
+    
+    column_list = ', '.join(FACT_COLUMNS)
+    placeholders = ', '.join('?' for _ in FACT_COLUMNS)
+    
+    if method == 'staging':
+        cursor.execute("""
+            IF OBJECT_ID('tempdb..#Fact_Sales_Staging') IS NOT NULL DROP TABLE #Fact_Sales_Staging;
+            CREATE TABLE #Fact_Sales_Staging (
+                Order_ID INT NOT NULL,
+                Customer_SK INT NOT NULL,
+                Product_SK INT NOT NULL,
+                Date_SK INT NOT NULL,
+                Store_SK INT NOT NULL,
+                Supplier_SK INT NOT NULL,
+                Quantity INT NOT NULL,
+                Total_Revenue DECIMAL(12, 2) NOT NULL
+            );
+        """)
+        insert_sql = f"INSERT INTO #Fact_Sales_Staging ({column_list}) VALUES ({placeholders})"
+    else:
+        insert_sql = f"INSERT INTO dbo.Fact_Sales ({column_list}) VALUES ({placeholders})"
+    
+    # Idempotent loads skip Order_IDs that are already in Fact_Sales, so a
+    # resumed run can replay batches committed after its last checkpoint.
+    duplicate_filter = ""
+    if idempotent:
+        duplicate_filter = "WHERE NOT EXISTS (SELECT 1 FROM dbo.Fact_Sales f WHERE f.Order_ID = s.Order_ID)"
+    inserted = 0
+    new_order_ids = []
+    
+    def flush(staged_rows):
+        with METRICS.timer('db_commit'):
+            commit_batch(staged_rows)
+        METRICS.increment('db_commits')
+    
+    def commit_batch(staged_rows):
+        nonlocal inserted
+        if method == 'staging' and idempotent:
+            cursor.execute(f"""
+                SET NOCOUNT ON;
+                INSERT INTO dbo.Fact_Sales ({column_list})
+                OUTPUT inserted.Order_ID
+                SELECT {', '.join(f's.{column}' for column in FACT_COLUMNS)} FROM #Fact_Sales_Staging s
+                {duplicate_filter};
+            """)
+            loaded_ids = [row[0] for row in cursor.fetchall()]
+            new_order_ids.extend(loaded_ids)
+            inserted += len(loaded_ids)
+            cursor.execute("TRUNCATE TABLE #Fact_Sales_Staging")
+        elif method == 'staging':
+            cursor.execute(f"""
+                INSERT INTO dbo.Fact_Sales ({column_list})
+                SELECT {column_list} FROM #Fact_Sales_Staging;
+            """)
+            inserted += staged_rows
+            cursor.execute("TRUNCATE TABLE #Fact_Sales_Staging")
+        else:
+            inserted += staged_rows
+        conn.commit()
+    
+    staged_rows = 0
+    for batch_number, start_idx in enumerate(range(0, total_rows, batch_size), 1):
+        end_idx = min(start_idx + batch_size, total_rows)
+        with METRICS.timer('db_batch_insert'):
+            cursor.executemany(insert_sql, fact_rows(fact.iloc[start_idx:end_idx]))
+        staged_rows += end_idx - start_idx
+        
+        if batch_number % commit_interval == 0:
+            flush(staged_rows)
+            staged_rows = 0
+        
+        progress = (end_idx / total_rows) * 100
+        log(f"Progress: {end_idx:,}/{total_rows:,} [{progress:5.1f}%]", end='\r')
+    flush(staged_rows)
+    
+    if method == 'staging':
+        cursor.execute("DROP TABLE #Fact_Sales_Staging")
+        conn.commit()
+    cursor.close()
+    
+    elapsed_time = time.time() - start_time
+    rows_per_second = total_rows / elapsed_time if elapsed_time else 0.0
+    METRICS.increment('facts_loaded', inserted)
+    
+    log(f"\n\nSuccessfully loaded {inserted:,} transactions in {elapsed_time:.2f}s ({rows_per_second:,.0f} rows/second)")
+    if total_rows > inserted:
+        log(f"   {total_rows - inserted:,} rows were already loaded (skipped by Order_ID)")
+    if failed:
+        log(f"   {failed:,} rows failed surrogate key resolution and were not loaded")
+    log("="*80)
+    
+    return {
+        'loaded': inserted,
+        'new_order_ids': new_order_ids if idempotent else fact['Order_ID'].tolist(),
+        'skipped_existing': total_rows - inserted,
+        'failed_resolution': failed,
+        'elapsed': elapsed_time,
+        'rows_per_second': rows_per_second
+    }
+
+
+# Fixed-size pool of warehouse connections shared by the parallel fact
+# loader. Connections are opened lazily, handed out most-recently-used first
+# and reused across loads; one that raised a non-retryable error is discarded.
+class ConnectionPool:
+    def __init__(self, factory, size, setup=None):
+        self.factory = factory
+        self.size = max(1, size)
+        self.setup = setup
+        self.idle = []
+        self.opened = 0
+        self.closed = False
+        self.condition = threading.Condition()
+        self.stats = {'opened': 0, 'acquired': 0, 'reused': 0, 'waits': 0, 'discarded': 0}
+    
+    def acquire(self):
+        with self.condition:
+            while not self.idle and self.opened >= self.size and not self.closed:
+                self.stats['waits'] += 1
+                self.condition.wait()
+            if self.closed:
+                raise RuntimeError("Connection pool is closed")
+            self.stats['acquired'] += 1
+            if self.idle:
+                self.stats['reused'] += 1
+                return self.idle.pop()
+            self.opened += 1
+        try:
+            conn = self.factory()
+            if self.setup is not None:
+                self.setup(conn)
+        except Exception:
+            with self.condition:
+                self.opened -= 1
+                self.condition.notify()
+            raise
+        with self.condition:
+            self.stats['opened'] += 1
+        return conn
+    
+    def release(self, conn, discard=False):
+        with self.condition:
+            if discard or self.closed:
+                self.opened -= 1
+                self.stats['discarded'] += int(discard)
+            else:
+                self.idle.append(conn)
+            self.condition.notify()
+        if discard or self.closed:
+            with contextlib.suppress(Exception):
+                conn.close()
+    
+    @contextlib.contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        except Exception:
+            self.release(conn, discard=True)
+            raise
+        self.release(conn)
+    
+    def close(self):
+        with self.condition:
+            self.closed = True
+            idle, self.idle = self.idle, []
+            self.opened -= len(idle)
+            self.condition.notify_all()
+        for conn in idle:
+            with contextlib.suppress(Exception):
+                conn.close()
+
+
+# Deadlock victims (1205, SQLSTATE 40001) and lock or query timeouts (1222,
+# HYT00/HYT01) roll back only the failing batch, which is safe to replay.
+RETRYABLE_SQLSTATES = ('40001', 'HYT00', 'HYT01')
+RETRYABLE_NATIVE_ERRORS = ('(1205)', '(1222)')
+
+
+def is_retryable_error(error):
+    sqlstate = error.args[0] if error.args else ''
+    return sqlstate in RETRYABLE_SQLSTATES or any(code in str(error) for code in RETRYABLE_NATIVE_ERRORS)
+
+
+# Loader sessions wait a bounded time for locks and volunteer as the deadlock
+# victim, so a contended batch fails fast and is retried instead of stalling
+# the other partitions.
+def configure_loader_session(conn, lock_timeout_ms=5000):
+    cursor = conn.cursor()
+    cursor.execute(f"SET LOCK_TIMEOUT {int(lock_timeout_ms)}; SET DEADLOCK_PRIORITY LOW;")
+    cursor.close()
+    conn.commit()
+
+
+def partition_fact_rows(fact, partition_by='Date_SK', partitions=4):
+    if partition_by not in ('Date_SK', 'Store_SK'):
+        raise ValueError(f"Unknown partition column '{partition_by}' (expected 'Date_SK' or 'Store_SK')")
+    if fact.empty:
+        return []
+    
+    # Contiguous key ranges of roughly equal size; a cut is moved back to the
+    # first row of its key so one Date_SK/Store_SK never spans two partitions,
+    # or forward past the key when moving back would empty the partition
+    # before it (a dominant key would otherwise collapse the split).
+    ordered = fact.sort_values(partition_by, kind='stable')
+    keys = ordered[partition_by].to_numpy()
+    targets = np.linspace(0, len(keys), max(1, partitions) + 1).astype(int)[1:-1]
+    bounds = [0]
+    for target in targets:
+        cut = int(np.searchsorted(keys, keys[target], side='left'))
+        if cut <= bounds[-1]:
+            cut = int(np.searchsorted(keys, keys[target], side='right'))
+        if bounds[-1] < cut < len(keys):
+            bounds.append(cut)
+    bounds.append(len(keys))
+    return [ordered.iloc[start:end] for start, end in zip(bounds, bounds[1:])]
+
+
+# With idempotent=True a row is skipped when its Order_ID is already in any of
+# existing_tables (default: the target table).
+def load_fact_partition(conn, fact, batch_size=10000, idempotent=False, max_retries=5, retry_backoff=0.1,
+                        table='dbo.Fact_Sales', existing_tables=None):
+    existing_tables = existing_tables or [table]
+    cursor = conn.cursor()
+    cursor.fast_executemany = True
+    
+    column_list = ', '.join(FACT_COLUMNS)
+    placeholders = ', '.join('?' for _ in FACT_COLUMNS)
+    if idempotent:
+        # Temp tables are per session, so each pooled connection stages into
+        # its own copy without contending with the other partitions.
+        cursor.execute("""
+            IF OBJECT_ID('tempdb..#Fact_Sales_Staging') IS NOT NULL DROP TABLE #Fact_Sales_Staging;
+            CREATE TABLE #Fact_Sales_Staging (
+                Order_ID INT NOT NULL,
+                Customer_SK INT NOT NULL,
+                Product_SK INT NOT NULL,
+                Date_SK INT NOT NULL,
+                Store_SK INT NOT NULL,
+                Supplier_SK INT NOT NULL,
+                Quantity INT NOT NULL,
+                Total_Revenue DECIMAL(12, 2) NOT NULL
+            );
+        """)
+        conn.commit()
+        insert_sql = f"INSERT INTO #Fact_Sales_Staging ({column_list}) VALUES ({placeholders})"
+    else:
+        insert_sql = f"INSERT INTO {table} ({column_list}) VALUES ({placeholders})"
+    
+    stats = {'rows': len(fact), 'loaded': 0, 'batches': 0, 'retries': 0, 'new_order_ids': []}
+    start_time = time.time()
+    
+    for start_idx in range(0, len(fact), batch_size):
+        rows = fact_rows(fact.iloc[start_idx:start_idx + batch_size])
+        attempt = 0
+        while True:
+            try:
+                with METRICS.timer('db_batch_insert'):
+                    if idempotent:
+                        cursor.execute("TRUNCATE TABLE #Fact_Sales_Staging")
+                    cursor.executemany(insert_sql, rows)
+                    if idempotent:
+                        cursor.execute(f"""
+                            SET NOCOUNT ON;
+                            INSERT INTO {table} ({column_list})
+                            OUTPUT inserted.Order_ID
+                            SELECT {', '.join(f's.{column}' for column in FACT_COLUMNS)} FROM #Fact_Sales_Staging s
+                            WHERE {' AND '.join(f'NOT EXISTS (SELECT 1 FROM {existing} f WHERE f.Order_ID = s.Order_ID)'
+                                                for existing in existing_tables)};
+                        """)
+                        loaded_ids = [row[0] for row in cursor.fetchall()]
+                with METRICS.timer('db_commit'):
+                    conn.commit()
+                break
+            except Exception as e:
+                with contextlib.suppress(Exception):
+                    conn.rollback()
+                if attempt >= max_retries or not is_retryable_error(e):
+                    cursor.close()
+                    raise
+                attempt += 1
+                stats['retries'] += 1
+                METRICS.increment('db_retries')
+                time.sleep(retry_backoff * (2 ** (attempt - 1)) * (0.5 + np.random.random()))
+        
+        METRICS.increment('db_commits')
+        stats['batches'] += 1
+        if idempotent:
+            stats['loaded'] += len(loaded_ids)
+            stats['new_order_ids'].extend(loaded_ids)
+        else:
+            stats['loaded'] += len(rows)
+            stats['new_order_ids'].extend(row[0] for row in rows)
+    
+    if idempotent:
+        cursor.execute("DROP TABLE #Fact_Sales_Staging")
+        conn.commit()
+    cursor.close()
+    stats['elapsed'] = time.time() - start_time
+    return stats
+
+
+def load_fact_table_parallel(pool, enriched_data, key_maps=None, fact=None, failed=0, partition_by='Date_SK',
+                             workers=None, batch_size=10000, idempotent=False, max_retries=5, retry_backoff=0.1,
+                             verbose=True):
+    log = print if verbose else (lambda *args, **kwargs: None)
+    workers = workers or pool.size
+    
+    log("\n" + "="*80)
+    log(f"PARALLEL LOADING FACT_SALES TABLE ({workers} CONNECTIONS)")
+    log("="*80)
+    
+    start_time = time.time()
+    if fact is None:
+        if key_maps is None:
+            with pool.connection() as conn:
+                key_maps = load_surrogate_key_maps(conn)
+        fact, failed = resolve_surrogate_keys(enriched_data, key_maps)
+    if idempotent:
+        fact = fact.drop_duplicates('Order_ID', keep='last')
+    
+    partitions = partition_fact_rows(fact, partition_by, workers)
+    total_rows = len(fact)
+    log(f"\nResolved surrogate keys client-side in {time.time() - start_time:.2f}s")
+    log(f"   Rows to load: {total_rows:,} | Unresolved (skipped): {failed:,}")
+    log(f"   Partitioned by {partition_by} into {len(partitions)} ranges | Batch size: {batch_size:,}\n")
+    
+    def load_partition(part):
+        with pool.connection() as conn:
+            return load_fact_partition(conn, part, batch_size, idempotent, max_retries, retry_backoff)
+    
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="FactLoader") as executor:
+        results = list(executor.map(load_partition, partitions))
+    
+    inserted = sum(result['loaded'] for result in results)
+    elapsed_time = time.time() - start_time
+    rows_per_second = total_rows / elapsed_time if elapsed_time else 0.0
+    METRICS.increment('facts_loaded', inserted)
+    
+    for part, result in zip(partitions, results):
+        log(f"   {partition_by} {part[partition_by].iloc[0]:>8}-{part[partition_by].iloc[-1]:<8} "
+            f"{result['rows']:>10,} rows | {result['batches']:>4} batches | {result['retries']:>3} retries | "
+            f"{result['elapsed']:6.2f}s")
+    log(f"\nSuccessfully loaded {inserted:,} transactions in {elapsed_time:.2f}s ({rows_per_second:,.0f} rows/second)")
+    log(f"   Connections opened: {pool.stats['opened']} | reused: {pool.stats['reused']} | "
+        f"waits: {pool.stats['waits']}")
+    if total_rows > inserted:
+        log(f"   {total_rows - inserted:,} rows were already loaded (skipped by Order_ID)")
+    if failed:
+        log(f"   {failed:,} rows failed surrogate key resolution and were not loaded")
+    log("="*80)
+    
+    return {
+        'loaded': inserted,
+        'new_order_ids': [order_id for result in results for order_id in result['new_order_ids']],
+        'skipped_existing': total_rows - inserted,
+        'failed_resolution': failed,
+        'elapsed': elapsed_time,
+        'rows_per_second': rows_per_second,
+        'retries': sum(result['retries'] for result in results),
+        'partitions': [{key: value for key, value in result.items() if key != 'new_order_ids'} for result in results]
+    }
+
+
+# Optional columnstore layout (create_columnstore_fact.sql): Fact_Sales is a
+# clustered columnstore partitioned by month on Date_SK, which Dim_Date keys
+# as YYYYMMDD, plus identically partitioned switch and archive tables.
+FACT_PARTITION_FUNCTION = 'PF_Fact_Sales_Month'
+FACT_PARTITION_SCHEME = 'PS_Fact_Sales_Month'
+FACT_SWITCH_TABLE = 'dbo.Fact_Sales_Switch'
+FACT_ARCHIVE_TABLE = 'dbo.Fact_Sales_Archive'
+
+
+def month_start_keys(date_keys):
+    return np.asarray(date_keys, dtype='int64') // 100 * 100 + 1
+
+
+# Month boundaries of the partition function, or [] when the rowstore
+# layout from create_star_schema.sql is installed.
+def fact_partition_boundaries(conn):
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT CAST(v.value AS INT)
+        FROM sys.partition_functions f
+        JOIN sys.partition_range_values v ON v.function_id = f.function_id
+        WHERE f.name = ? AND OBJECT_ID('{FACT_SWITCH_TABLE}', 'U') IS NOT NULL
+          AND EXISTS (SELECT 1 FROM sys.indexes i
+                      JOIN sys.partition_schemes s ON s.data_space_id = i.data_space_id
+                      WHERE i.object_id = OBJECT_ID('dbo.Fact_Sales') AND s.function_id = f.function_id)
+        ORDER BY v.boundary_id
+    """, FACT_PARTITION_FUNCTION)
+    boundaries = [row[0] for row in cursor.fetchall()]
+    cursor.close()
+    return boundaries
+
+
+def next_month_key(month_start):
+    year, month = divmod(month_start // 100, 100)
+    return (year + month // 12) * 10000 + (month % 12 + 1) * 100 + 1
+
+
+# Months past the pre-built range are split off the last partition, up to
+# the month after the newest one, so that partition stays empty: splitting
+# it is then metadata-only, and columnstore partitions holding rows cannot
+# be split at all.
+def ensure_fact_partitions(conn, month_starts, boundaries, log=print):
+    wanted = set(int(month) for month in month_starts)
+    if wanted and boundaries and max(wanted) >= boundaries[-1]:
+        newest = max(wanted)
+        month = boundaries[-1]
+        while month <= newest:
+            month = next_month_key(month)
+            wanted.add(month)
+    missing = sorted(wanted - set(boundaries))
+    if not missing:
+        return boundaries
+    cursor = conn.cursor()
+    for month in missing:
+        cursor.execute(f"ALTER PARTITION SCHEME {FACT_PARTITION_SCHEME} NEXT USED [PRIMARY]")
+        cursor.execute(f"ALTER PARTITION FUNCTION {FACT_PARTITION_FUNCTION}() SPLIT RANGE ({month})")
+    conn.commit()
+    cursor.close()
+    log(f"   Added {len(missing):,} month partitions ({missing[0]} - {missing[-1]})")
+    return sorted(boundaries + missing)
+
+
+def fact_partition_numbers(conn, month_starts):
+    cursor = conn.cursor()
+    values = ', '.join(f"({int(month)})" for month in month_starts)
+    cursor.execute(f"""
+        SELECT m.Month_SK, $PARTITION.{FACT_PARTITION_FUNCTION}(m.Month_SK)
+        FROM (VALUES {values}) AS m(Month_SK)
+    """)
+    numbers = {row[0]: row[1] for row in cursor.fetchall()}
+    cursor.close()
+    return numbers
+
+
+def populated_partitions(conn, table):
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT partition_number, SUM(rows)
+        FROM sys.partitions
+        WHERE object_id = OBJECT_ID(?) AND index_id IN (0, 1)
+        GROUP BY partition_number
+        HAVING SUM(rows) > 0
+    """, table)
+    populated = {row[0]: row[1] for row in cursor.fetchall()}
+    cursor.close()
+    return populated
+
+
+# Months with no rows in Fact_Sales yet are loaded into Fact_Sales_Switch,
+# rebuilt there into compressed row groups, and switched into Fact_Sales in
+# one transaction - readers see each month complete or not at all, and no
+# index is maintained on the live table. Rows for months already in
+# Fact_Sales (incremental trickle) are inserted directly into its delta store.
+def load_fact_table_switch(conn, enriched_data, key_maps=None, fact=None, failed=0, boundaries=None,
+                           batch_size=10000, idempotent=False, max_retries=5, retry_backoff=0.1, verbose=True):
+    log = print if verbose else (lambda *args, **kwargs: None)
+    log("\n" + "="*80)
+    log("PARTITION-SWITCH LOADING FACT_SALES (CLUSTERED COLUMNSTORE)")
+    log("="*80)
+    
+    start_time = time.time()
+    if fact is None:
+        if key_maps is None:
+            key_maps = load_surrogate_key_maps(conn)
+        fact, failed = resolve_surrogate_keys(enriched_data, key_maps)
+    if idempotent:
+        fact = fact.drop_duplicates('Order_ID', keep='last')
+    
+    total_rows = len(fact)
+    log(f"\nResolved surrogate keys client-side in {time.time() - start_time:.2f}s")
+    log(f"   Rows to load: {total_rows:,} | Unresolved (skipped): {failed:,}")
+    
+    months = month_start_keys(fact['Date_SK'])
+    month_starts = np.unique(months)
+    if boundaries is None:
+        boundaries = fact_partition_boundaries(conn)
+    boundaries = ensure_fact_partitions(conn, month_starts, boundaries, log)
+    numbers = fact_partition_numbers(conn, month_starts) if len(month_starts) else {}
+    populated = populated_partitions(conn, 'dbo.Fact_Sales')
+    partitions = pd.Series(months).map(numbers).to_numpy()
+    switching = ~np.isin(partitions, list(populated))
+    switch_partitions = sorted(set(partitions[switching].tolist()))
+    
+    # The switch table only ever holds rows that were never published, so
+    # whatever an interrupted run left there is discarded. Replayed rows are
+    # checked against Fact_Sales and the archive, never the switch table.
+    published = ['dbo.Fact_Sales', FACT_ARCHIVE_TABLE]
+    cursor = conn.cursor()
+    cursor.execute(f"TRUNCATE TABLE {FACT_SWITCH_TABLE}")
+    conn.commit()
+    
+    log(f"   Switching in {len(switch_partitions):,} new months ({int(switching.sum()):,} rows) | "
+        f"Inserting {int((~switching).sum()):,} rows into loaded months | Batch size: {batch_size:,}\n")
+    results = []
+    switched = 0
+    if switch_partitions:
+        staged = load_fact_partition(conn, fact[switching], batch_size, idempotent, max_retries, retry_backoff,
+                                     table=FACT_SWITCH_TABLE, existing_tables=published)
+        results.append(staged)
+        
+        with METRICS.timer('fact_partition_switch'):
+            for partition in switch_partitions:
+                cursor.execute(f"ALTER INDEX CCI_Fact_Sales_Switch ON {FACT_SWITCH_TABLE} "
+                               f"REBUILD PARTITION = {partition}")
+            conn.commit()
+            try:
+                for partition in switch_partitions:
+                    cursor.execute(f"ALTER TABLE {FACT_SWITCH_TABLE} SWITCH PARTITION {partition} "
+                                   f"TO dbo.Fact_Sales PARTITION {partition}")
+                conn.commit()
+            except Exception:
+                with contextlib.suppress(Exception):
+                    conn.rollback()
+                cursor.close()
+                raise
+        switched = staged['loaded']
+    
+    if (~switching).any():
+        results.append(load_fact_partition(conn, fact[~switching], batch_size, idempotent, max_retries, retry_backoff,
+                                           existing_tables=published))
+    cursor.close()
+    
+    inserted = sum(result['loaded'] for result in results)
+    elapsed_time = time.time() - start_time
+    rows_per_second = total_rows / elapsed_time if elapsed_time else 0.0
+    METRICS.increment('facts_loaded', inserted)
+    
+    log(f"\nSuccessfully loaded {inserted:,} transactions in {elapsed_time:.2f}s ({rows_per_second:,.0f} rows/second)")
+    log(f"   Switched in: {switched:,} rows in {len(switch_partitions):,} partitions | "
+        f"Inserted into loaded months: {inserted - switched:,}")
+    if total_rows > inserted:
+        log(f"   {total_rows - inserted:,} rows were already loaded (skipped by Order_ID)")
+    if failed:
+        log(f"   {failed:,} rows failed surrogate key resolution and were not loaded")
+    log("="*80)
+    
+    return {
+        'loaded': inserted,
+        'new_order_ids': [order_id for result in results for order_id in result['new_order_ids']],
+        'skipped_existing': total_rows - inserted,
+        'failed_resolution': failed,
+        'elapsed': elapsed_time,
+        'rows_per_second': rows_per_second,
+        'retries': sum(result['retries'] for result in results),
+        'switched_partitions': len(switch_partitions),
+        'switched_rows': switched
+    }
+
+
+# Months before before_date_sk move to Fact_Sales_Archive by partition switch
+# (metadata-only). A month whose archive partition already holds rows is
+# left in place and reported.
+def archive_fact_months(conn, before_date_sk, verbose=True):
+    log = print if verbose else (lambda *args, **kwargs: None)
+    log("\n" + "="*80)
+    log(f"ARCHIVING FACT_SALES MONTHS BEFORE {before_date_sk}")
+    log("="*80)
+    
+    boundary = int(month_start_keys([before_date_sk])[0])
+    limit = fact_partition_numbers(conn, [boundary])[boundary]
+    archived = populated_partitions(conn, FACT_ARCHIVE_TABLE)
+    candidates = {partition: rows for partition, rows in populated_partitions(conn, 'dbo.Fact_Sales').items()
+                  if partition < limit}
+    movable = sorted(partition for partition in candidates if partition not in archived)
+    
+    cursor = conn.cursor()
+    try:
+        for partition in movable:
+            cursor.execute(f"ALTER TABLE dbo.Fact_Sales SWITCH PARTITION {partition} "
+                           f"TO {FACT_ARCHIVE_TABLE} PARTITION {partition}")
+        conn.commit()
+    except Exception:
+        with contextlib.suppress(Exception):
+            conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    
+    rows = sum(candidates[partition] for partition in movable)
+    log(f"\nArchived {len(movable):,} months ({rows:,} rows) to {FACT_ARCHIVE_TABLE}")
+    blocked = sorted(set(candidates) - set(movable))
+    if blocked:
+        log(f"   {len(blocked):,} months kept in Fact_Sales: their archive partitions already hold rows "
+            f"(partitions {', '.join(str(partition) for partition in blocked)})")
+    log("="*80)
+    return {'archived_partitions': len(movable), 'archived_rows': rows, 'blocked_partitions': blocked}
+
+
+def verify_data(conn, schema='dbo.'):
+    print("\n" + "="*80)
+    print("DATA VERIFICATION")
+    print("="*80)
+    cursor = conn.cursor()
+    
+    cursor.execute(f"SELECT COUNT(*) FROM {schema}Dim_Customer")
+    cust_count = cursor.fetchone()[0]
+    
+    cursor.execute(f"SELECT COUNT(*) FROM {schema}Dim_Product")
+    prod_count = cursor.fetchone()[0]
+    
+    cursor.execute(f"SELECT COUNT(*) FROM {schema}Dim_Date")
+    date_count = cursor.fetchone()[0]
+    
+    cursor.execute(f"SELECT COUNT(*) FROM {schema}Dim_Store")
+    store_count = cursor.fetchone()[0]
+    
+    cursor.execute(f"SELECT COUNT(*) FROM {schema}Dim_Supplier")
+    supp_count = cursor.fetchone()[0]
+    
+    cursor.execute(f"SELECT COUNT(*) FROM {schema}Fact_Sales")
+    fact_count = cursor.fetchone()[0]
+    
+    cursor.execute(f"SELECT SUM(Total_Revenue) FROM {schema}Fact_Sales")
+    total_revenue = cursor.fetchone()[0]
+    
+    print("\nDimension Tables:")
+    print(f"   Dim_Customer:  {cust_count:>7,} records")
+    print(f"   Dim_Product:   {prod_count:>7,} records")
+    print(f"   Dim_Date:      {date_count:>7,} records")
+    print(f"   Dim_Store:     {store_count:>7,} records")
+    print(f"   Dim_Supplier:  {supp_count:>7,} records")
+    
+    print(f"\nFact Table:")
+    print(f"   Fact_Sales:    {fact_count:>7,} transactions")
+    
+    if total_revenue:
+        total_revenue = float(total_revenue)
+        print(f"\nBusiness Metrics:")
+        print(f"   Total Revenue:    ${total_revenue:>12,.2f}")
+        print(f"   Avg Transaction:  ${(total_revenue/fact_count):>12,.2f}")
+    
+    print("\n" + "="*80)
+    cursor.close()
@@ -0,0 +1,305 @@
+import threading
+import time
+import os
+import json
+import contextlib
+import bisect
+import cProfile
+import pstats
+from datetime import datetime
+
+
+LATENCY_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+TUPLE_TIMER_SAMPLE = 64
+NULL_TIMER = contextlib.nullcontext()
+
+
+class LatencyHistogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+    
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+    
+    def merge(self, other):
+        self.counts = [mine + theirs for mine, theirs in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+    
+    def quantile(self, q):
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, bucket_count in zip(self.buckets + (self.max,), self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+    
+    def snapshot(self):
+        return {
+            'count': self.count,
+            'sum': round(self.total, 6),
+            'max': round(self.max, 6),
+            'p50': round(self.quantile(0.5), 6),
+            'p99': round(self.quantile(0.99), 6),
+            'buckets': dict(zip([str(bound) for bound in self.buckets] + ['+Inf'], self.counts))
+        }
+
+
+class StageTimer:
+    __slots__ = ('metrics', 'stage', 'started', 'profiler')
+    
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+    
+    def __enter__(self):
+        metrics = self.metrics
+        self.profiler = metrics.profilers.get(self.stage) if metrics.profilers else None
+        if self.profiler is not None and not metrics.start_profile(self.profiler):
+            self.profiler = None
+        if metrics.sampler is not None:
+            metrics.active_stages.setdefault(threading.get_ident(), []).append(self.stage)
+        self.started = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.started
+        metrics = self.metrics
+        if metrics.sampler is not None:
+            metrics.active_stages[threading.get_ident()].pop()
+        if self.profiler is not None:
+            metrics.stop_profile(self.profiler)
+        metrics.observe(self.stage, elapsed)
+        return False
+
+
+# Counters, gauges and per-stage latency histograms for the join and load
+# paths. Collectors are called at snapshot time so existing stats dicts can be
+# published without touching the hot path a second time.
+class MetricsRegistry:
+    def __init__(self, namespace='hybridjoin'):
+        self.namespace = namespace
+        self.counters = {}
+        self.gauges = {}
+        self.thread_histograms = []
+        self.local = threading.local()
+        self.collectors = {}
+        self.lock = threading.Lock()
+        
+        self.profilers = {}
+        self.profiling = threading.local()
+        self.sampler = None
+        self.active_stages = {}
+        self.stage_samples = {}
+    
+    def increment(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+    
+    def set_gauge(self, name, value):
+        self.gauges[name] = value
+    
+    # Each thread records into its own histograms, so timing a stage takes no
+    # lock; snapshot() merges them.
+    def observe(self, stage, seconds):
+        histograms = getattr(self.local, 'histograms', None)
+        if histograms is None:
+            histograms = self.local.histograms = {}
+            with self.lock:
+                self.thread_histograms.append(histograms)
+        histogram = histograms.get(stage)
+        if histogram is None:
+            histogram = histograms[stage] = LatencyHistogram()
+        histogram.observe(seconds)
+    
+    def histograms(self):
+        merged = {}
+        with self.lock:
+            for histograms in self.thread_histograms:
+                for stage, histogram in list(histograms.items()):
+                    merged.setdefault(stage, LatencyHistogram()).merge(histogram)
+        return merged
+    
+    def timer(self, stage):
+        return StageTimer(self, stage)
+    
+    # Per-tuple stages time one call in `every` (every call while the stage is
+    # being profiled); their histograms hold a sample of the latencies, with
+    # count the number of calls timed rather than made.
+    def sampled_timer(self, stage, every=TUPLE_TIMER_SAMPLE):
+        calls = getattr(self.local, 'calls', None)
+        if calls is None:
+            calls = self.local.calls = {}
+        seen = calls.get(stage, 0)
+        calls[stage] = seen + 1
+        if seen % every and stage not in self.profilers:
+            return NULL_TIMER
+        return StageTimer(self, stage)
+    
+    def register_collector(self, name, collector):
+        self.collectors[name] = collector
+    
+    def unregister_collector(self, name):
+        self.collectors.pop(name, None)
+    
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.gauges.clear()
+            for histograms in self.thread_histograms:
+                histograms.clear()
+            self.stage_samples.clear()
+        self.collectors = {}
+    
+    # cProfile only allows one active profiler per thread, so a stage nested
+    # inside another profiled stage is timed but not profiled.
+    def enable_profiling(self, stages):
+        for stage in stages:
+            self.profilers.setdefault(stage, cProfile.Profile())
+    
+    def start_profile(self, profiler):
+        if getattr(self.profiling, 'active', None) is not None:
+            return False
+        try:
+            profiler.enable()
+        except ValueError:
+            return False
+        self.profiling.active = profiler
+        return True
+    
+    def stop_profile(self, profiler):
+        profiler.disable()
+        self.profiling.active = None
+    
+    def write_profiles(self, directory, top=25):
+        os.makedirs(directory, exist_ok=True)
+        for stage, profiler in self.profilers.items():
+            profiler.create_stats()
+            if not profiler.stats:
+                continue
+            profiler.dump_stats(os.path.join(directory, f"{stage}.prof"))
+            with open(os.path.join(directory, f"{stage}.txt"), 'w') as report:
+                pstats.Stats(profiler, stream=report).sort_stats('cumulative').print_stats(top)
+        return directory
+    
+    # Statistical profile: a background thread records which stage each
+    # thread is in every `interval` seconds, costing one list append per stage.
+    def start_sampling(self, interval=0.005):
+        if self.sampler is not None:
+            return
+        stop = threading.Event()
+        
+        def sample():
+            while not stop.wait(interval):
+                for stages in list(self.active_stages.values()):
+                    stage = stages[-1] if stages else 'idle'
+                    self.stage_samples[stage] = self.stage_samples.get(stage, 0) + 1
+        
+        self.sampler = (stop, threading.Thread(target=sample, name="MetricsSampler", daemon=True))
+        self.sampler[1].start()
+    
+    def stop_sampling(self):
+        if self.sampler is None:
+            return
+        stop, thread = self.sampler
+        stop.set()
+        thread.join()
+        self.sampler = None
+    
+    def snapshot(self):
+        gauges = {}
+        for collector in list(self.collectors.values()):
+            gauges.update(collector())
+        histograms = self.histograms()
+        with self.lock:
+            gauges.update(self.gauges)
+            return {
+                'timestamp': datetime.now().isoformat(timespec='seconds'),
+                'counters': dict(self.counters),
+                'gauges': gauges,
+                'histograms': {stage: histogram.snapshot() for stage, histogram in histograms.items()},
+                'samples': dict(self.stage_samples)
+            }
+    
+    def to_json(self):
+        return json.dumps(self.snapshot(), default=float)
+    
+    def to_prometheus(self):
+        snapshot = self.snapshot()
+        ns = self.namespace
+        lines = []
+        for name, value in sorted(snapshot['counters'].items()):
+            lines += [f"# TYPE {ns}_{name}_total counter", f"{ns}_{name}_total {value}"]
+        for name, value in sorted(snapshot['gauges'].items()):
+            lines += [f"# TYPE {ns}_{name} gauge", f"{ns}_{name} {value}"]
+        
+        if snapshot['histograms']:
+            lines.append(f"# TYPE {ns}_stage_seconds histogram")
+        for stage, histogram in sorted(snapshot['histograms'].items()):
+            cumulative = 0
+            for bound, bucket_count in histogram['buckets'].items():
+                cumulative += bucket_count
+                lines.append(f'{ns}_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'{ns}_stage_seconds_sum{{stage="{stage}"}} {histogram["sum"]}')
+            lines.append(f'{ns}_stage_seconds_count{{stage="{stage}"}} {histogram["count"]}')
+        
+        if snapshot['samples']:
+            lines.append(f"# TYPE {ns}_stage_samples_total counter")
+        for stage, value in sorted(snapshot['samples'].items()):
+            lines.append(f'{ns}_stage_samples_total{{stage="{stage}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+METRICS = MetricsRegistry()
+
+
+# Writes registry snapshots every `interval` seconds: JSON lines are appended
+# (one line per snapshot), Prometheus text replaces the file in place so a
+# node_exporter textfile collector always sees a complete scrape.
+class MetricsExporter:
+    def __init__(self, path, fmt='jsonl', interval=5.0, metrics=None):
+        if fmt not in ('jsonl', 'prometheus'):
+            raise ValueError(f"Unknown metrics format '{fmt}' (expected 'jsonl' or 'prometheus')")
+        self.path = path
+        self.fmt = fmt
+        self.interval = interval
+        self.metrics = metrics if metrics is not None else METRICS
+        self.stop_event = threading.Event()
+        self.thread = None
+    
+    def write(self):
+        if self.fmt == 'jsonl':
+            with open(self.path, 'a') as f:
+                f.write(self.metrics.to_json() + "\n")
+        else:
+            temp_path = self.path + '.tmp'
+            with open(temp_path, 'w') as f:
+                f.write(self.metrics.to_prometheus())
+            os.replace(temp_path, self.path)
+    
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            self.write()
+    
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name="MetricsExporter", daemon=True)
+        self.thread.start()
+        return self
+    
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+        self.write()
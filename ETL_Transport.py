@@ -0,0 +1,616 @@
+import pandas as pd
+import numpy as np
+import threading
+import time
+import os
+import sys
+import io
+import glob
+import json
+import pickle
+import shutil
+from collections import deque
+from datetime import datetime
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+
+ENRICHED_COLUMNS = [
+    'orderID', 'Customer_ID', 'Product_ID', 'quantity', 'date',
+    'Gender', 'Age', 'Occupation', 'City_Category', 'Stay_In_Current_City_Years', 'Marital_Status',
+    'Product_Category', 'price', 'storeID', 'supplierID', 'storeName', 'supplierName',
+    'Total_Revenue'
+]
+
+TRANSACTION_DTYPES = {
+    'orderID': 'int64',
+    'Customer_ID': 'int64',
+    'Product_ID': str,
+    'quantity': 'int64',
+    'date': str
+}
+
+CUSTOMER_ATTRIBUTES = ['Gender', 'Age', 'Occupation', 'City_Category', 'Stay_In_Current_City_Years', 'Marital_Status']
+PRODUCT_ATTRIBUTES = ['Product_Category', 'price$', 'storeID', 'supplierID', 'storeName', 'supplierName']
+
+
+def parse_csv_lines(header, lines):
+    return pd.read_csv(io.BytesIO(header + b''.join(lines)), index_col=0, dtype=TRANSACTION_DTYPES)
+
+
+# Every source reports a JSON-serialisable position after each chunk
+# (chunk.attrs['source_position']) and can be reopened at that position,
+# which is what incremental runs checkpoint and resume from.
+class StreamSource:
+    def __init__(self, chunk_size=5000, start_position=None):
+        self.chunk_size = chunk_size
+        self.start_position = dict(start_position or {})
+        self.position = dict(self.start_position)
+        self.records_read = 0
+    
+    def describe(self):
+        return self.__class__.__name__
+    
+    def read_chunks(self):
+        raise NotImplementedError
+    
+    def chunks(self):
+        for chunk in self.read_chunks():
+            if chunk.empty:
+                continue
+            self.records_read += len(chunk)
+            chunk.attrs['source_position'] = dict(self.position)
+            yield chunk
+
+
+class DataFrameStreamSource(StreamSource):
+    def __init__(self, df, chunk_size=5000, start_position=None):
+        super().__init__(chunk_size, start_position)
+        self.df = df
+    
+    def describe(self):
+        return f"in-memory DataFrame ({len(self.df):,} records)"
+    
+    def read_chunks(self):
+        for start_idx in range(self.start_position.get('offset', 0), len(self.df), self.chunk_size):
+            chunk = self.df.iloc[start_idx:start_idx + self.chunk_size]
+            self.position = {'offset': start_idx + len(chunk)}
+            yield chunk
+
+
+class CsvStreamSource(StreamSource):
+    def __init__(self, path, chunk_size=5000, start_position=None):
+        super().__init__(chunk_size, start_position)
+        self.path = path
+    
+    def describe(self):
+        return f"CSV file {self.path}"
+    
+    def read_chunks(self):
+        with open(self.path, 'rb') as handle:
+            header = handle.readline()
+            offset = max(self.start_position.get('offset', 0), handle.tell())
+            handle.seek(offset)
+            buffered = []
+            
+            while True:
+                lines = handle.readlines(1 << 20)
+                buffered.extend(lines)
+                
+                while len(buffered) >= self.chunk_size or (buffered and not lines):
+                    chunk_lines = buffered[:self.chunk_size]
+                    del buffered[:self.chunk_size]
+                    offset += sum(len(line) for line in chunk_lines)
+                    self.position = {'offset': offset}
+                    yield parse_csv_lines(header, chunk_lines)
+                
+                if not lines:
+                    return
+
+
+# Not seekable: resuming skips the records already consumed.
+class StdinStreamSource(StreamSource):
+    def describe(self):
+        return "stdin"
+    
+    def read_chunks(self):
+        skip = self.start_position.get('offset', 0)
+        consumed = 0
+        for chunk in pd.read_csv(sys.stdin, index_col=0, dtype=TRANSACTION_DTYPES, chunksize=self.chunk_size):
+            consumed += len(chunk)
+            self.position = {'offset': consumed}
+            if consumed <= skip:
+                continue
+            yield chunk.iloc[max(0, len(chunk) - (consumed - skip)):]
+
+
+# Reads rotated files from a directory in name order. With follow=True it
+# keeps polling for new files until nothing arrives for idle_timeout seconds
+# (idle_timeout=None waits forever).
+class DirectoryStreamSource(StreamSource):
+    def __init__(self, directory, pattern='*.csv', chunk_size=5000, follow=False,
+                 poll_interval=1.0, idle_timeout=None, start_position=None):
+        super().__init__(chunk_size, start_position)
+        self.directory = directory
+        self.pattern = pattern
+        self.follow = follow
+        self.poll_interval = poll_interval
+        self.idle_timeout = idle_timeout
+        self.files_read = []
+    
+    def describe(self):
+        return f"directory {os.path.join(self.directory, self.pattern)}{' (follow)' if self.follow else ''}"
+    
+    def read_chunks(self):
+        start_file = self.start_position.get('file', '')
+        seen = set()
+        idle_since = time.time()
+        
+        while True:
+            pending = sorted(path for path in glob.glob(os.path.join(self.directory, self.pattern))
+                             if path not in seen and os.path.basename(path) >= start_file)
+            for path in pending:
+                seen.add(path)
+                self.files_read.append(path)
+                
+                name = os.path.basename(path)
+                file_position = {'offset': self.start_position.get('offset', 0)} if name == start_file else None
+                file_source = CsvStreamSource(path, self.chunk_size, file_position)
+                for chunk in file_source.read_chunks():
+                    self.position = {'file': name, 'offset': file_source.position['offset']}
+                    yield chunk
+            
+            if pending:
+                idle_since = time.time()
+            if not self.follow:
+                return
+            if self.idle_timeout is not None and time.time() - idle_since >= self.idle_timeout:
+                return
+            time.sleep(self.poll_interval)
+
+
+# Follows a file that keeps growing (tail -f). Only complete lines are parsed;
+# a partially written trailing line waits for the next poll.
+class TailStreamSource(StreamSource):
+    def __init__(self, path, chunk_size=5000, poll_interval=1.0, idle_timeout=None, start_position=None):
+        super().__init__(chunk_size, start_position)
+        self.path = path
+        self.poll_interval = poll_interval
+        self.idle_timeout = idle_timeout
+    
+    def describe(self):
+        return f"growing file {self.path} (tail)"
+    
+    def read_chunks(self):
+        with open(self.path, 'rb') as handle:
+            header = handle.readline()
+            while not header.endswith(b'\n'):
+                time.sleep(self.poll_interval)
+                header += handle.readline()
+            
+            offset = max(self.start_position.get('offset', 0), handle.tell())
+            handle.seek(offset)
+            lines = []
+            partial = b''
+            idle_since = time.time()
+            
+            while True:
+                line = handle.readline()
+                if line:
+                    line = partial + line
+                    partial = b''
+                    if not line.endswith(b'\n'):
+                        partial = line
+                        continue
+                    lines.append(line)
+                    idle_since = time.time()
+                    if len(lines) >= self.chunk_size:
+                        offset += sum(len(pending) for pending in lines)
+                        self.position = {'offset': offset}
+                        yield parse_csv_lines(header, lines)
+                        lines = []
+                    continue
+                
+                if lines:
+                    offset += sum(len(pending) for pending in lines)
+                    self.position = {'offset': offset}
+                    yield parse_csv_lines(header, lines)
+                    lines = []
+                if self.idle_timeout is not None and time.time() - idle_since >= self.idle_timeout:
+                    if partial:
+                        offset += len(partial)
+                        self.position = {'offset': offset}
+                        yield parse_csv_lines(header, [partial + b'\n'])
+                    return
+                time.sleep(self.poll_interval)
+
+
+def open_stream_source(spec, chunk_size=5000, follow=False, idle_timeout=None, start_position=None):
+    if isinstance(spec, StreamSource):
+        return spec
+    if isinstance(spec, pd.DataFrame):
+        return DataFrameStreamSource(spec, chunk_size, start_position)
+    if spec == '-':
+        return StdinStreamSource(chunk_size, start_position)
+    if os.path.isdir(spec):
+        return DirectoryStreamSource(spec, chunk_size=chunk_size, follow=follow, idle_timeout=idle_timeout,
+                                     start_position=start_position)
+    if follow:
+        return TailStreamSource(spec, chunk_size, idle_timeout=idle_timeout, start_position=start_position)
+    return CsvStreamSource(spec, chunk_size, start_position)
+
+
+def source_fingerprint(path):
+    status = os.stat(path)
+    return {'path': os.path.abspath(path), 'size': status.st_size, 'mtime_ns': status.st_mtime_ns}
+
+
+STAGE_PARTITION_UNITS = {'year': 'Y', 'month': 'M', 'day': 'D'}
+
+
+# Enriched join output persisted as hive-style date partitions
+# (month=2017-03/part-00000.parquet), so a failed load or a schema change is
+# re-run from the stage instead of re-joining the stream. Each emitted batch
+# becomes an Arrow table with dictionary-encoded text columns, buffered per
+# partition and written as one row group once rows_per_group rows are
+# waiting. The manifest is written last: a stage without one is the remains
+# of an interrupted join and is never read back.
+class EnrichedStage:
+    def __init__(self, directory='enriched_stage', partition_by='month', rows_per_group=65536):
+        if pa is None:
+            raise Exception("pyarrow is not installed (pip install pyarrow)")
+        if partition_by not in STAGE_PARTITION_UNITS:
+            raise ValueError(f"Unknown partition_by '{partition_by}' (expected one of {sorted(STAGE_PARTITION_UNITS)})")
+        
+        self.directory = directory
+        self.partition_by = partition_by
+        self.rows_per_group = rows_per_group
+        self.manifest_path = os.path.join(directory, '_manifest.json')
+        self.manifest = None
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                self.manifest = json.load(f)
+        
+        self.schema = None
+        self.buffers = {}
+        self.buffered_rows = {}
+        self.writers = {}
+        self.stats = {'rows': 0, 'batches': 0, 'partitions': 0, 'row_groups': 0, 'bytes': 0, 'seconds': 0.0}
+    
+    def __len__(self):
+        if self.manifest is not None:
+            return self.manifest['rows']
+        return self.stats['rows']
+    
+    # Text columns become dictionary<int32, string> and the date a date32; the
+    # first batch fixes the schema and later batches are cast to it.
+    def encode(self, joined, dates):
+        table = pa.Table.from_pandas(joined.assign(date=dates), preserve_index=False)
+        if self.schema is None:
+            fields = []
+            for field in table.schema:
+                if field.name == 'date':
+                    field = field.with_type(pa.date32())
+                elif pa.types.is_string(field.type) or pa.types.is_large_string(field.type):
+                    field = field.with_type(pa.dictionary(pa.int32(), pa.string()))
+                fields.append(field)
+            self.schema = pa.schema(fields)
+        return table.cast(self.schema)
+    
+    def append(self, joined):
+        if not len(joined):
+            return
+        start = time.perf_counter()
+        if self.schema is None:
+            self.clear()
+        dates = pd.to_datetime(joined['date']).dt.normalize()
+        table = self.encode(joined, dates)
+        
+        keys = dates.to_numpy().astype(f"datetime64[{STAGE_PARTITION_UNITS[self.partition_by]}]")
+        partitions, inverse = np.unique(keys, return_inverse=True)
+        order = np.argsort(inverse, kind='stable')
+        bounds = np.searchsorted(inverse[order], np.arange(len(partitions) + 1))
+        table = table.take(order)
+        for i, partition in enumerate(np.datetime_as_string(partitions)):
+            self.buffers.setdefault(partition, []).append(table.slice(bounds[i], bounds[i + 1] - bounds[i]))
+            self.buffered_rows[partition] = self.buffered_rows.get(partition, 0) + int(bounds[i + 1] - bounds[i])
+            if self.buffered_rows[partition] >= self.rows_per_group:
+                self.flush(partition)
+        
+        self.stats['rows'] += len(joined)
+        self.stats['batches'] += 1
+        self.stats['seconds'] += time.perf_counter() - start
+    
+    def flush(self, partition):
+        table = pa.concat_tables(self.buffers.pop(partition)).unify_dictionaries().combine_chunks()
+        del self.buffered_rows[partition]
+        writer = self.writers.get(partition)
+        if writer is None:
+            path = os.path.join(self.directory, f"{self.partition_by}={partition}")
+            os.makedirs(path, exist_ok=True)
+            writer = pq.ParquetWriter(os.path.join(path, 'part-00000.parquet'), self.schema, use_dictionary=True)
+            self.writers[partition] = writer
+        writer.write_table(table, row_group_size=len(table))
+        self.stats['row_groups'] += 1
+    
+    def clear(self):
+        if os.path.isdir(self.directory):
+            shutil.rmtree(self.directory)
+        os.makedirs(self.directory)
+        self.manifest = None
+    
+    def close(self):
+        start = time.perf_counter()
+        for partition in list(self.buffers):
+            self.flush(partition)
+        for writer in self.writers.values():
+            writer.close()
+        if self.schema is None:
+            return
+        partitions = sorted(self.writers)
+        self.stats['partitions'] = len(partitions)
+        self.stats['bytes'] = sum(os.path.getsize(path) for path in self.files())
+        self.manifest = {
+            'rows': self.stats['rows'],
+            'columns': self.schema.names,
+            'partition_by': self.partition_by,
+            'partitions': partitions,
+            'row_groups': self.stats['row_groups'],
+            'bytes': self.stats['bytes'],
+            'written_at': datetime.now().isoformat(timespec='seconds')
+        }
+        self.writers = {}
+        with open(self.manifest_path, 'w') as f:
+            json.dump(self.manifest, f, indent=2)
+        self.stats['seconds'] += time.perf_counter() - start
+    
+    def files(self):
+        return sorted(glob.glob(os.path.join(self.directory, f"{self.partition_by}=*", '*.parquet')))
+    
+    def require_manifest(self):
+        if self.manifest is None:
+            raise Exception(f"No complete enriched stage in {self.directory}/ (run the join to write one)")
+    
+    # Only the requested columns are decoded, from memory-mapped files;
+    # filters on the partition column (e.g. [('month', '>=', '2019-01')])
+    # skip whole partitions. Dictionary columns come back as plain strings
+    # that share one object per distinct value.
+    def read(self, columns=None, filters=None):
+        self.require_manifest()
+        columns = list(columns or self.manifest['columns'])
+        table = pq.read_table(self.directory, columns=columns, filters=filters, memory_map=True,
+                              partitioning='hive')
+        return self.decode(table)
+    
+    def head(self, n=5, columns=None):
+        self.require_manifest()
+        batches = pq.ParquetFile(self.files()[0], memory_map=True).iter_batches(batch_size=n, columns=columns)
+        return self.decode(next(batches))
+    
+    def decode(self, table):
+        frame = table.to_pandas(date_as_object=False)
+        for column in frame.columns:
+            if isinstance(frame[column].dtype, pd.CategoricalDtype):
+                frame[column] = frame[column].astype(frame[column].cat.categories.dtype)
+        return frame
+
+
+# Loaders take either an enriched DataFrame or an EnrichedStage, which is
+# read back with only the columns the loader needs.
+def read_enriched(enriched_data, columns):
+    if isinstance(enriched_data, EnrichedStage):
+        return enriched_data.read(columns)
+    return enriched_data
+
+
+# Bounded hand-off of whole record batches (DataFrame chunk references, no
+# copy) between the producer and consumer threads. Synchronisation happens once
+# per batch: put() blocks while `capacity` batches are in flight, which is the
+# producer's backpressure, and get() blocks until a batch arrives or the
+# producer closes the transport, so neither side sleeps or polls.
+class StreamTransport:
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.batches = deque()
+        self.closed = False
+        self.cancelled = False
+        self.condition = threading.Condition()
+        self.peak = 0
+        
+        # Producer-side and consumer-side counters are each written by one thread.
+        self.stats = {
+            'producer_waits': 0,
+            'producer_wait_seconds': 0.0,
+            'consumer_waits': 0,
+            'consumer_wait_seconds': 0.0
+        }
+    
+    def __len__(self):
+        return len(self.batches)
+    
+    def put(self, batch):
+        with self.condition:
+            if self.cancelled:
+                return
+            if len(self.batches) >= self.capacity:
+                started = time.perf_counter()
+                while len(self.batches) >= self.capacity and not self.cancelled:
+                    self.condition.wait()
+                self.stats['producer_waits'] += 1
+                self.stats['producer_wait_seconds'] += time.perf_counter() - started
+                if self.cancelled:
+                    return
+            self.batches.append(batch)
+            self.peak = max(self.peak, len(self.batches))
+            self.condition.notify()
+    
+    def get(self):
+        with self.condition:
+            if not self.batches and not self.closed:
+                started = time.perf_counter()
+                while not self.batches and not self.closed:
+                    self.condition.wait()
+                self.stats['consumer_waits'] += 1
+                self.stats['consumer_wait_seconds'] += time.perf_counter() - started
+            if not self.batches:
+                return None
+            batch = self.batches.popleft()
+            self.condition.notify()
+            return batch
+    
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+    
+    # Downstream failed: drop what is queued and turn further puts into no-ops
+    # so upstream threads are never left blocked on a full transport.
+    def cancel(self):
+        with self.condition:
+            self.cancelled = True
+            self.closed = True
+            self.batches.clear()
+            self.condition.notify_all()
+
+
+# Producer-side batch sizing: a producer blocked on a full transport means the
+# consumer is the bottleneck, so batches grow to amortise per-batch cost; a
+# consumer left waiting on an empty transport means batches shrink so records
+# reach it sooner. Rows are only held back while the consumer is busy.
+class AdaptiveBatcher:
+    def __init__(self, transport, initial, minimum, maximum):
+        self.transport = transport
+        self.target = min(max(initial, minimum), maximum)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.pending = []
+        self.pending_rows = 0
+        self.seen_producer_waits = 0
+        self.seen_consumer_waits = 0
+        self.stats = {'records': 0, 'batches': 0, 'resizes': 0}
+    
+    def add(self, chunk):
+        while len(chunk):
+            take = self.target - self.pending_rows
+            piece, chunk = (chunk, chunk.iloc[:0]) if len(chunk) <= take else (chunk.iloc[:take], chunk.iloc[take:])
+            self.pending.append(piece)
+            self.pending_rows += len(piece)
+            if self.pending_rows >= self.target or len(self.transport) == 0:
+                self.flush()
+    
+    def flush(self):
+        if not self.pending_rows:
+            return
+        batch = self.pending[0] if len(self.pending) == 1 else pd.concat(self.pending)
+        batch.attrs = dict(self.pending[-1].attrs)
+        self.pending = []
+        self.pending_rows = 0
+        
+        self.transport.put(batch)
+        self.stats['records'] += len(batch)
+        self.stats['batches'] += 1
+        self.adapt()
+    
+    def adapt(self):
+        producer_waits = self.transport.stats['producer_waits']
+        consumer_waits = self.transport.stats['consumer_waits']
+        target = self.target
+        if producer_waits > self.seen_producer_waits:
+            target = min(target * 2, self.maximum)
+        elif consumer_waits > self.seen_consumer_waits:
+            target = max(target // 2, self.minimum)
+        if target != self.target:
+            self.target = target
+            self.stats['resizes'] += 1
+        self.seen_producer_waits = producer_waits
+        self.seen_consumer_waits = consumer_waits
+
+
+# FIFO overflow for pending stream tuples. Records are pickled with a length
+# prefix into append-only segment files, read back in arrival order, and each
+# segment is deleted once it has been fully read.
+class SpillQueue:
+    def __init__(self, directory, segment_bytes=64 * 1024 * 1024):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.segments = deque()
+        self.writer = None
+        self.reader = None
+        self.next_segment = 0
+        self.count = 0
+        
+        self.stats = {
+            'spilled': 0,
+            'unspilled': 0,
+            'spill_bytes': 0,
+            'segments': 0,
+            'peak_backlog': 0
+        }
+    
+    def __len__(self):
+        return self.count
+    
+    def open_segment(self):
+        if self.writer is not None:
+            self.writer.close()
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"segment_{self.next_segment:06d}.spill")
+        self.next_segment += 1
+        self.writer = open(path, 'wb')
+        self.segments.append(path)
+        self.stats['segments'] += 1
+    
+    def append(self, record):
+        payload = pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL)
+        if self.writer is None or self.writer.tell() >= self.segment_bytes:
+            self.open_segment()
+        self.writer.write(len(payload).to_bytes(4, 'little'))
+        self.writer.write(payload)
+        
+        self.count += 1
+        self.stats['spilled'] += 1
+        self.stats['spill_bytes'] += len(payload) + 4
+        self.stats['peak_backlog'] = max(self.stats['peak_backlog'], self.count)
+    
+    def popleft(self):
+        if not self.count:
+            raise IndexError("pop from an empty SpillQueue")
+        
+        while True:
+            if self.reader is None:
+                self.reader = open(self.segments[0], 'rb')
+            if self.segments[0] == self.writer.name:
+                self.writer.flush()
+            header = self.reader.read(4)
+            if header:
+                break
+            # End of a segment the writer has moved past.
+            self.reader.close()
+            os.remove(self.segments.popleft())
+            self.reader = None
+        
+        record = pickle.loads(self.reader.read(int.from_bytes(header, 'little')))
+        self.count -= 1
+        self.stats['unspilled'] += 1
+        if not self.count:
+            self.reset()
+        return record
+    
+    # Fully drained: older segments are already gone, so the active one is
+    # truncated and reused instead of creating a file per burst.
+    def reset(self):
+        self.writer.seek(0)
+        self.writer.truncate()
+        self.reader.seek(0)
+    
+    def close(self):
+        for handle in (self.reader, self.writer):
+            if handle is not None:
+                handle.close()
+        self.reader = self.writer = None
+        while self.segments:
+            os.remove(self.segments.popleft())
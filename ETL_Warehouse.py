@@ -0,0 +1,559 @@
+import pandas as pd
+import numpy as np
+import time
+import re
+import sqlite3
+import copy
+
+from ETL_Metrics import METRICS
+from ETL_Analytics import AGGREGATE_MEASURES, AGGREGATE_SPECS
+from ETL_Loaders import (ConnectionPool, DIMENSION_SPECS, DimensionCache, aggregate_rebuild_statements,
+                         archive_fact_months, configure_loader_session, dimension_frames,
+                         fact_partition_boundaries, find_sql_server_connection, get_connection_details,
+                         load_fact_table_bulk, load_fact_table_parallel, load_fact_table_switch,
+                         merge_aggregates, rebuild_aggregates, resolve_surrogate_keys, upsert_dimensions,
+                         verify_data, write_product_affinity)
+
+try:
+    import pyodbc
+except ImportError:
+    pyodbc = None
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+
+def split_tsql_batches(script):
+    batch = []
+    for line in script.splitlines():
+        if line.strip().upper() == 'GO':
+            yield '\n'.join(batch)
+            batch = []
+        else:
+            batch.append(line)
+    if batch:
+        yield '\n'.join(batch)
+
+
+# SQL Server DATEPART parts (and their abbreviations) as DuckDB EXTRACT
+# fields and SQLite strftime expressions. DATEPART(weekday) counts from
+# Sunday = 1 (the default DATEFIRST 7); EXTRACT(DOW) and %w count from 0.
+DATEPART_NAMES = {'yy': 'year', 'yyyy': 'year', 'qq': 'quarter', 'q': 'quarter', 'mm': 'month', 'm': 'month',
+                  'dd': 'day', 'd': 'day', 'dy': 'dayofyear', 'y': 'dayofyear', 'dw': 'weekday'}
+DATEPART_DUCKDB = {'year': 'EXTRACT(YEAR FROM {0})', 'quarter': 'EXTRACT(QUARTER FROM {0})',
+                   'month': 'EXTRACT(MONTH FROM {0})', 'day': 'EXTRACT(DAY FROM {0})',
+                   'dayofyear': 'EXTRACT(DOY FROM {0})', 'weekday': '(EXTRACT(DOW FROM {0}) + 1)'}
+DATEPART_SQLITE = {'year': "CAST(strftime('%Y', {0}) AS INTEGER)",
+                   'quarter': "((CAST(strftime('%m', {0}) AS INTEGER) + 2) / 3)",
+                   'month': "CAST(strftime('%m', {0}) AS INTEGER)", 'day': "CAST(strftime('%d', {0}) AS INTEGER)",
+                   'dayofyear': "CAST(strftime('%j', {0}) AS INTEGER)",
+                   'weekday': "(CAST(strftime('%w', {0}) AS INTEGER) + 1)"}
+
+
+# The text between a call's parentheses (`start` is just past the opening
+# one) and the position just past its closing parenthesis.
+def call_arguments(sql, start):
+    depth = 1
+    for position in range(start, len(sql)):
+        depth += {'(': 1, ')': -1}.get(sql[position], 0)
+        if depth == 0:
+            return sql[start:position], position + 1
+    raise ValueError(f"Unbalanced parentheses in T-SQL: {sql[start:start + 60]}...")
+
+
+def translate_datepart(sql, engine):
+    templates = DATEPART_DUCKDB if engine == 'duckdb' else DATEPART_SQLITE
+    while True:
+        match = re.search(r'\bDATEPART\s*\(', sql, re.IGNORECASE)
+        if match is None:
+            return sql
+        arguments, end = call_arguments(sql, match.end())
+        part, expression = [argument.strip() for argument in arguments.split(',', 1)]
+        part = DATEPART_NAMES.get(part.lower(), part.lower())
+        if part not in templates:
+            raise ValueError(f"DATEPART({part}, ...) has no {engine} translation")
+        sql = sql[:match.start()] + templates[part].format(expression) + sql[end:]
+
+
+# SELECT TOP n on the outer query becomes a trailing LIMIT n; a TOP inside a
+# subquery has no such rewrite.
+def translate_top(statement):
+    match = re.search(r'\bSELECT\s+(DISTINCT\s+)?TOP\s*\(?\s*(\d+)\s*\)?\s+', statement, re.IGNORECASE)
+    if match is None:
+        return statement
+    prefix = statement[:match.start()]
+    if prefix.count('(') != prefix.count(')'):
+        raise ValueError("TOP inside a subquery has no LIMIT translation; rank with ROW_NUMBER() instead")
+    return f"{prefix}SELECT {match.group(1) or ''}{statement[match.end():]}\nLIMIT {match.group(2)}"
+
+
+# Rewrites the SQL Server scripts in this repo into statements DuckDB and
+# SQLite accept: database, partition and USE/PRINT batches are skipped,
+# OBJECT_ID guards become IF EXISTS, IDENTITY keys become plain integer keys
+# (SKs are assigned by the loader) and the dbo schema prefix is dropped.
+# ISNULL, DATEPART and SELECT TOP are rewritten for ad-hoc queries.
+def translate_tsql(script, engine):
+    statements = []
+    for batch in split_tsql_batches(script):
+        if re.search(r'\b(CREATE DATABASE|sys\.databases|sys\.partition_\w+)\b', batch) or re.match(r'\s*USE\s', batch):
+            continue
+        
+        lines = [line for line in batch.splitlines()
+                 if not re.match(r'\s*(PRINT\b|--)', line) and not re.match(r'\s*USE\s', line)]
+        sql = '\n'.join(lines)
+        
+        sql = re.sub(r"IF OBJECT_ID\('(?:dbo\.)?(\w+)', 'U'\) IS NOT NULL\s+DROP TABLE (?:dbo\.)?\w+;",
+                     r'DROP TABLE IF EXISTS \1;', sql)
+        sql = re.sub(r"IF OBJECT_ID\('(?:dbo\.)?(\w+)', 'V'\) IS NOT NULL\s+DROP VIEW (?:dbo\.)?\w+;",
+                     r'DROP VIEW IF EXISTS \1;', sql)
+        sql = re.sub(r'INT PRIMARY KEY IDENTITY\(1,\s*1\)', 'INTEGER PRIMARY KEY', sql)
+        sql = re.sub(r'\b(NON)?CLUSTERED\s+', '', sql)
+        sql = sql.replace('dbo.', '')
+        sql = re.sub(r'\bISNULL\s*\(', 'COALESCE(', sql, flags=re.IGNORECASE)
+        sql = translate_datepart(sql, engine)
+        if engine == 'duckdb':
+            sql = re.sub(r'\bSTDEV\(', 'STDDEV_SAMP(', sql)
+        
+        for statement in sql.split(';'):
+            if statement.strip():
+                statements.append(translate_top(statement.strip()))
+    return statements
+
+
+def load_olap_queries(path='olap_queries.sql', engine='duckdb'):
+    with open(path) as handle:
+        statements = translate_tsql(handle.read(), engine)
+    return [(f"Q{number}", statement) for number, statement in enumerate(statements, 1)]
+
+
+class SampleStdev:
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+    
+    def step(self, value):
+        if value is None:
+            return
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+    
+    def finalize(self):
+        if self.count < 2:
+            return None
+        return (self.m2 / (self.count - 1)) ** 0.5
+
+
+class WarehouseBackend:
+    name = 'warehouse'
+    
+    def load_dimensions(self, enriched_data, verbose=True):
+        raise NotImplementedError
+    
+    # Upserts the batch's dimension rows and returns its fact rows with
+    # surrogate keys resolved; unresolved rows are counted in attrs.
+    def resolve_dimensions(self, enriched_data):
+        self.load_dimensions(enriched_data, verbose=False)
+        fact, failed = resolve_surrogate_keys(enriched_data, self.dimension_cache.key_maps())
+        fact.attrs['unresolved'] = failed
+        return fact
+    
+    # A second handle on the same warehouse for loading facts from another
+    # thread, or None when the backend cannot open one.
+    def open_loader(self):
+        return None
+    
+    def load_fact_table(self, enriched_data):
+        raise NotImplementedError
+    
+    # Moves the months before before_date_sk out of Fact_Sales; only the
+    # partitioned SQL Server layout supports it.
+    def archive_fact_months(self, before_date_sk, verbose=True):
+        raise NotImplementedError(f"{self.name} cannot archive fact months")
+    
+    def verify_data(self):
+        raise NotImplementedError
+    
+    def merge_aggregates(self, aggregates):
+        raise NotImplementedError
+    
+    def rebuild_aggregates(self, aggregates):
+        raise NotImplementedError
+    
+    def write_product_affinity(self, affinity, verbose=True):
+        raise NotImplementedError
+    
+    def close(self):
+        pass
+
+
+class SqlServerWarehouse(WarehouseBackend):
+    name = 'SQL Server'
+    
+    # pool_size > 1 loads facts over that many pooled connections, partitioned
+    # by partition_by; pooled and loader connections reuse the connection
+    # string found by the driver probe. When create_columnstore_fact.sql is
+    # installed, facts are loaded by partition switch instead.
+    def __init__(self, conn=None, details=None, pool_size=1, partition_by='Date_SK', connection_string=None):
+        if conn is None and connection_string is None:
+            details = details or get_connection_details()
+            conn, connection_string = find_sql_server_connection(details)
+        self.connection_string = connection_string
+        self.conn = conn if conn is not None else self.connect()
+        self.details = details
+        self.partition_by = partition_by
+        self.pool = ConnectionPool(self.connect, pool_size, configure_loader_session) if connection_string else None
+        self.dimension_cache = None
+        self.fact_boundaries = fact_partition_boundaries(self.conn)
+    
+    def connect(self):
+        return pyodbc.connect(self.connection_string, timeout=10)
+    
+    def load_dimensions(self, enriched_data, verbose=True):
+        self.dimension_cache = upsert_dimensions(self.conn, enriched_data, self.dimension_cache, verbose)
+    
+    def open_loader(self):
+        if self.connection_string is None:
+            return None
+        return SqlServerWarehouse(details=self.details, pool_size=self.pool.size, partition_by=self.partition_by,
+                                  connection_string=self.connection_string)
+    
+    def load_fact_table(self, enriched_data, **options):
+        key_maps = self.dimension_cache.key_maps() if self.dimension_cache else None
+        if self.fact_boundaries:
+            options.pop('commit_interval', None)
+            options.pop('method', None)
+            result = load_fact_table_switch(self.conn, enriched_data, key_maps=key_maps,
+                                            boundaries=self.fact_boundaries, **options)
+            self.fact_boundaries = fact_partition_boundaries(self.conn)
+            return result
+        if self.pool is not None and self.pool.size > 1:
+            options.pop('commit_interval', None)
+            options.pop('method', None)
+            return load_fact_table_parallel(self.pool, enriched_data, key_maps=key_maps,
+                                            partition_by=self.partition_by, **options)
+        return load_fact_table_bulk(self.conn, enriched_data, key_maps=key_maps, **options)
+    
+    def archive_fact_months(self, before_date_sk, verbose=True):
+        if not self.fact_boundaries:
+            raise Exception("Archiving needs the partitioned Fact_Sales layout (run create_columnstore_fact.sql)")
+        return archive_fact_months(self.conn, before_date_sk, verbose)
+    
+    def verify_data(self):
+        verify_data(self.conn)
+    
+    def merge_aggregates(self, aggregates):
+        merge_aggregates(self.conn, aggregates)
+    
+    def rebuild_aggregates(self, aggregates):
+        rebuild_aggregates(self.conn, aggregates)
+    
+    def write_product_affinity(self, affinity, verbose=True):
+        return write_product_affinity(self.conn, affinity, verbose)
+    
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+        self.conn.close()
+
+
+# Single-file warehouse for CI boxes and laptops. Uses DuckDB when installed
+# (columnar, runs the whole OLAP suite) and falls back to the stdlib sqlite3,
+# which has no ROLLUP.
+class EmbeddedWarehouse(WarehouseBackend):
+    def __init__(self, path=None, engine=None, schema_path='create_star_schema.sql', reset=False):
+        if engine is None:
+            engine = 'duckdb' if duckdb is not None else 'sqlite'
+        if engine not in ('duckdb', 'sqlite'):
+            raise ValueError(f"Unknown engine '{engine}' (expected 'duckdb' or 'sqlite')")
+        if engine == 'duckdb' and duckdb is None:
+            raise Exception("duckdb is not installed (pip install duckdb)")
+        
+        self.engine = engine
+        self.name = f"embedded {engine}"
+        self.path = path or ('November2025DW.duckdb' if engine == 'duckdb' else 'November2025DW.sqlite3')
+        self.dimension_cache = DimensionCache()
+        
+        if engine == 'duckdb':
+            self.conn = duckdb.connect(self.path)
+        else:
+            self.conn = sqlite3.connect(self.path, check_same_thread=False)
+            self.conn.create_aggregate('STDEV', 1, SampleStdev)
+        
+        print(f"\nEmbedded warehouse: {self.engine} at {self.path}")
+        if reset or not self.table_exists('Fact_Sales'):
+            self.create_schema(schema_path)
+    
+    def table_exists(self, table):
+        if self.engine == 'duckdb':
+            query = "SELECT COUNT(*) FROM information_schema.tables WHERE table_name = ?"
+        else:
+            query = "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = ?"
+        return self.conn.execute(query, [table]).fetchone()[0] > 0
+    
+    def create_schema(self, schema_path='create_star_schema.sql'):
+        with open(schema_path) as handle:
+            statements = translate_tsql(handle.read(), self.engine)
+        for statement in statements:
+            self.conn.execute(statement)
+        self.conn.commit()
+        print(f"   Created star schema from {schema_path} ({len(statements)} statements)")
+    
+    def max_key(self, table, column):
+        return self.conn.execute(f"SELECT COALESCE(MAX({column}), 0) FROM {table}").fetchone()[0]
+    
+    def append_frame(self, table, frame):
+        if frame.empty:
+            return
+        if self.engine == 'duckdb':
+            self.conn.register('append_batch', frame)
+            self.conn.execute(f"INSERT INTO {table} ({', '.join(frame.columns)}) "
+                              f"SELECT {', '.join(frame.columns)} FROM append_batch")
+            self.conn.unregister('append_batch')
+        else:
+            rows = list(zip(*(frame[column].tolist() for column in frame.columns)))
+            self.conn.executemany(f"INSERT INTO {table} ({', '.join(frame.columns)}) "
+                                  f"VALUES ({', '.join('?' for _ in frame.columns)})", rows)
+    
+    def storage_frame(self, dimension, frame):
+        frame = frame.copy()
+        for column, sql_type in DIMENSION_SPECS[dimension]['columns']:
+            if sql_type == 'DATE':
+                frame[column] = frame[column].dt.date if self.engine == 'duckdb' else frame[column].dt.strftime('%Y-%m-%d')
+        return frame
+    
+    def load_dimensions(self, enriched_data, verbose=True):
+        log = print if verbose else (lambda *args, **kwargs: None)
+        log("\n" + "="*80)
+        log(f"LOADING DIMENSION TABLES ({self.name.upper()})")
+        log("="*80)
+        
+        for dimension, frame in dimension_frames(enriched_data).items():
+            spec = DIMENSION_SPECS[dimension]
+            if dimension not in self.dimension_cache.frames:
+                self.dimension_cache.seed(self.conn, dimension, schema='')
+            
+            new_rows, changed_rows = self.dimension_cache.diff(dimension, frame)
+            
+            first_sk = self.max_key(dimension, spec['surrogate_key']) + 1
+            new_rows = new_rows.copy()
+            new_rows.insert(0, spec['surrogate_key'], np.arange(first_sk, first_sk + len(new_rows), dtype='int64'))
+            self.append_frame(dimension, self.storage_frame(dimension, new_rows))
+            
+            if not changed_rows.empty:
+                attributes = [column for column, _ in spec['columns'][1:]]
+                stored = self.storage_frame(dimension, changed_rows)
+                self.conn.executemany(
+                    f"UPDATE {dimension} SET {', '.join(f'{column} = ?' for column in attributes)} "
+                    f"WHERE {spec['natural_key']} = ?",
+                    list(zip(*(stored[column].tolist() for column in attributes + [spec['natural_key']]))))
+            self.conn.commit()
+            
+            cached = self.dimension_cache.frames[dimension]
+            changed_sks = changed_rows[spec['natural_key']].map(
+                pd.Series(cached[spec['surrogate_key']].to_numpy(), index=cached[spec['natural_key']].to_numpy()))
+            merged_keys = list(zip(new_rows[spec['natural_key']].tolist(), new_rows[spec['surrogate_key']].tolist()))
+            merged_keys += list(zip(changed_rows[spec['natural_key']].tolist(), changed_sks.astype('int64').tolist()))
+            self.dimension_cache.apply(dimension, pd.concat([new_rows.drop(columns=spec['surrogate_key']), changed_rows],
+                                                            ignore_index=True), merged_keys)
+            
+            log(f"   {dimension}: {len(new_rows):,} new | {len(changed_rows):,} changed | "
+                f"{len(self.dimension_cache.frames[dimension]):,} total")
+        
+        log("="*80)
+    
+    # DuckDB hands out per-thread connections to the same database via
+    # cursor(); SQLite gets a second connection that waits on the write lock.
+    def open_loader(self):
+        loader = copy.copy(self)
+        loader.dimension_cache = DimensionCache()
+        if self.engine == 'duckdb':
+            loader.conn = self.conn.cursor()
+        else:
+            self.conn.execute("PRAGMA busy_timeout = 60000")
+            loader.conn = sqlite3.connect(self.path, timeout=60, check_same_thread=False)
+            loader.conn.create_aggregate('STDEV', 1, SampleStdev)
+        return loader
+    
+    def existing_order_ids(self, order_ids):
+        batch = pd.DataFrame({'Order_ID': pd.unique(order_ids)})
+        if self.engine == 'duckdb':
+            self.conn.register('order_batch', batch)
+            rows = self.conn.execute("SELECT DISTINCT f.Order_ID FROM Fact_Sales f "
+                                     "JOIN order_batch b ON f.Order_ID = b.Order_ID").fetchall()
+            self.conn.unregister('order_batch')
+        else:
+            self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS order_batch (Order_ID INTEGER)")
+            self.conn.execute("DELETE FROM order_batch")
+            self.conn.executemany("INSERT INTO order_batch VALUES (?)", [(order_id,) for order_id in batch['Order_ID'].tolist()])
+            rows = self.conn.execute("SELECT DISTINCT f.Order_ID FROM Fact_Sales f "
+                                     "JOIN order_batch b ON f.Order_ID = b.Order_ID").fetchall()
+        return {row[0] for row in rows}
+    
+    def load_fact_table(self, enriched_data, batch_size=100000, idempotent=False, fact=None, failed=0, verbose=True):
+        log = print if verbose else (lambda *args, **kwargs: None)
+        log("\n" + "="*80)
+        log(f"BULK APPENDING FACT_SALES ({self.name.upper()})")
+        log("="*80)
+        
+        start_time = time.time()
+        if fact is None:
+            fact, failed = resolve_surrogate_keys(enriched_data, self.dimension_cache.key_maps())
+        fact = fact.copy()
+        skipped = 0
+        if idempotent and not fact.empty:
+            fact = fact.drop_duplicates('Order_ID', keep='last')
+            existing = fact['Order_ID'].isin(self.existing_order_ids(fact['Order_ID']))
+            skipped = int(existing.sum())
+            fact = fact[~existing]
+        first_sk = self.max_key('Fact_Sales', 'Sales_SK') + 1
+        fact.insert(0, 'Sales_SK', np.arange(first_sk, first_sk + len(fact), dtype='int64'))
+        
+        for start_idx in range(0, len(fact), batch_size):
+            with METRICS.timer('db_commit'):
+                self.append_frame('Fact_Sales', fact.iloc[start_idx:start_idx + batch_size])
+                self.conn.commit()
+            METRICS.increment('db_commits')
+        METRICS.increment('facts_loaded', len(fact))
+        
+        elapsed_time = time.time() - start_time
+        rows_per_second = len(fact) / elapsed_time if elapsed_time else 0.0
+        log(f"\nAppended {len(fact):,} transactions in {elapsed_time:.2f}s ({rows_per_second:,.0f} rows/second)")
+        if skipped:
+            log(f"   {skipped:,} rows were already loaded (skipped by Order_ID)")
+        if failed:
+            log(f"   {failed:,} rows failed surrogate key resolution and were not loaded")
+        log("="*80)
+        
+        return {
+            'loaded': len(fact),
+            'new_order_ids': fact['Order_ID'].tolist(),
+            'skipped_existing': skipped,
+            'failed_resolution': failed,
+            'elapsed': elapsed_time,
+            'rows_per_second': rows_per_second
+        }
+    
+    def verify_data(self):
+        verify_data(self.conn, schema='')
+    
+    def merge_aggregates(self, aggregates):
+        print("\n" + "="*80)
+        print(f"MERGING STREAM AGGREGATES INTO SUMMARY TABLES ({self.name.upper()})")
+        print("="*80)
+        
+        for table, frame in aggregates.frames().items():
+            if frame.empty:
+                continue
+            
+            keys = [column for column, _ in AGGREGATE_SPECS[table]]
+            measures = [column for column, _ in AGGREGATE_MEASURES]
+            columns = keys + measures
+            upsert = (f"ON CONFLICT ({', '.join(keys)}) DO UPDATE SET "
+                      f"{', '.join(f'{column} = {table}.{column} + excluded.{column}' for column in measures)}")
+            
+            if self.engine == 'duckdb':
+                self.conn.register('aggregate_batch', frame[columns])
+                self.conn.execute(f"INSERT INTO {table} ({', '.join(columns)}) "
+                                  f"SELECT {', '.join(columns)} FROM aggregate_batch {upsert}")
+                self.conn.unregister('aggregate_batch')
+            else:
+                self.conn.executemany(f"INSERT INTO {table} ({', '.join(columns)}) "
+                                      f"VALUES ({', '.join('?' for _ in columns)}) {upsert}",
+                                      list(zip(*(frame[column].tolist() for column in columns))))
+            self.conn.commit()
+            print(f"   {table}: merged {len(frame):,} groups")
+        
+        print("="*80)
+    
+    def rebuild_aggregates(self, aggregates):
+        print("\n" + "="*80)
+        print(f"REBUILDING SUMMARY TABLE GROUPS FROM FACT_SALES ({self.name.upper()})")
+        print("="*80)
+        
+        archive = self.table_exists('Fact_Sales_Archive')
+        for table in AGGREGATE_SPECS:
+            if aggregates is None:
+                for statement in aggregate_rebuild_statements(table, None, schema='', archive=archive):
+                    self.conn.execute(statement)
+                self.conn.commit()
+                print(f"   {table}: rebuilt every group")
+                continue
+            
+            frame = aggregates.frame(table)
+            if frame.empty:
+                continue
+            
+            keys = [column for column, _ in AGGREGATE_SPECS[table]]
+            if self.engine == 'duckdb':
+                self.conn.begin()
+                self.conn.register('aggregate_keys', frame[keys])
+            else:
+                self.conn.execute(f"CREATE TEMP TABLE aggregate_keys "
+                                  f"({', '.join(f'{column} {sql_type}' for column, sql_type in AGGREGATE_SPECS[table])})")
+                self.conn.executemany(f"INSERT INTO aggregate_keys VALUES ({', '.join('?' for _ in keys)})",
+                                      list(zip(*(frame[column].tolist() for column in keys))))
+            for statement in aggregate_rebuild_statements(table, 'aggregate_keys', schema='', archive=archive):
+                self.conn.execute(statement)
+            if self.engine == 'duckdb':
+                self.conn.unregister('aggregate_keys')
+            else:
+                self.conn.execute("DROP TABLE aggregate_keys")
+            self.conn.commit()
+            print(f"   {table}: rebuilt {len(frame):,} groups")
+        
+        print("="*80)
+    
+    def write_product_affinity(self, affinity, verbose=True):
+        frame, products = affinity.changes()
+        if not products:
+            return 0
+        
+        columns = 'Product_ID, Related_Product_ID, Co_Purchase_Count, Partner_Rank'
+        if self.engine == 'duckdb':
+            self.conn.register('affinity_products', pd.DataFrame({'Product_ID': products}))
+            self.conn.execute("DELETE FROM Product_Affinity WHERE Product_ID IN (SELECT Product_ID FROM affinity_products)")
+            self.conn.unregister('affinity_products')
+            self.conn.register('affinity_batch', frame)
+            self.conn.execute(f"INSERT INTO Product_Affinity ({columns}) SELECT {columns} FROM affinity_batch")
+            self.conn.unregister('affinity_batch')
+        else:
+            self.conn.executemany("DELETE FROM Product_Affinity WHERE Product_ID = ?", [(product,) for product in products])
+            self.conn.executemany(f"INSERT INTO Product_Affinity ({columns}) VALUES (?, ?, ?, ?)",
+                                  list(zip(*(frame[column].tolist() for column in frame.columns))))
+        self.conn.commit()
+        
+        if verbose:
+            print(f"   Product_Affinity: refreshed top-{affinity.top_k} partners for {len(products):,} products "
+                  f"({len(frame):,} rows)")
+        return len(frame)
+    
+    def run_olap_queries(self, path='olap_queries.sql'):
+        print("\n" + "="*80)
+        print(f"RUNNING OLAP QUERY SUITE ({self.name.upper()})")
+        print("="*80 + "\n")
+        
+        timings = []
+        total_start = time.time()
+        for name, query in load_olap_queries(path, self.engine):
+            if self.engine == 'sqlite' and 'ROLLUP(' in query:
+                print(f"   {name:<4} skipped (ROLLUP is not supported by SQLite)")
+                timings.append({'query': name, 'rows': None, 'seconds': None})
+                continue
+            
+            start_time = time.time()
+            rows = self.conn.execute(query).fetchall()
+            elapsed_time = time.time() - start_time
+            timings.append({'query': name, 'rows': len(rows), 'seconds': elapsed_time})
+            print(f"   {name:<4} {len(rows):>8,} rows  {elapsed_time*1000:>9.1f} ms")
+        
+        print(f"\n   Total: {time.time() - total_start:.2f} seconds")
+        print("="*80)
+        return timings
+    
+    def close(self):
+        self.conn.close()
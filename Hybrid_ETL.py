@@ -1,568 +1,639 @@
 import pandas as pd
-import pyodbc
+import argparse
 import threading
-import queue
 import time
-import getpass
-from collections import deque
+import os
+import sys
+import json
+import re
+import contextlib
 from datetime import datetime
 import warnings
 warnings.filterwarnings('ignore')
 
+from ETL_Metrics import METRICS, MetricsExporter
+from ETL_Transport import ENRICHED_COLUMNS, TRANSACTION_DTYPES, EnrichedStage, StreamTransport, open_stream_source, pa
+from ETL_Analytics import (ANOMALY_ALLOWED_LATENESS_DAYS, ANOMALY_Z_THRESHOLD, AlertSink, ProductAffinity,
+                           RevenueAnomalyDetector, StreamingAggregates)
+from ETL_Join import HybridJoinThreaded, execute_join_parallel
+from ETL_Loaders import apply_aggregates
+from ETL_Warehouse import EmbeddedWarehouse, SqlServerWarehouse
 
-class HybridJoinThreaded:
-    def __init__(self, hash_slots=10000, queue_size=5000, disk_partition_size=500):
-        self.hash_slots = hash_slots
-        self.queue_size = queue_size
-        self.disk_partition_size = disk_partition_size
-        
-        self.hash_table = {}
-        self.processing_queue = deque(maxlen=queue_size)
-        self.result = []
-        
-        self.stream_buffer = queue.Queue(maxsize=10000)
-        self.producer_finished = threading.Event()
-        self.lock = threading.Lock()
-        
-        self.stats = {
-            'processed': 0,
-            'joined': 0,
-            'dropped': 0,
-            'hash_hits': 0,
-            'queue_hits': 0
+
+# Persisted high-water mark of an incremental run: the stream position after
+# the last committed batch plus the largest orderID and date loaded so far.
+# Rows are filtered against the watermarks saved when the run started; the
+# ones advanced during the run only take effect from the next run, since the
+# stream itself is in no particular orderID or date order.
+#
+# The checkpoint is also the manifest of the join state saved with it. State
+# files are written under names carrying the committed batch count
+# (affinity_state.12.npz), the checkpoint naming them is renamed into place
+# last, and only then are the previous files removed. A crash anywhere before
+# that rename leaves the previous checkpoint and its own files in place, so
+# the stream position and the state a resumed run starts from always agree.
+class EtlCheckpoint:
+    def __init__(self, path='etl_checkpoint.json'):
+        self.path = path
+        self.state = {
+            'source': None,
+            'position': {},
+            'max_orderID': None,
+            'max_date': None,
+            'batches_committed': 0,
+            'rows_loaded': 0,
+            'state_files': {},
+            'updated_at': None
         }
-    
-    def load_master_data_to_disk(self, customer_df, product_df):
-        print("Loading Master Data to Disk Buffer...")
-        
-        self.customer_dict = {}
-        for _, cust_row in customer_df.iterrows():
-            self.customer_dict[cust_row['Customer_ID']] = cust_row.to_dict()
+        if os.path.exists(path):
+            with open(path) as handle:
+                self.state.update(json.load(handle))
+        for name, state_path in self.state['state_files'].items():
+            if not os.path.exists(state_path):
+                raise RuntimeError(f"Checkpoint {path} lists {name} state {state_path}, which is missing; "
+                                   f"restore it or delete the checkpoint to reload from the start")
+        self.run_watermarks = {key: self.state[key] for key in ('max_orderID', 'max_date')}
+    
+    def state_file(self, name):
+        return self.state['state_files'].get(name)
+    
+    def bind(self, source_description):
+        if self.state['source'] not in (None, source_description):
+            print(f"   Checkpoint was taken on {self.state['source']}; restarting from the beginning of "
+                  f"{source_description} (orderID/date watermarks still apply)")
+            self.state['position'] = {}
+        self.state['source'] = source_description
+    
+    def new_rows(self, chunk, watermark):
+        max_order, max_date = self.run_watermarks['max_orderID'], self.run_watermarks['max_date']
+        if watermark == 'orderID' and max_order is not None:
+            return chunk[chunk['orderID'] > max_order]
+        if watermark == 'date' and max_date is not None:
+            return chunk[pd.to_datetime(chunk['date']) >= pd.Timestamp(max_date)]
+        return chunk
+    
+    def advance(self, chunk, rows_loaded):
+        self.state['position'] = dict(chunk.attrs.get('source_position', {}))
+        self.state['batches_committed'] += 1
+        self.state['rows_loaded'] += rows_loaded
+        if not chunk.empty:
+            max_order = int(chunk['orderID'].max())
+            max_date = pd.to_datetime(chunk['date']).max().strftime('%Y-%m-%d')
+            if self.state['max_orderID'] is None or max_order > self.state['max_orderID']:
+                self.state['max_orderID'] = max_order
+            if self.state['max_date'] is None or max_date > self.state['max_date']:
+                self.state['max_date'] = max_date
+    
+    # `states` maps a name to (object with save(path), base path).
+    def save(self, states=None):
+        states = states or {}
+        for name, (owner, base_path) in states.items():
+            root, extension = os.path.splitext(base_path)
+            state_path = f"{root}.{self.state['batches_committed']}{extension}"
+            owner.save(state_path)
+            self.state['state_files'][name] = state_path
         
-        self.product_dict = {}
-        for _, prod_row in product_df.iterrows():
-            self.product_dict[prod_row['Product_ID']] = prod_row.to_dict()
+        self.state['updated_at'] = datetime.now().isoformat(timespec='seconds')
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w') as handle:
+            json.dump(self.state, handle, indent=2)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(temp_path, self.path)
         
-        print(f"Loaded {len(self.customer_dict)} customers and {len(self.product_dict)} products")
-        return self
-    
-    def hash_function(self, customer_id, product_id):
-        combined_key = f"{customer_id}_{product_id}"
-        return hash(combined_key) % self.hash_slots
+        # Files of earlier checkpoints, and of saves a crash cut short.
+        for name, (_, base_path) in states.items():
+            root, extension = os.path.splitext(base_path)
+            versioned = re.compile(re.escape(os.path.basename(root)) + r'\.\d+' + re.escape(extension) + '$')
+            for entry in os.listdir(os.path.dirname(root) or '.'):
+                entry_path = os.path.join(os.path.dirname(root), entry)
+                if versioned.match(entry) and entry_path != self.state['state_files'][name]:
+                    os.remove(entry_path)
+
+
+def run_incremental_etl(warehouse, customer_df, product_df, source_spec, checkpoint_path='etl_checkpoint.json',
+                        checkpoint_every=10, watermark='offset', follow=False, idle_timeout=None,
+                        maintain_aggregates=True, affinity_state_path='affinity_state.npz',
+                        anomaly_state_path='anomaly_state.npz', **join_config):
+    if watermark not in ('offset', 'orderID', 'date'):
+        raise ValueError(f"Unknown watermark '{watermark}' (expected 'offset', 'orderID' or 'date')")
+    
+    join_config = dict(join_config, join_mode='batch')
+    hybrid_join = HybridJoinThreaded(**join_config)
+    hybrid_join.load_master_data_to_disk(customer_df, product_df)
     
-    def producer_thread(self, transactional_df):
-        print("\nTHREAD 1 (PRODUCER): Started - Feeding stream buffer...")
-        
-        batch_size = 1000
-        total_records = len(transactional_df)
-        
-        for start_idx in range(0, total_records, batch_size):
-            end_idx = min(start_idx + batch_size, total_records)
-            batch = transactional_df.iloc[start_idx:end_idx]
-            
-            for _, row in batch.iterrows():
-                stream_tuple = row.to_dict()
-                
-                self.stream_buffer.put(stream_tuple)
-                
-                with self.lock:
-                    self.stats['processed'] += 1
-            
-            time.sleep(0.001)
-            
-            if (start_idx // batch_size) % 50 == 0:
-                print(f"   Producer: Fed {end_idx:,}/{total_records:,} records into stream buffer")
-        
-        self.producer_finished.set()
-        print("\nTHREAD 1 (PRODUCER): Finished - All data fed into stream buffer")
+    checkpoint = EtlCheckpoint(checkpoint_path)
+    
+    # Affinity counts distinct customer/product purchases, so replayed batches
+    # are absorbed without double counting; its state is saved with the checkpoint.
+    # The revenue detector's running totals and open days are saved with it
+    # too, so a resumed run neither forgets nor re-adds rows.
+    states = {}
+    affinity = None
+    if affinity_state_path:
+        affinity = ProductAffinity(state_path=checkpoint.state_file('affinity'))
+        states['affinity'] = (affinity, affinity_state_path)
+    anomalies = hybrid_join.anomalies if anomaly_state_path else None
+    if anomalies is not None:
+        if checkpoint.state_file('anomalies'):
+            anomalies.load(checkpoint.state_file('anomalies'))
+        states['anomalies'] = (anomalies, anomaly_state_path)
+    source = open_stream_source(source_spec, hybrid_join.batch_size, follow=follow, idle_timeout=idle_timeout)
+    checkpoint.bind(source.describe())
+    source = open_stream_source(source_spec, hybrid_join.batch_size, follow=follow, idle_timeout=idle_timeout,
+                                start_position=checkpoint.state['position'])
     
-    def consumer_thread(self):
-        print("\nTHREAD 2 (CONSUMER): Started - Running HYBRIDJOIN algorithm...")
-        
-        processed_count = 0
+    print("\n" + "="*80)
+    print("INCREMENTAL HYBRIDJOIN ETL")
+    print("="*80)
+    print(f"\nSource: {source.describe()}")
+    print(f"Resuming from: {checkpoint.state['position'] or 'start of stream'} "
+          f"({checkpoint.state['batches_committed']:,} batches / {checkpoint.state['rows_loaded']:,} rows already loaded)")
+    print(f"Watermark: {watermark} | Checkpoint every {checkpoint_every} committed batches\n")
+    
+    start_time = time.time()
+    run_batches = 0
+    run_rows = 0
+    skipped_rows = 0
+    
+    for chunk in source.chunks():
+        new_chunk = checkpoint.new_rows(chunk, watermark)
+        skipped_rows += len(chunk) - len(new_chunk)
         
-        while True:
-            try:
-                stream_tuple = self.stream_buffer.get(timeout=0.1)
-                
-                self.process_stream_tuple(stream_tuple)
-                processed_count += 1
+        joined = hybrid_join.join_batch(new_chunk, count_processed=True)
+        if hybrid_join.anomalies is not None:
+            hybrid_join.anomalies.update(joined)
+        loaded = 0
+        if not joined.empty:
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                warehouse.load_dimensions(joined)
+                load_result = warehouse.load_fact_table(joined, idempotent=True)
+                loaded = load_result['loaded']
                 
-                if processed_count % 1000 == 0:
-                    self.load_disk_partition()
-                    
-                    if processed_count % 10000 == 0:
-                        with self.lock:
-                            print(f"   Consumer: Processed {processed_count:,} | "
-                                  f"Joined: {self.stats['joined']:,} | "
-                                  f"Hash: {len(self.hash_table):,} slots | "
-                                  f"Queue: {len(self.processing_queue):,}")
-                
-                self.stream_buffer.task_done()
-                
-            except queue.Empty:
-                if self.producer_finished.is_set():
-                    self.load_disk_partition()
-                    break
+                # A replayed batch (facts committed before a crash, aggregates
+                # maybe not) loads fewer rows than it joined, so its groups
+                # are rebuilt from Fact_Sales rather than merged again.
+                if maintain_aggregates:
+                    aggregates = StreamingAggregates()
+                    aggregates.update(joined)
+                    apply_aggregates(warehouse, aggregates, load_result)
+                if affinity is not None:
+                    affinity.update(joined)
+                    warehouse.write_product_affinity(affinity)
         
-        print("\nTHREAD 2 (CONSUMER): Finished - HYBRIDJOIN complete")
-    
-    def process_stream_tuple(self, stream_tuple):
-        customer_id = stream_tuple['Customer_ID']
-        product_id = stream_tuple['Product_ID']
-        hash_key = self.hash_function(customer_id, product_id)
-        print(customer_id,product_id,hash_key)
-        with self.lock:
-            if hash_key in self.hash_table:
-                master_record = self.hash_table[hash_key]
-                joined_record = self.perform_join(stream_tuple, master_record)
-                if joined_record:
-                    self.result.append(joined_record)
-                    self.stats['joined'] += 1
-                    self.stats['hash_hits'] += 1
-            else:
-                self.processing_queue.append(stream_tuple)
-    
-    def load_disk_partition(self):
-        if not self.processing_queue:
-            return
+        checkpoint.advance(chunk, loaded)
+        run_batches += 1
+        run_rows += loaded
         
-        with self.lock:
-            tuples_to_process = list(self.processing_queue)[:self.disk_partition_size]
-            self.processing_queue.clear()
-        
-        for stream_tuple in tuples_to_process:
-            customer_id = stream_tuple['Customer_ID']
-            product_id = stream_tuple['Product_ID']
-            
-            if customer_id in self.customer_dict and product_id in self.product_dict:
-                customer_data = self.customer_dict[customer_id]
-                product_data = self.product_dict[product_id]
-                
-                master_record = {**customer_data, **product_data}
-                hash_key = self.hash_function(customer_id, product_id)
-                
-                with self.lock:
-                    self.hash_table[hash_key] = master_record
-                    
-                    joined_record = self.perform_join(stream_tuple, master_record)
-                    if joined_record:
-                        self.result.append(joined_record)
-                        self.stats['joined'] += 1
-                        self.stats['queue_hits'] += 1
-            else:
-                with self.lock:
-                    self.stats['dropped'] += 1
-    
-    def perform_join(self, stream_tuple, master_record):
+        if run_batches % checkpoint_every == 0:
+            checkpoint.save(states)
+            print(f"   Checkpoint: {checkpoint.state['batches_committed']:,} batches | "
+                  f"{checkpoint.state['rows_loaded']:,} rows loaded | position {checkpoint.state['position']}")
+    
+    checkpoint.save(states)
+    elapsed_time = time.time() - start_time
+    
+    print(f"\nIncremental run complete: {run_batches:,} batches, {run_rows:,} new facts loaded "
+          f"in {elapsed_time:.2f}s")
+    print(f"   Joined: {hybrid_join.stats['joined']:,} | Dropped (No Match): {hybrid_join.stats['dropped']:,} | "
+          f"Below watermark: {skipped_rows:,}")
+    print(f"   High-water mark: orderID {checkpoint.state['max_orderID']} | date {checkpoint.state['max_date']}")
+    print("="*80)
+    
+    return checkpoint
+
+
+# One thread per pipeline stage: takes batches from `inbox`, applies `work`
+# and forwards the result to `outbox`. Busy time is measured per stage; time
+# spent waiting on an empty inbox or a full outbox is the stage's stall.
+class PipelineStage:
+    def __init__(self, name, work, inbox, outbox=None, metrics=None):
+        self.name = name
+        self.work = work
+        self.inbox = inbox
+        self.outbox = outbox
+        self.metrics = metrics if metrics is not None else METRICS
+        self.error = None
+        self.thread = None
+        self.stats = {'batches': 0, 'records': 0, 'busy_seconds': 0.0}
+    
+    def run(self):
         try:
-            quantity = stream_tuple['quantity']
-            price = master_record.get('price$', 0)
-            total_revenue = quantity * price
-            
-            joined = {
-                'orderID': stream_tuple['orderID'],
-                'Customer_ID': stream_tuple['Customer_ID'],
-                'Product_ID': stream_tuple['Product_ID'],
-                'quantity': quantity,
-                'date': stream_tuple['date'],
-                
-                'Gender': master_record.get('Gender', 'Unknown'),
-                'Age': master_record.get('Age', 'Unknown'),
-                'Occupation': master_record.get('Occupation', 0),
-                'City_Category': master_record.get('City_Category', 'Unknown'),
-                'Stay_In_Current_City_Years': master_record.get('Stay_In_Current_City_Years', 0),
-                'Marital_Status': master_record.get('Marital_Status', 0),
-                
-                'Product_Category': master_record.get('Product_Category', 'Unknown'),
-                'price': price,
-                'storeID': master_record.get('storeID', 0),
-                'supplierID': master_record.get('supplierID', 0),
-                'storeName': master_record.get('storeName', 'Unknown'),
-                'supplierName': master_record.get('supplierName', 'Unknown'),
-                
-                'Total_Revenue': total_revenue
-            }
-            print(joined)
-            return joined
+            while True:
+                batch = self.inbox.get()
+                if batch is None:
+                    break
+                started = time.perf_counter()
+                with self.metrics.timer(f"pipeline_{self.name}"):
+                    result = self.work(batch)
+                self.stats['busy_seconds'] += time.perf_counter() - started
+                self.stats['batches'] += 1
+                self.stats['records'] += len(batch)
+                if self.outbox is not None and result is not None:
+                    self.outbox.put(result)
         except Exception as e:
-            print(f"Join error: {e}")
-            return None
+            self.error = e
+            self.inbox.cancel()
+        finally:
+            if self.outbox is not None:
+                self.outbox.close()
+    
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name=f"{self.name.title()}Stage")
+        self.thread.start()
+        return self
     
-    def execute_join_threaded(self, transactional_df):
-        print("\n" + "="*80)
-        print("EXECUTING MULTI-THREADED HYBRIDJOIN ALGORITHM")
-        print("="*80)
-        print(f"\nStream Input: {len(transactional_df):,} transactional records")
-        print(f"Disk Buffer: {len(self.customer_dict):,} customers × {len(self.product_dict):,} products")
-        print(f"Configuration:")
-        print(f"   • Hash Table Size: {self.hash_slots:,} slots")
-        print(f"   • Queue Capacity: {self.queue_size:,} tuples")
-        print(f"   • Stream Buffer Size: 10,000 tuples (thread-safe)")
-        print(f"   • Disk Partition Size: {self.disk_partition_size:,} tuples/load")
-        print("\n" + "─"*80)
-        
-        producer = threading.Thread(
-            target=self.producer_thread,
-            args=(transactional_df,),
-            name="ProducerThread"
-        )
-        
-        consumer = threading.Thread(
-            target=self.consumer_thread,
-            name="ConsumerThread"
-        )
-        
-        start_time = time.time()
-        
-        producer.start()
-        consumer.start()
-        
-        producer.join()
-        consumer.join()
-        
-        elapsed_time = time.time() - start_time
-        
-        print("\n" + "─"*80)
-        print(f"\nMULTI-THREADED HYBRIDJOIN COMPLETE!")
-        print(f"\nFinal Statistics:")
-        print(f"   • Total Records Processed: {self.stats['processed']:,}")
-        print(f"   • Successfully Joined: {self.stats['joined']:,} ({(self.stats['joined']/self.stats['processed']*100):.2f}%)")
-        print(f"   • Dropped (No Match): {self.stats['dropped']:,} ({(self.stats['dropped']/self.stats['processed']*100):.2f}%)")
-        print(f"   • Hash Table Hits: {self.stats['hash_hits']:,}")
-        print(f"   • Queue Processing Hits: {self.stats['queue_hits']:,}")
-        print(f"   • Hash Table Utilization: {len(self.hash_table):,} / {self.hash_slots:,} slots ({(len(self.hash_table)/self.hash_slots*100):.2f}%)")
-        print(f"   • Execution Time: {elapsed_time:.2f} seconds")
-        print(f"   • Throughput: {(self.stats['processed']/elapsed_time):,.0f} records/second")
-        print("="*80)
-        
-        return pd.DataFrame(self.result)
+    def join(self):
+        self.thread.join()
 
 
-def get_connection_details():
+def execute_pipelined_etl(warehouse, customer_source, product_source, source_spec, channel_capacity=4,
+                          follow=False, idle_timeout=None, idempotent=False, **join_config):
     print("\n" + "="*80)
-    print("SQL SERVER CONNECTION SETUP")
+    print(f"PIPELINED JOIN -> DIMENSIONS -> FACTS ({warehouse.name.upper()})")
     print("="*80)
     
-    print("\nEnter SQL Server Connection Details:")
-    print("   (Press Enter for default values shown in brackets)")
-    print("")
-    
-    server = input("Server name [localhost\\SQLEXPRESS]: ").strip()
-    if not server:
-        server = "localhost\\SQLEXPRESS"
-    
-    database = input("Database name [November2025DW]: ").strip()
-    if not database:
-        database = "November2025DW"
-    
-    print("\nAuthentication Type:")
-    print("  1. Windows Authentication (Trusted Connection)")
-    print("  2. SQL Server Authentication (Username/Password)")
-    
-    auth_choice = input("Select authentication type [1]: ").strip()
-    if not auth_choice:
-        auth_choice = "1"
-    
-    username = None
-    password = None
-    
-    if auth_choice == "2":
-        username = input("Username [sa]: ").strip()
-        if not username:
-            username = "sa"
-        password = getpass.getpass("Password: ")
+    hybrid_join = HybridJoinThreaded(**join_config)
+    hybrid_join.load_master_data_to_disk(customer_source, product_source)
+    source = open_stream_source(source_spec, hybrid_join.batch_size, follow=follow, idle_timeout=idle_timeout)
+    
+    # Facts are loaded over a second connection so dimension merges and fact
+    # inserts overlap; backends without one share the connection under a lock.
+    loader = warehouse.open_loader()
+    database_lock = contextlib.nullcontext() if loader is not None else threading.Lock()
+    fact_warehouse = loader if loader is not None else warehouse
+    
+    joined_channel = StreamTransport(channel_capacity)
+    fact_channel = StreamTransport(channel_capacity)
+    hybrid_join.output = joined_channel
+    
+    def resolve(batch):
+        with database_lock:
+            return warehouse.resolve_dimensions(batch)
+    
+    def load(fact):
+        with database_lock:
+            result = fact_warehouse.load_fact_table(None, fact=fact, failed=fact.attrs.get('unresolved', 0),
+                                                    idempotent=idempotent, verbose=False)
+        load_totals['loaded'] += result['loaded']
+        load_totals['failed_resolution'] += result['failed_resolution']
+        load_totals['skipped_existing'] += result['skipped_existing']
+    
+    load_totals = {'loaded': 0, 'failed_resolution': 0, 'skipped_existing': 0}
+    stages = [PipelineStage('dimensions', resolve, joined_channel, fact_channel),
+              PipelineStage('facts', load, fact_channel)]
+    join_report = {'error': None}
+    
+    def run_join():
+        try:
+            hybrid_join.execute_join_threaded(source)
+        except Exception as e:
+            join_report['error'] = e
+        finally:
+            joined_channel.close()
+    
+    start_time = time.time()
+    join_thread = threading.Thread(target=run_join, name="JoinStage")
+    for stage in stages:
+        stage.start()
+    join_thread.start()
+    join_thread.join()
+    join_elapsed = time.time() - start_time
+    for stage in stages:
+        stage.join()
+    elapsed_time = time.time() - start_time
+    
+    if loader is not None:
+        loader.close()
+    errors = [error for error in [join_report['error']] + [stage.error for stage in stages] if error is not None]
+    if errors:
+        raise errors[0]
+    if hybrid_join.aggregates is not None:
+        apply_aggregates(warehouse, hybrid_join.aggregates, load_totals)
+    if hybrid_join.affinity is not None:
+        warehouse.write_product_affinity(hybrid_join.affinity)
+    
+    join_stall = joined_channel.stats['producer_wait_seconds']
+    rows = [('join', hybrid_join.consumer_stats['batches'], hybrid_join.stats['processed'],
+             join_elapsed - join_stall, 0.0, join_stall)]
+    for stage in stages:
+        rows.append((stage.name, stage.stats['batches'], stage.stats['records'], stage.stats['busy_seconds'],
+                     stage.inbox.stats['consumer_wait_seconds'],
+                     stage.outbox.stats['producer_wait_seconds'] if stage.outbox is not None else 0.0))
+    
+    print("\n" + "─"*80)
+    print(f"\n{'Stage':<12} {'Batches':>8} {'Records':>12} {'Busy s':>9} {'Records/s':>12} {'Starved s':>10} {'Blocked s':>10}")
+    for name, batches, records, busy, starved, blocked in rows:
+        rate = records / busy if busy > 0 else 0.0
+        print(f"{name:<12} {batches:>8,} {records:>12,} {busy:>9.2f} {rate:>12,.0f} {starved:>10.2f} {blocked:>10.2f}")
+    print(f"\nLoaded {load_totals['loaded']:,} facts | Unresolved: {load_totals['failed_resolution']:,} | "
+          f"Already loaded: {load_totals['skipped_existing']:,}")
+    print(f"Wall clock: {elapsed_time:.2f}s | Slowest stage busy: {max(row[3] for row in rows):.2f}s | "
+          f"Sum of stages: {sum(row[3] for row in rows):.2f}s")
+    print("="*80)
     
-    return server, database, auth_choice, username, password
+    return {
+        'stages': {name: {'batches': batches, 'records': records, 'busy_seconds': busy,
+                          'starved_seconds': starved, 'blocked_seconds': blocked}
+                   for name, batches, records, busy, starved, blocked in rows},
+        'join': dict(hybrid_join.stats),
+        'load': load_totals,
+        'elapsed': elapsed_time
+    }
 
 
-def connect_to_sql_server():
-    server, database, auth_choice, username, password = get_connection_details()
-    
-    print("\nConnecting to SQL Server...")
-    print(f"   Server: {server}")
-    print(f"   Database: {database}")
-    print(f"   Authentication: {'Windows' if auth_choice == '1' else 'SQL Server'}")
-    
-    drivers = [
-        "ODBC Driver 18 for SQL Server",
-        "ODBC Driver 17 for SQL Server",
-        "SQL Server",
-        "SQL Server Native Client 11.0"
-    ]
-    
-    for driver in drivers:
-        try:
-            if auth_choice == "1":
-                conn_str = f"DRIVER={{{driver}}};SERVER={server};DATABASE={database};Trusted_Connection=yes;"
-                if "18" in driver:
-                    conn_str += "TrustServerCertificate=yes;"
-            else:
-                conn_str = f"DRIVER={{{driver}}};SERVER={server};DATABASE={database};UID={username};PWD={password};"
-                if "18" in driver:
-                    conn_str += "TrustServerCertificate=yes;"
-            
-            conn = pyodbc.connect(conn_str, timeout=10)
-            print(f"   Connected successfully using: {driver}")
-            return conn
-        except Exception as e:
-            continue
-    
-    print("\nCould not connect to SQL Server.")
-    print("\nPlease check:")
-    print("  1. SQL Server Express is running")
-    print("  2. Server name is correct (e.g., localhost\\SQLEXPRESS)")
-    print("  3. Database 'November2025DW' exists (run create_star_schema.sql first)")
-    print("  4. Credentials are correct (if using SQL Auth)")
-    print("  5. ODBC Driver is installed")
-    raise Exception("Database connection failed")
+# YYYY-MM as the Date_SK of that month's first day.
+def month_date_key(value):
+    match = re.fullmatch(r'(\d{4})-(\d{2})', value)
+    if not match or not 1 <= int(match.group(2)) <= 12:
+        raise argparse.ArgumentTypeError(f"expected YYYY-MM, got '{value}'")
+    return int(match.group(1)) * 10000 + int(match.group(2)) * 100 + 1
 
 
-def load_dimensions(conn, enriched_data):
-    print("\n" + "="*80)
-    print("LOADING DIMENSION TABLES TO SQL SERVER")
-    print("="*80)
-    cursor = conn.cursor()
-    
-    print("\nDim_Customer:")
-    customers = enriched_data[['Customer_ID', 'Gender', 'Age', 'Occupation', 
-                                'City_Category', 'Stay_In_Current_City_Years', 'Marital_Status']].drop_duplicates()
-    
-    for idx, (_, row) in enumerate(customers.iterrows(), 1):
-        cursor.execute("""
-            IF NOT EXISTS (SELECT 1 FROM dbo.Dim_Customer WHERE Customer_ID = ?)
-            INSERT INTO dbo.Dim_Customer (Customer_ID, Gender, Age, Occupation, City_Category, Stay_In_Current_City_Years, Marital_Status)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, row['Customer_ID'], row['Customer_ID'], row['Gender'], row['Age'], 
-             row['Occupation'], row['City_Category'], row['Stay_In_Current_City_Years'], row['Marital_Status'])
-        if idx % 500 == 0 or idx == len(customers):
-            print(f"   Progress: {idx:,}/{len(customers):,}", end='\r')
-    conn.commit()
-    print(f"\n   Loaded {len(customers):,} customers")
-    
-    print("\nDim_Product:")
-    products = enriched_data[['Product_ID', 'Product_Category', 'price']].drop_duplicates()
-    
-    for idx, (_, row) in enumerate(products.iterrows(), 1):
-        cursor.execute("""
-            IF NOT EXISTS (SELECT 1 FROM dbo.Dim_Product WHERE Product_ID = ?)
-            INSERT INTO dbo.Dim_Product (Product_ID, Product_Category, Price)
-            VALUES (?, ?, ?)
-        """, row['Product_ID'], row['Product_ID'], row['Product_Category'], float(row['price']))
-        if idx % 500 == 0 or idx == len(products):
-            print(f"   Progress: {idx:,}/{len(products):,}", end='\r')
-    conn.commit()
-    print(f"\n   Loaded {len(products):,} products")
-    
-    print("\nDim_Date:")
-    enriched_data['date'] = pd.to_datetime(enriched_data['date'])
-    dates = enriched_data[['date']].drop_duplicates()
-    
-    for idx, (_, row) in enumerate(dates.iterrows(), 1):
-        date_val = row['date']
-        cursor.execute("""
-            IF NOT EXISTS (SELECT 1 FROM dbo.Dim_Date WHERE Date = ?)
-            INSERT INTO dbo.Dim_Date (Date, Year, Month, Day, Quarter, Day_of_Week, Day_Name, Day_Type, Month_Name)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, date_val, date_val, date_val.year, date_val.month, date_val.day, 
-             (date_val.month - 1) // 3 + 1, date_val.weekday(), 
-             date_val.strftime('%A'), 'Weekend' if date_val.weekday() >= 5 else 'Weekday',
-             date_val.strftime('%B'))
-        if idx % 200 == 0 or idx == len(dates):
-            print(f"   Progress: {idx:,}/{len(dates):,}", end='\r')
-    conn.commit()
-    print(f"\n   Loaded {len(dates):,} dates")
-    
-    print("\nDim_Store:")
-    stores = enriched_data[['storeID', 'storeName']].drop_duplicates()
-    for _, row in stores.iterrows():
-        cursor.execute("""
-            IF NOT EXISTS (SELECT 1 FROM dbo.Dim_Store WHERE Store_ID = ?)
-            INSERT INTO dbo.Dim_Store (Store_ID, Store_Name)
-            VALUES (?, ?)
-        """, int(row['storeID']), int(row['storeID']), row['storeName'])
-    conn.commit()
-    print(f"   Loaded {len(stores):,} stores")
-    
-    print("\nDim_Supplier:")
-    suppliers = enriched_data[['supplierID', 'supplierName']].drop_duplicates()
-    for _, row in suppliers.iterrows():
-        cursor.execute("""
-            IF NOT EXISTS (SELECT 1 FROM dbo.Dim_Supplier WHERE Supplier_ID = ?)
-            INSERT INTO dbo.Dim_Supplier (Supplier_ID, Supplier_Name)
-            VALUES (?, ?)
-        """, int(row['supplierID']), int(row['supplierID']), row['supplierName'])
-    conn.commit()
-    print(f"   Loaded {len(suppliers):,} suppliers")
-    
-    print("\n" + "="*80)
-    cursor.close()
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Multi-threaded HYBRIDJOIN ETL into the Walmart data warehouse")
+    # Transactions are streamed: a CSV file (default), a directory of rotating
+    # files or '-' for stdin. Master data is opened from the memory-mapped
+    # snapshots in disk_buffer/, rebuilt only when a master CSV changes.
+    parser.add_argument('transactions', nargs='?', default='transactional_data.csv',
+                        help="transaction CSV, directory of rotating CSVs, or - for stdin")
+    parser.add_argument('--customers', default='customer_master_data.csv')
+    parser.add_argument('--products', default='product_master_data.csv')
+    parser.add_argument('--follow', action='store_true', help="keep tailing a growing file or directory")
+    
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--incremental', action='store_true',
+                      help="load batch by batch and resume from etl_checkpoint.json")
+    mode.add_argument('--pipelined', action='store_true',
+                      help="overlap the join, dimension upserts and fact loading")
+    mode.add_argument('--from-stage', action='store_true',
+                      help="load the last complete enriched stage without re-joining")
+    mode.add_argument('--rebuild-aggregates', action='store_true',
+                      help="recompute the summary tables from Fact_Sales and Fact_Sales_Archive")
+    parser.add_argument('--watermark', choices=['offset', 'orderID', 'date'], default='offset',
+                        help="with --incremental, also skip rows behind the high-water mark of earlier runs")
+    
+    # --join-mode=tuple runs HYBRIDJOIN proper (hash table, partition queue
+    # and oldest-key partition reads); the default batch mode resolves each
+    # stream batch with vectorised snapshot lookups.
+    parser.add_argument('--join-mode', choices=['batch', 'tuple'], default='batch')
+    parser.add_argument('--join-workers', type=int, default=1,
+                        help="join a transaction CSV in N processes sharded by Customer_ID")
+    parser.add_argument('--trace-tuples', action='store_true')
+    
+    parser.add_argument('--stage', default='enriched_stage', help="directory for the staged join output")
+    parser.add_argument('--stage-partition', choices=['year', 'month', 'day'], default='month')
+    parser.add_argument('--no-stage', action='store_true', help="keep the join output in memory")
+    
+    parser.add_argument('--embedded', action='store_true', help="load a local DuckDB/SQLite warehouse")
+    parser.add_argument('--fact-loaders', type=int, default=4, help="pooled SQL Server connections for Fact_Sales")
+    parser.add_argument('--partition-by', choices=['Date_SK', 'Store_SK'], default='Date_SK')
+    parser.add_argument('--archive-before', type=month_date_key, metavar='YYYY-MM',
+                        help="switch older months out to Fact_Sales_Archive after the load")
+    
+    parser.add_argument('--metrics', metavar='FILE', help="export metrics as JSON lines, or Prometheus text for *.prom")
+    parser.add_argument('--metrics-interval', type=float, default=5.0)
+    parser.add_argument('--profile', default='', metavar='STAGES', help="comma-separated stages to run under cProfile")
+    parser.add_argument('--sample-stages', action='store_true')
+    
+    parser.add_argument('--alerts', default='revenue_alerts.jsonl', metavar='FILE')
+    parser.add_argument('--alert-z', type=float, default=ANOMALY_Z_THRESHOLD)
+    parser.add_argument('--alert-lateness', type=int, default=ANOMALY_ALLOWED_LATENESS_DAYS, metavar='DAYS',
+                        help="how far out of date order the stream may run before a day is scored")
+    
+    args = parser.parse_args(argv)
+    # The incremental and pipelined loaders join the stream themselves.
+    if args.join_workers > 1 and (args.incremental or args.pipelined):
+        parser.error("--join-workers cannot be combined with --incremental or --pipelined")
+    if args.join_workers > 1 and (args.follow or not os.path.isfile(args.transactions)):
+        parser.error("--join-workers needs a transaction CSV file (no directory, stdin or --follow)")
+    return args
 
 
-def load_fact_table(conn, enriched_data):
+def main(argv=None):
+    args = parse_args(argv)
+    
     print("\n" + "="*80)
-    print("LOADING FACT_SALES TABLE")
+    print(" "*15 + "WALMART DATA WAREHOUSE")
+    print(" "*10 + "MULTI-THREADED HYBRIDJOIN ETL PIPELINE")
     print("="*80)
-    print("\nThis may take 2-5 minutes...")
     
-    cursor = conn.cursor()
-    enriched_data['date'] = pd.to_datetime(enriched_data['date'])
+    print(f"\nMaster Data: {args.customers}, {args.products}")
+    print(f"   Transactions: streamed from {args.transactions}")
     
-    batch_size = 1000
-    total_rows = len(enriched_data)
+    exporter = None
+    if args.metrics:
+        fmt = 'prometheus' if args.metrics.endswith('.prom') else 'jsonl'
+        exporter = MetricsExporter(args.metrics, fmt, args.metrics_interval).start()
+    profile_stages = [stage for stage in args.profile.split(',') if stage]
+    METRICS.enable_profiling(profile_stages)
+    if args.sample_stages:
+        METRICS.start_sampling()
     
-    print(f"\nTotal Records: {total_rows:,}\n")
+    # Daily product revenue spikes are flagged while the stream is joined and
+    # appended to the alerts file (raise --alert-lateness for unsorted input).
+    alerts = AlertSink(args.alerts)
+    detector = RevenueAnomalyDetector(alerts, args.alert_z, allowed_lateness=args.alert_lateness)
     
-    for start_idx in range(0, total_rows, batch_size):
-        end_idx = min(start_idx + batch_size, total_rows)
-        batch = enriched_data.iloc[start_idx:end_idx]
-        
-        for _, row in batch.iterrows():
-            cursor.execute("""
-                INSERT INTO dbo.Fact_Sales (Order_ID, Customer_SK, Product_SK, Date_SK, Store_SK, Supplier_SK, Quantity, Total_Revenue)
-                SELECT 
-                    ?,
-                    c.Customer_SK,
-                    p.Product_SK,
-                    d.Date_SK,
-                    s.Store_SK,
-                    sup.Supplier_SK,
-                    ?,
-                    ?
-                FROM dbo.Dim_Customer c
-                CROSS JOIN dbo.Dim_Product p
-                CROSS JOIN dbo.Dim_Date d
-                CROSS JOIN dbo.Dim_Store s
-                CROSS JOIN dbo.Dim_Supplier sup
-                WHERE c.Customer_ID = ?
-                  AND p.Product_ID = ?
-                  AND d.Date = ?
-                  AND s.Store_ID = ?
-                  AND sup.Supplier_ID = ?
-            """, int(row['orderID']), int(row['quantity']), float(row['Total_Revenue']),
-                 int(row['Customer_ID']), row['Product_ID'], row['date'],
-                 int(row['storeID']), int(row['supplierID']))
-        
-        conn.commit()
-        progress = (end_idx / total_rows) * 100
-        print(f"Progress: {end_idx:,}/{total_rows:,} [{progress:5.1f}%]", end='\r')
-    
-    print(f"\n\nSuccessfully loaded {total_rows:,} transactions")
-    print("="*80)
-    cursor.close()
+    try:
+        run_pipeline(args, detector)
+    finally:
+        alerts.close()
+        if alerts.stats['alerts']:
+            print(f"\n{alerts.stats['alerts']:,} revenue alerts written to {alerts.path}")
+        METRICS.stop_sampling()
+        if exporter is not None:
+            exporter.stop()
+            print(f"\nMetrics written to {args.metrics}")
+        if profile_stages:
+            print(f"Stage profiles written to {METRICS.write_profiles('profiles')}/")
 
 
-def verify_data(conn):
-    print("\n" + "="*80)
-    print("DATA VERIFICATION")
-    print("="*80)
-    cursor = conn.cursor()
-    
-    cursor.execute("SELECT COUNT(*) FROM dbo.Dim_Customer")
-    cust_count = cursor.fetchone()[0]
-    
-    cursor.execute("SELECT COUNT(*) FROM dbo.Dim_Product")
-    prod_count = cursor.fetchone()[0]
-    
-    cursor.execute("SELECT COUNT(*) FROM dbo.Dim_Date")
-    date_count = cursor.fetchone()[0]
-    
-    cursor.execute("SELECT COUNT(*) FROM dbo.Dim_Store")
-    store_count = cursor.fetchone()[0]
-    
-    cursor.execute("SELECT COUNT(*) FROM dbo.Dim_Supplier")
-    supp_count = cursor.fetchone()[0]
-    
-    cursor.execute("SELECT COUNT(*) FROM dbo.Fact_Sales")
-    fact_count = cursor.fetchone()[0]
-    
-    cursor.execute("SELECT SUM(Total_Revenue) FROM dbo.Fact_Sales")
-    total_revenue = cursor.fetchone()[0]
-    
-    print("\nDimension Tables:")
-    print(f"   Dim_Customer:  {cust_count:>7,} records")
-    print(f"   Dim_Product:   {prod_count:>7,} records")
-    print(f"   Dim_Date:      {date_count:>7,} records")
-    print(f"   Dim_Store:     {store_count:>7,} records")
-    print(f"   Dim_Supplier:  {supp_count:>7,} records")
-    
-    print(f"\nFact Table:")
-    print(f"   Fact_Sales:    {fact_count:>7,} transactions")
-    
-    if total_revenue:
-        print(f"\nBusiness Metrics:")
-        print(f"   Total Revenue:    ${total_revenue:>12,.2f}")
-        print(f"   Avg Transaction:  ${(total_revenue/fact_count):>12,.2f}")
-    
-    print("\n" + "="*80)
-    cursor.close()
+def open_warehouse(args):
+    if args.embedded:
+        return EmbeddedWarehouse()
+    return SqlServerWarehouse(pool_size=args.fact_loaders, partition_by=args.partition_by)
 
 
-def main():
-    print("\n" + "="*80)
-    print(" "*15 + "WALMART DATA WAREHOUSE")
-    print(" "*10 + "MULTI-THREADED HYBRIDJOIN ETL PIPELINE")
-    print("="*80)
+# Archiving switches whole months out, so it needs the partitioned SQL
+# Server layout.
+def archive_old_months(warehouse, args):
+    if args.archive_before:
+        warehouse.archive_fact_months(args.archive_before)
+
+
+# The join output is staged as date-partitioned Parquet when pyarrow is
+# installed; without it (or with --no-stage) it is kept in memory.
+def open_enriched_stage(args):
+    if not args.from_stage and (args.no_stage or pa is None):
+        return None
+    return EnrichedStage(args.stage, args.stage_partition)
+
+
+def run_pipeline(args, detector=None):
+    customer_source, product_source = args.customers, args.products
+    source_spec, follow = args.transactions, args.follow
     
-    print("\nLoading CSV Files...")
-    customer_df = pd.read_csv('customer_master_data.csv', index_col=0)
-    product_df = pd.read_csv('product_master_data.csv', index_col=0)
-    transactional_df = pd.read_csv('transactional_data.csv', index_col=0)
+    if args.rebuild_aggregates:
+        try:
+            warehouse = open_warehouse(args)
+            warehouse.rebuild_aggregates(None)
+            warehouse.close()
+        except Exception as e:
+            print(f"\nRebuilding the summary tables failed: {e}")
+            sys.exit(1)
+        return
     
-    print(f"   Customers: {len(customer_df):,}")
-    print(f"   Products: {len(product_df):,}")
-    print(f"   Transactions: {len(transactional_df):,}")
+    if args.incremental:
+        try:
+            warehouse = open_warehouse(args)
+            run_incremental_etl(warehouse, customer_source, product_source, source_spec, follow=follow,
+                                watermark=args.watermark, hash_slots=10000, queue_size=5000, disk_partition_size=500,
+                                batch_size=5000, anomaly_detector=detector)
+            archive_old_months(warehouse, args)
+            warehouse.verify_data()
+            warehouse.close()
+        except Exception as e:
+            print(f"\nIncremental ETL failed: {e}")
+            print("   Re-run with --incremental to resume from the last checkpoint")
+            sys.exit(1)
+        return
     
-    hybrid_join = HybridJoinThreaded(
+    join_config = dict(
         hash_slots=10000,
         queue_size=5000,
-        disk_partition_size=500
+        disk_partition_size=500,
+        join_mode=args.join_mode,
+        batch_size=5000,
+        maintain_aggregates=True,
+        maintain_affinity=True,
+        anomaly_detector=detector,
+        trace_tuples=args.trace_tuples
     )
     
-    hybrid_join.load_master_data_to_disk(customer_df, product_df)
-    enriched_data = hybrid_join.execute_join_threaded(transactional_df)
+    if args.pipelined:
+        try:
+            warehouse = open_warehouse(args)
+            execute_pipelined_etl(warehouse, customer_source, product_source, source_spec, follow=follow,
+                                  idempotent=True, **join_config)
+            archive_old_months(warehouse, args)
+            warehouse.verify_data()
+            if isinstance(warehouse, EmbeddedWarehouse):
+                warehouse.run_olap_queries()
+            warehouse.close()
+        except Exception as e:
+            print(f"\nPipelined ETL failed: {e}")
+            sys.exit(1)
+        return
     
-    print(f"\nEnriched Data Shape: {enriched_data.shape}")
+    try:
+        stage = open_enriched_stage(args)
+        if args.from_stage:
+            stage.require_manifest()
+    except Exception as e:
+        print(f"\nCannot open the enriched stage: {e}")
+        sys.exit(1)
+    
+    if args.from_stage:
+        print(f"\nReloading {len(stage):,} enriched rows from {stage.directory}/ (join skipped)")
+        staged = stage.read()
+        aggregates = StreamingAggregates()
+        aggregates.update(staged)
+        affinity = ProductAffinity()
+        affinity.update(staged)
+        del staged
+        enriched_data = stage
+    elif args.join_workers > 1:
+        customer_df = pd.read_csv(customer_source, index_col=0)
+        product_df = pd.read_csv(product_source, index_col=0)
+        transactional_df = pd.read_csv(source_spec, index_col=0, dtype=TRANSACTION_DTYPES)
+        aggregates = StreamingAggregates()
+        affinity = ProductAffinity()
+        enriched_data, _, _ = execute_join_parallel(customer_df, product_df, transactional_df,
+                                                    num_workers=args.join_workers, aggregates=aggregates,
+                                                    affinity=affinity, **join_config)
+        if detector is not None:
+            detector.update(enriched_data)
+            detector.flush()
+        if stage is not None:
+            stage.append(enriched_data)
+            stage.close()
+            enriched_data = stage
+    else:
+        hybrid_join = HybridJoinThreaded(**join_config, stage=stage)
+        hybrid_join.load_master_data_to_disk(customer_source, product_source)
+        source = open_stream_source(source_spec, join_config['batch_size'], follow=follow)
+        enriched_data = hybrid_join.execute_join_threaded(source)
+        aggregates = hybrid_join.aggregates
+        affinity = hybrid_join.affinity
+        if stage is not None:
+            enriched_data = stage
+    
+    print(f"\nEnriched Data Shape: {(len(enriched_data), len(ENRICHED_COLUMNS))}")
     print(f"Sample Data (first 5 rows):")
     print("─"*80)
     sample_cols = ['orderID', 'Customer_ID', 'Product_ID', 'Gender', 'Age', 
                    'Product_Category', 'price', 'quantity', 'Total_Revenue', 'storeName']
-    print(enriched_data[sample_cols].head().to_string(index=False))
+    if stage is not None:
+        sample = stage.head(5, sample_cols)
+    else:
+        sample = enriched_data[sample_cols].head()
+    print(sample.to_string(index=False))
     print("─"*80)
     
     try:
-        conn = connect_to_sql_server()
+        warehouse = open_warehouse(args)
         
         print("\n" + "="*80)
-        print("STEP 3: LOADING TO SQL SERVER DATA WAREHOUSE")
+        print(f"STEP 3: LOADING TO {warehouse.name.upper()} DATA WAREHOUSE")
         print("="*80)
         
-        load_dimensions(conn, enriched_data)
-        load_fact_table(conn, enriched_data)
-        verify_data(conn)
+        warehouse.load_dimensions(enriched_data)
+        # Order_IDs already in Fact_Sales are skipped, so re-running the
+        # pipeline over the same stream does not duplicate facts.
+        load_result = warehouse.load_fact_table(enriched_data, idempotent=True)
+        apply_aggregates(warehouse, aggregates, load_result)
+        warehouse.write_product_affinity(affinity)
+        archive_old_months(warehouse, args)
+        warehouse.verify_data()
+        if isinstance(warehouse, EmbeddedWarehouse):
+            warehouse.run_olap_queries()
         
-        conn.close()
+        warehouse.close()
         
         print("\n" + "="*80)
         print(" "*25 + "ETL COMPLETE!")
         print("="*80)
         print("\nSUCCESS! Your Data Warehouse is Ready!")
         print("\nNext Steps:")
-        print("   1. Open SQL Server Management Studio (SSMS)")
-        print("   2. Connect to your SQL Express instance")
-        print("   3. Execute: 3_olap_queries.sql")
-        print("   4. Explore 20 business intelligence queries")
+        if isinstance(warehouse, EmbeddedWarehouse):
+            print(f"   1. Query {warehouse.path} with {warehouse.engine} (the OLAP results are above)")
+            print("   2. Run: python OLAP_Engine.py --verify")
+        else:
+            print("   1. Open SQL Server Management Studio (SSMS)")
+            print("   2. Connect to your SQL Express instance")
+            print("   3. Execute: olap_queries.sql")
+            print("   4. Explore 20 business intelligence queries")
         print("\n" + "="*80)
-        
+    
     except Exception as e:
-        print(f"\nError connecting to SQL Server: {e}")
-        print("\nMake sure:")
-        print("  1. SQL Server Express is running")
-        print("  2. Run create_star_schema.sql first to create database and tables")
-        print("  3. Install pyodbc: pip install pyodbc")
-        print("\nData is enriched and ready - stored in enriched_data DataFrame")
-        print(f"   {len(enriched_data):,} records available for analysis")
+        if args.embedded:
+            print(f"\nLoading the embedded warehouse failed: {e}")
+        else:
+            print(f"\nLoading SQL Server failed: {e}")
+            print("\nMake sure:")
+            print("  1. SQL Server Express is running")
+            print("  2. Run create_star_schema.sql first to create database and tables")
+            print("  3. Install pyodbc: pip install pyodbc")
+            print("  4. Or run with --embedded to load a local DuckDB/SQLite warehouse instead")
+        if stage is not None:
+            print(f"\nData is enriched and staged in {stage.directory}/")
+            print(f"   {len(enriched_data):,} records - re-run with --from-stage to load them without re-joining")
+        else:
+            print("\nData is enriched and ready - stored in enriched_data DataFrame")
+            print(f"   {len(enriched_data):,} records available for analysis")
         print("\n" + "="*80)
+        sys.exit(1)
 
 
 if __name__ == "__main__":
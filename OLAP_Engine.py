@@ -0,0 +1,669 @@
+import pandas as pd
+import numpy as np
+import argparse
+import calendar
+import contextlib
+import datetime
+import decimal
+import functools
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from ETL_Transport import open_stream_source
+from ETL_Analytics import ProductAffinity, StreamingAggregates
+from ETL_Join import HybridJoinThreaded
+from ETL_Loaders import apply_aggregates
+from ETL_Warehouse import EmbeddedWarehouse, load_olap_queries
+
+
+# Numeric columns that are aggregated but never filtered or grouped on; every
+# other column is dictionary-encoded and gets a bitmap index.
+MEASURE_COLUMNS = ('Quantity', 'Total_Revenue', 'Price')
+
+# AVG over DECIMAL(12, 2) revenue has scale 6 in SQL Server; rounding float
+# means to match keeps equal-revenue days from reading as spikes.
+AVERAGE_SCALE = 6
+
+MONTH_NAMES = np.array(list(calendar.month_name), dtype=object)
+SEASONS = np.array([None, 'Winter', 'Winter', 'Spring', 'Spring', 'Spring', 'Summer',
+                    'Summer', 'Summer', 'Fall', 'Fall', 'Fall', 'Winter'], dtype=object)
+
+
+# The enriched join output flattened into one column per star-schema attribute,
+# with the Dim_Date attributes (and the half-year/season buckets the catalogue
+# groups on) derived per row the same way dimension_frames builds Dim_Date.
+def columnar_frame(enriched_data):
+    dates = pd.to_datetime(enriched_data['date']).dt.normalize()
+    month = dates.dt.month.to_numpy()
+    weekday = dates.dt.weekday.to_numpy()
+    
+    return {
+        'Order_ID': enriched_data['orderID'].astype('int64').to_numpy(),
+        'Customer_ID': enriched_data['Customer_ID'].astype('int64').to_numpy(),
+        'Gender': enriched_data['Gender'].astype(str).to_numpy(),
+        'Age': enriched_data['Age'].astype(str).to_numpy(),
+        'Occupation': enriched_data['Occupation'].astype('int64').to_numpy(),
+        'City_Category': enriched_data['City_Category'].astype(str).to_numpy(),
+        'Stay_In_Current_City_Years': enriched_data['Stay_In_Current_City_Years'].astype(str).to_numpy(),
+        'Marital_Status': enriched_data['Marital_Status'].astype('int64').to_numpy(),
+        'Product_ID': enriched_data['Product_ID'].astype(str).to_numpy(),
+        'Product_Category': enriched_data['Product_Category'].astype(str).to_numpy(),
+        'Date': dates.to_numpy(),
+        'Year': dates.dt.year.to_numpy(),
+        'Quarter': (month - 1) // 3 + 1,
+        'Month': month,
+        'Month_Name': MONTH_NAMES[month],
+        'Day_Type': np.where(weekday >= 5, 'Weekend', 'Weekday'),
+        'Half_Year': np.where(month <= 6, 'H1', 'H2'),
+        'Season': SEASONS[month],
+        'Store_ID': enriched_data['storeID'].astype('int64').to_numpy(),
+        'Store_Name': enriched_data['storeName'].astype(str).to_numpy(),
+        'Supplier_ID': enriched_data['supplierID'].astype('int64').to_numpy(),
+        'Supplier_Name': enriched_data['supplierName'].astype(str).to_numpy(),
+        'Quantity': enriched_data['quantity'].astype('int64').to_numpy(),
+        'Total_Revenue': enriched_data['Total_Revenue'].astype(float).to_numpy(),
+        'Price': enriched_data['price'].astype(float).to_numpy()
+    }
+
+
+# One packed bitmap (1 bit per row) per dictionary code, built on first use
+# and kept until the column grows. A filter on several values ORs their
+# bitmaps; filters on different columns AND them.
+class BitmapIndex:
+    def __init__(self, codes):
+        self.codes = codes
+        self.bitmaps = {}
+    
+    def bitmap(self, code):
+        bitmap = self.bitmaps.get(code)
+        if bitmap is None:
+            bitmap = np.packbits(self.codes == code)
+            self.bitmaps[code] = bitmap
+        return bitmap
+    
+    def any_of(self, codes):
+        if len(codes) == 0:
+            return np.zeros((len(self.codes) + 7) // 8, dtype=np.uint8)
+        return functools.reduce(np.bitwise_or, (self.bitmap(code) for code in codes))
+
+
+class ResultCache:
+    def __init__(self, capacity=128):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+    
+    def get(self, key):
+        result = self.entries.get(key)
+        if result is None:
+            self.stats['misses'] += 1
+            return None
+        self.entries.move_to_end(key)
+        self.stats['hits'] += 1
+        return result
+    
+    def put(self, key, result):
+        self.entries[key] = result
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+            self.stats['evictions'] += 1
+    
+    # Entries computed against an older data version can never be hit again.
+    def discard_before(self, version):
+        for key in [key for key in self.entries if key[1] < version]:
+            del self.entries[key]
+
+
+def freeze(value):
+    if isinstance(value, dict):
+        return tuple(sorted((key, freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple, set, range)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def row_number(frame, partition_by, order_by, ascending=False, name='Rank'):
+    frame = frame.sort_values(partition_by + [order_by], ascending=[True] * len(partition_by) + [ascending],
+                              kind='stable')
+    if partition_by:
+        frame[name] = frame.groupby(partition_by, sort=False).cumcount() + 1
+    else:
+        frame[name] = np.arange(1, len(frame) + 1)
+    return frame
+
+
+def lag(frame, column, partition_by, order_by, name, offset=1):
+    frame = frame.sort_values(partition_by + order_by, kind='stable')
+    frame[name] = frame.groupby(partition_by, sort=False)[column].shift(offset)
+    return frame
+
+
+def growth_percentage(current, previous):
+    safe_previous = previous.where(previous.notna() & (previous != 0))
+    return ((current - safe_previous) / safe_previous * 100).fillna(0.0)
+
+
+# In-process columnar copy of the enriched data for the OLAP catalogue: every
+# attribute is dictionary-encoded with a bitmap index, filters are bitmap ANDs
+# and group-bys run as bincounts over combined dictionary codes. Results are
+# cached per (query, data_version); append() bumps the version. Q16 reads
+# the co-purchase counts ProductAffinity maintains on append.
+class ColumnarOlapEngine:
+    def __init__(self, enriched_data=None, cache_size=128):
+        self.columns = {}
+        self.dictionaries = {}
+        self.indexes = {}
+        self.rows = 0
+        self.data_version = 0
+        self.cache = ResultCache(cache_size)
+        self.affinity = ProductAffinity()
+        self.lock = threading.RLock()
+        if enriched_data is not None:
+            self.append(enriched_data)
+    
+    def append(self, enriched_data):
+        if len(enriched_data) == 0:
+            return self.data_version
+        
+        with self.lock:
+            for column, values in columnar_frame(enriched_data).items():
+                if column not in MEASURE_COLUMNS:
+                    values = self.encode(column, values)
+                if column in self.columns:
+                    values = np.concatenate([self.columns[column], values])
+                self.columns[column] = values
+            self.affinity.update(enriched_data)
+            self.rows += len(enriched_data)
+            self.indexes = {}
+            self.data_version += 1
+            self.cache.discard_before(self.data_version)
+            return self.data_version
+    
+    def encode(self, column, values):
+        dictionary = self.dictionaries.get(column)
+        if dictionary is None:
+            codes, uniques = pd.factorize(values)
+            self.dictionaries[column] = pd.Index(uniques)
+            return codes
+        
+        codes = dictionary.get_indexer(values)
+        unseen = codes < 0
+        if unseen.any():
+            dictionary = dictionary.append(pd.Index(pd.unique(values[unseen])))
+            self.dictionaries[column] = dictionary
+            codes = dictionary.get_indexer(values)
+        return codes
+    
+    def index(self, column):
+        index = self.indexes.get(column)
+        if index is None:
+            index = BitmapIndex(self.columns[column])
+            self.indexes[column] = index
+        return index
+    
+    def cached(self, query, compute):
+        with self.lock:
+            key = (query, self.data_version)
+            result = self.cache.get(key)
+            if result is None:
+                result = compute()
+                self.cache.put(key, result)
+            return result.copy()
+    
+    # where maps a column to a value or a list/range of values; returns the
+    # matching row positions, or None for all rows.
+    def select(self, where):
+        if not where:
+            return None
+        
+        bitmap = None
+        for column, value in where.items():
+            values = list(value) if isinstance(value, (list, tuple, set, range)) else [value]
+            dictionary = self.dictionaries[column]
+            if isinstance(dictionary, pd.DatetimeIndex):
+                values = pd.to_datetime(values)
+            codes = dictionary.get_indexer(values)
+            column_bitmap = self.index(column).any_of(codes[codes >= 0])
+            bitmap = column_bitmap if bitmap is None else np.bitwise_and(bitmap, column_bitmap)
+        return np.flatnonzero(np.unpackbits(bitmap, count=self.rows))
+    
+    # measures maps an output column to (function, column) with function one of
+    # sum, count, avg, count_distinct or stdev. rollup=True adds the subtotal
+    # levels of GROUP BY ROLLUP(keys), with None in the rolled-up keys.
+    def group_by(self, keys, measures, where=None, rollup=False):
+        keys = list(keys)
+        query = ('group_by', tuple(keys), freeze(measures), freeze(where), rollup)
+        return self.cached(query, lambda: self.compute_group_by(keys, measures, where, rollup))
+    
+    def compute_group_by(self, keys, measures, where, rollup):
+        selection = self.select(where)
+        if not rollup:
+            return self.aggregate(keys, measures, selection)
+        
+        levels = []
+        for level in range(len(keys), -1, -1):
+            frame = self.aggregate(keys[:level], measures, selection)
+            for key in keys[level:]:
+                frame[key] = None
+            levels.append(frame[keys + list(measures)])
+        return pd.concat(levels, ignore_index=True)
+    
+    def aggregate(self, keys, measures, selection):
+        def take(values):
+            return values if selection is None else values[selection]
+        
+        rows = self.rows if selection is None else len(selection)
+        result = {}
+        if keys:
+            codes = [take(self.columns[key]) for key in keys]
+            sizes = [len(self.dictionaries[key]) for key in keys]
+            if np.prod(sizes, dtype=float) < 2**62:
+                groups, inverse = np.unique(np.ravel_multi_index(codes, sizes), return_inverse=True)
+                group_codes = np.unravel_index(groups, sizes)
+            else:
+                groups, inverse = np.unique(np.column_stack(codes), axis=0, return_inverse=True)
+                group_codes = groups.T
+            for key, key_codes in zip(keys, group_codes):
+                result[key] = self.dictionaries[key].to_numpy()[key_codes]
+            group_count = len(groups)
+        else:
+            inverse = np.zeros(rows, dtype=np.intp)
+            group_count = 1
+        
+        inverse = inverse.reshape(-1)
+        for name, (function, column) in measures.items():
+            result[name] = self.measure(function, column, inverse, group_count, take)
+        return pd.DataFrame(result)
+    
+    def measure(self, function, column, inverse, group_count, take):
+        counts = np.bincount(inverse, minlength=group_count)
+        if function == 'count':
+            return counts
+        
+        values = take(self.columns[column])
+        if function == 'count_distinct':
+            if column in MEASURE_COLUMNS:
+                values = pd.factorize(values)[0]
+            cardinality = int(values.max()) + 1 if len(values) else 1
+            pairs = np.unique(inverse.astype('int64') * cardinality + values)
+            return np.bincount(pairs // cardinality, minlength=group_count)
+        
+        totals = np.bincount(inverse, weights=values, minlength=group_count)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if function == 'sum':
+                if values.dtype.kind in 'iu':
+                    return totals.astype('int64')
+                return totals.round(2)
+            if function == 'avg':
+                return np.where(counts > 0, totals / counts, np.nan).round(AVERAGE_SCALE)
+            if function == 'stdev':
+                squares = np.bincount(inverse, weights=values * values, minlength=group_count)
+                variance = (squares - totals * totals / counts) / (counts - 1)
+                return np.where(counts > 1, np.sqrt(np.maximum(variance, 0.0)), np.nan)
+        raise ValueError(f"Unknown aggregate '{function}'")
+    
+    def run(self, name):
+        return self.cached(('catalogue', name), lambda: OLAP_CATALOGUE[name](self))
+    
+    def run_catalogue(self, names=None, verbose=True):
+        log = print if verbose else (lambda *args, **kwargs: None)
+        log("\n" + "="*80)
+        log(f"RUNNING OLAP QUERY SUITE (IN-PROCESS, {self.rows:,} ROWS)")
+        log("="*80 + "\n")
+        
+        timings = []
+        total_start = time.time()
+        for name in names or OLAP_CATALOGUE:
+            start_time = time.time()
+            rows = len(self.run(name))
+            elapsed_time = time.time() - start_time
+            timings.append({'query': name, 'rows': rows, 'seconds': elapsed_time})
+            log(f"   {name:<4} {rows:>8,} rows  {elapsed_time*1000:>9.1f} ms")
+        
+        log(f"\n   Total: {time.time() - total_start:.2f} seconds")
+        log(f"   Cache: {self.cache.stats['hits']} hits | {self.cache.stats['misses']} misses")
+        log("="*80)
+        return timings
+
+
+REVENUE = ('sum', 'Total_Revenue')
+QUANTITY = ('sum', 'Quantity')
+
+
+def top_products_by_month(engine, with_quantity):
+    measures = {'Total_Revenue': REVENUE}
+    if with_quantity:
+        measures['Total_Quantity'] = QUANTITY
+    frame = engine.group_by(['Year', 'Month', 'Month_Name', 'Day_Type', 'Product_ID', 'Product_Category'], measures)
+    frame = row_number(frame, ['Year', 'Month', 'Day_Type'], 'Total_Revenue', name='Revenue_Rank')
+    frame = frame[frame['Revenue_Rank'] <= 5]
+    if with_quantity:
+        frame = frame.drop(columns='Month_Name')
+    return frame.sort_values(['Year', 'Month', 'Day_Type', 'Revenue_Rank'], kind='stable')
+
+
+def top_per_category(engine, attribute, measure_name, rank_name):
+    frame = engine.group_by([attribute, 'Product_Category'], {measure_name: REVENUE})
+    frame = row_number(frame, ['Product_Category'], measure_name, name=rank_name)
+    return frame[frame[rank_name] <= 5].sort_values(['Product_Category', rank_name], kind='stable')
+
+
+def customer_profile(engine, keys, revenue_name, order_by, ascending):
+    frame = engine.group_by(keys, {
+        'Customer_Count': ('count_distinct', 'Customer_ID'),
+        revenue_name: REVENUE,
+        'Avg_Purchase_Amount': ('avg', 'Total_Revenue'),
+        'Total_Quantity': QUANTITY
+    })
+    return frame.sort_values(order_by, ascending=ascending, kind='stable')
+
+
+def query_occupation_category(engine):
+    frame = engine.group_by(['Occupation', 'Product_Category'], {
+        'Total_Sales': REVENUE,
+        'Total_Quantity': QUANTITY,
+        'Unique_Customers': ('count_distinct', 'Customer_ID')
+    })
+    return frame.sort_values(['Occupation', 'Total_Sales'], ascending=[True, False], kind='stable')
+
+
+def query_quarterly_demographics(engine):
+    frame = engine.group_by(['Year', 'Quarter', 'Gender', 'Age'], {
+        'Total_Purchases': REVENUE,
+        'Total_Quantity': QUANTITY,
+        'Total_Orders': ('count_distinct', 'Order_ID')
+    })
+    return frame.sort_values(['Year', 'Quarter', 'Total_Purchases'], ascending=[True, True, False], kind='stable')
+
+
+def query_monthly_city_marital(engine):
+    frame = engine.group_by(['Year', 'Month', 'City_Category', 'Marital_Status'], {
+        'Total_Revenue': REVENUE,
+        'Unique_Customers': ('count_distinct', 'Customer_ID'),
+        'Avg_Purchase_Value': ('avg', 'Total_Revenue')
+    })
+    return frame.sort_values(['Year', 'Month', 'Total_Revenue'], ascending=[True, True, False], kind='stable')
+
+
+def query_category_growth(engine):
+    frame = engine.group_by(['Year', 'Month', 'Product_Category'], {'Current_Month_Revenue': REVENUE})
+    frame = lag(frame, 'Current_Month_Revenue', ['Product_Category'], ['Year', 'Month'], 'Previous_Month_Revenue')
+    frame['Growth_Percentage'] = growth_percentage(frame['Current_Month_Revenue'], frame['Previous_Month_Revenue'])
+    return frame.sort_values(['Product_Category', 'Year', 'Month'], kind='stable')
+
+
+def query_age_day_type(engine):
+    frame = engine.group_by(['Year', 'Age', 'Day_Type'], {
+        'Total_Sales': REVENUE,
+        'Total_Quantity': QUANTITY,
+        'Total_Orders': ('count_distinct', 'Order_ID'),
+        'Avg_Order_Value': ('avg', 'Total_Revenue')
+    })
+    return frame.sort_values(['Year', 'Age', 'Day_Type'], kind='stable')
+
+
+def query_store_quarter_growth(engine):
+    frame = engine.group_by(['Year', 'Quarter', 'Store_ID', 'Store_Name'], {'Current_Quarter_Revenue': REVENUE},
+                            where={'Year': 2017})
+    frame = lag(frame, 'Current_Quarter_Revenue', ['Store_ID'], ['Year', 'Quarter'], 'Previous_Quarter_Revenue')
+    frame['Growth_Rate_Percentage'] = growth_percentage(frame['Current_Quarter_Revenue'],
+                                                        frame['Previous_Quarter_Revenue'])
+    return frame.drop(columns='Store_ID').sort_values(['Store_Name', 'Quarter'], kind='stable')
+
+
+def query_store_supplier_product(engine):
+    frame = engine.group_by(['Store_Name', 'Supplier_Name', 'Product_ID', 'Product_Category'], {
+        'Total_Sales': REVENUE,
+        'Total_Quantity': QUANTITY,
+        'Total_Orders': ('count_distinct', 'Order_ID')
+    })
+    return frame.sort_values(['Store_Name', 'Supplier_Name', 'Total_Sales'], ascending=[True, True, False],
+                             kind='stable')
+
+
+def query_seasonal_products(engine):
+    frame = engine.group_by(['Year', 'Quarter', 'Month_Name', 'Season', 'Product_ID', 'Product_Category'], {
+        'Total_Sales': REVENUE,
+        'Total_Quantity': QUANTITY
+    })
+    frame = frame[['Year', 'Quarter', 'Month_Name', 'Product_ID', 'Product_Category', 'Total_Sales',
+                   'Total_Quantity', 'Season']]
+    return frame.sort_values(['Product_Category', 'Year', 'Quarter'], kind='stable')
+
+
+def query_revenue_volatility(engine):
+    frame = engine.group_by(['Year', 'Month', 'Store_Name', 'Supplier_Name'], {'Monthly_Revenue': REVENUE})
+    frame = lag(frame, 'Monthly_Revenue', ['Store_Name', 'Supplier_Name'], ['Year', 'Month'],
+                'Previous_Month_Revenue')
+    frame = frame[frame['Previous_Month_Revenue'].notna()]
+    grouped = frame.groupby(['Store_Name', 'Supplier_Name'])['Monthly_Revenue']
+    frame = pd.DataFrame({'Avg_Monthly_Revenue': grouped.mean().round(AVERAGE_SCALE),
+                          'Revenue_Std_Dev': grouped.std().round(AVERAGE_SCALE)}).reset_index()
+    frame['Volatility_Percentage'] = frame['Revenue_Std_Dev'] / frame['Avg_Monthly_Revenue'] * 100
+    return frame.sort_values('Volatility_Percentage', ascending=False, kind='stable')
+
+
+def query_product_affinity(engine):
+    pairs = engine.affinity.top_partners()
+    pairs = pairs[pairs['Product_ID'] < pairs['Related_Product_ID']]
+    pairs = pairs.sort_values('Co_Purchase_Count', ascending=False, kind='stable').head(3)
+    
+    categories = pd.Series(engine.dictionaries['Product_Category'].to_numpy()[engine.columns['Product_Category']],
+                           index=engine.dictionaries['Product_ID'].to_numpy()[engine.columns['Product_ID']])
+    categories = categories[~categories.index.duplicated(keep='last')]
+    return pd.DataFrame({
+        'Product1_ID': pairs['Product_ID'].to_numpy(),
+        'Product1_Category': categories.reindex(pairs['Product_ID']).to_numpy(),
+        'Product2_ID': pairs['Related_Product_ID'].to_numpy(),
+        'Product2_Category': categories.reindex(pairs['Related_Product_ID']).to_numpy(),
+        'Co_Purchase_Count': pairs['Co_Purchase_Count'].to_numpy()
+    })
+
+
+def query_rollup(engine):
+    keys = ['Year', 'Store_Name', 'Supplier_Name', 'Product_Category']
+    frame = engine.group_by(keys, {'Total_Revenue': REVENUE, 'Total_Quantity': QUANTITY}, rollup=True)
+    return frame.sort_values(keys, na_position='first', kind='stable')
+
+
+def query_half_year_products(engine):
+    frame = engine.group_by(['Year', 'Half_Year', 'Product_ID', 'Product_Category'], {
+        'Total_Revenue': REVENUE,
+        'Total_Quantity': QUANTITY,
+        'Total_Orders': ('count_distinct', 'Order_ID'),
+        'Avg_Order_Value': ('avg', 'Total_Revenue')
+    })
+    return frame.sort_values(['Year', 'Half_Year', 'Total_Revenue'], ascending=[True, True, False], kind='stable')
+
+
+def query_revenue_spikes(engine):
+    daily = engine.group_by(['Date', 'Product_ID', 'Product_Category'], {'Daily_Revenue': REVENUE})
+    grouped = daily.groupby('Product_ID')['Daily_Revenue']
+    daily['Avg_Daily_Revenue'] = grouped.transform('mean').round(AVERAGE_SCALE)
+    daily['Std_Dev_Revenue'] = grouped.transform('std').round(AVERAGE_SCALE)
+    upper = daily['Avg_Daily_Revenue'] + 2 * daily['Std_Dev_Revenue']
+    lower = daily['Avg_Daily_Revenue'] - 2 * daily['Std_Dev_Revenue']
+    daily['Revenue_Status'] = np.where(daily['Daily_Revenue'] > upper, 'High Spike', 'Low Spike')
+    frame = daily[(daily['Daily_Revenue'] > upper) | (daily['Daily_Revenue'] < lower)]
+    return frame.sort_values(['Date', 'Product_ID'], kind='stable')
+
+
+def store_quarterly_sales(engine):
+    return engine.group_by(['Year', 'Quarter', 'Store_ID', 'Store_Name'], {
+        'Total_Revenue': REVENUE,
+        'Total_Quantity': QUANTITY,
+        'Total_Orders': ('count', None),
+        'Avg_Order_Value': ('avg', 'Total_Revenue')
+    })
+
+
+def query_store_quarter_rank(engine):
+    frame = row_number(store_quarterly_sales(engine), ['Year', 'Quarter'], 'Total_Revenue', name='Store_Rank')
+    return frame.drop(columns='Store_ID').sort_values(['Year', 'Quarter', 'Total_Revenue'],
+                                                      ascending=[True, True, False], kind='stable')
+
+
+def query_store_quarter_sales(engine):
+    return store_quarterly_sales(engine).sort_values(['Year', 'Quarter', 'Total_Revenue'],
+                                                     ascending=[True, True, False], kind='stable')
+
+
+# olap_queries.sql in statement order, so names match load_olap_queries.
+# Store_SK/Product_SK are warehouse surrogates; the engine partitions and
+# orders on the natural Store_ID/Product_ID instead.
+OLAP_CATALOGUE = OrderedDict([
+    ('Q1', lambda engine: top_products_by_month(engine, with_quantity=False)),
+    ('Q2', lambda engine: customer_profile(engine, ['Gender', 'Age', 'City_Category'], 'Total_Purchase_Amount',
+                                           'Total_Purchase_Amount', False)),
+    ('Q3', query_occupation_category),
+    ('Q4', query_quarterly_demographics),
+    ('Q5', lambda engine: top_per_category(engine, 'Occupation', 'Total_Sales', 'Sales_Rank')),
+    ('Q6', query_monthly_city_marital),
+    ('Q7', lambda engine: customer_profile(engine, ['Stay_In_Current_City_Years', 'Gender'], 'Total_Revenue',
+                                           ['Stay_In_Current_City_Years', 'Gender'], True)),
+    ('Q8', lambda engine: top_per_category(engine, 'City_Category', 'Total_Revenue', 'Revenue_Rank')),
+    ('Q9', query_category_growth),
+    ('Q10', query_age_day_type),
+    ('Q11', lambda engine: top_products_by_month(engine, with_quantity=True)),
+    ('Q12', query_store_quarter_growth),
+    ('Q13', query_store_supplier_product),
+    ('Q14', query_seasonal_products),
+    ('Q15', query_revenue_volatility),
+    ('Q16', query_product_affinity),
+    ('Q17', query_rollup),
+    ('Q18', query_half_year_products),
+    ('Q19', query_revenue_spikes),
+    ('Q20', query_store_quarter_rank),
+    ('Q21', query_store_quarter_sales)
+])
+
+
+def build_enriched_data(customer_source, product_source, source_spec, batch_size=5000):
+    hybrid_join = HybridJoinThreaded(hash_slots=10000, queue_size=5000, disk_partition_size=500,
+                                     join_mode='batch', batch_size=batch_size)
+    hybrid_join.load_master_data_to_disk(customer_source, product_source)
+    return hybrid_join.execute_join_threaded(open_stream_source(source_spec, batch_size))
+
+
+# Money is DECIMAL(12, 2) in the warehouse and float here, and averages are
+# rounded to AVERAGE_SCALE, so equal values agree to within half a cent.
+VERIFY_TOLERANCE = 0.005
+
+
+def comparable(value):
+    if value is None or (isinstance(value, (float, np.floating)) and np.isnan(value)):
+        return None
+    if isinstance(value, (int, float, decimal.Decimal, np.integer, np.floating)):
+        return float(value)
+    if isinstance(value, (datetime.date, np.datetime64)):
+        return pd.Timestamp(value).strftime('%Y-%m-%d')
+    return str(value)
+
+
+# ROW_NUMBER() breaks ties arbitrarily on both sides, so rank columns are
+# never compared, and queries keeping the top rows of a ranking may keep
+# different rows tied at the cut-off: their tie-broken columns are left out.
+TIE_BROKEN_COLUMNS = {
+    'Q1': ('Product_ID', 'Product_Category'),
+    'Q5': ('Occupation',),
+    'Q8': ('City_Category',),
+    'Q11': ('Product_ID', 'Product_Category'),
+    'Q16': ('Product1_ID', 'Product1_Category', 'Product2_ID', 'Product2_Category')
+}
+
+
+# Rows as sorted tuples over the columns both results name alike (Q21's
+# Store_SK is a warehouse surrogate the engine reports as Store_ID).
+def comparable_rows(rows, positions):
+    rows = [tuple(comparable(row[position]) for position in positions) for row in rows]
+    return sorted(rows, key=lambda row: tuple((value is None, 0 if value is None else value) for value in row))
+
+
+def results_match(expected_rows, expected_columns, actual, skip=()):
+    positions = [position for position, (expected, column) in enumerate(zip(expected_columns, actual.columns))
+                 if expected == column and not column.endswith('Rank') and column not in skip]
+    expected_rows = comparable_rows(expected_rows, positions)
+    actual_rows = comparable_rows(list(actual.itertuples(index=False)), positions)
+    for expected_row, actual_row in zip(expected_rows, actual_rows):
+        for expected, value in zip(expected_row, actual_row):
+            if isinstance(expected, float) and isinstance(value, float):
+                if not np.isclose(expected, value, rtol=1e-9, atol=VERIFY_TOLERANCE):
+                    return False
+            elif expected != value:
+                return False
+    return True
+
+
+# Loads the same enriched data (with the summary tables and Product_Affinity)
+# into an in-memory embedded warehouse and checks every catalogue query returns
+# the rows the SQL does, values compared within VERIFY_TOLERANCE.
+def verify_against_warehouse(engine, enriched_data):
+    warehouse = EmbeddedWarehouse(path=':memory:')
+    warehouse.load_dimensions(enriched_data, verbose=False)
+    load_result = warehouse.load_fact_table(enriched_data, verbose=False)
+    aggregates = StreamingAggregates()
+    aggregates.update(enriched_data)
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        apply_aggregates(warehouse, aggregates, load_result)
+    affinity = ProductAffinity()
+    affinity.update(enriched_data)
+    warehouse.write_product_affinity(affinity, verbose=False)
+    
+    print("\n" + "="*80)
+    print(f"VERIFYING AGAINST {warehouse.engine.upper()}")
+    print("="*80)
+    
+    mismatches = []
+    for name, query in load_olap_queries(engine=warehouse.engine):
+        if warehouse.engine == 'sqlite' and 'ROLLUP(' in query:
+            continue
+        cursor = warehouse.conn.execute(query)
+        expected_rows = cursor.fetchall()
+        expected_columns = [column[0] for column in cursor.description]
+        actual = engine.run(name)
+        if len(expected_rows) != len(actual):
+            status = 'MISMATCH (row count)'
+        elif not results_match(expected_rows, expected_columns, actual, TIE_BROKEN_COLUMNS.get(name, ())):
+            status = 'MISMATCH (values)'
+        else:
+            status = 'ok'
+        if status != 'ok':
+            mismatches.append(name)
+        print(f"   {name:<4} {warehouse.engine}: {len(expected_rows):>8,} rows | engine: {len(actual):>8,} rows  "
+              f"{status}")
+    print("="*80)
+    warehouse.close()
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="In-process columnar OLAP engine over the HYBRIDJOIN output")
+    parser.add_argument('transactions', nargs='?', default='transactional_data.csv')
+    parser.add_argument('--customers', default='customer_master_data.csv')
+    parser.add_argument('--products', default='product_master_data.csv')
+    parser.add_argument('--queries', help="comma-separated catalogue names (default: all)")
+    parser.add_argument('--repeat', type=int, default=2, help="catalogue passes (later passes hit the cache)")
+    parser.add_argument('--verify', action='store_true', help="compare results with the embedded warehouse")
+    args = parser.parse_args()
+    
+    enriched_data = build_enriched_data(args.customers, args.products, args.transactions)
+    
+    start_time = time.time()
+    engine = ColumnarOlapEngine(enriched_data)
+    print(f"\nEncoded {engine.rows:,} rows x {len(engine.columns)} columns in {time.time() - start_time:.2f}s")
+    
+    names = args.queries.split(',') if args.queries else None
+    for _ in range(args.repeat):
+        engine.run_catalogue(names)
+    
+    if args.verify:
+        return 1 if verify_against_warehouse(engine, enriched_data) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
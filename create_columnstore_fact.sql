@@ -0,0 +1,130 @@
+-- Optional warehouse-scale layout for Fact_Sales. Run after
+-- create_star_schema.sql, before the first load (SQL Server 2016 SP1 or
+-- later, any edition).
+--
+-- Fact_Sales becomes a clustered columnstore partitioned by month of Date_SK,
+-- with no nonclustered indexes: the OLAP queries scan only the columns they
+-- use in batch mode, and inserts maintain no B-trees. Dim_Date is keyed by
+-- the date itself (YYYYMMDD) so that a month is a contiguous Date_SK range.
+-- Sales_SK and the foreign keys are dropped: the ETL resolves surrogate keys
+-- before loading, and partition switching needs neither.
+--
+-- Hybrid_ETL.py detects this layout. Months not yet in Fact_Sales are loaded
+-- into Fact_Sales_Switch and switched in (metadata-only); rows for months
+-- already loaded go straight to the columnstore delta store. Old months are
+-- archived by switching them into Fact_Sales_Archive (--archive-before=YYYY-MM).
+
+USE November2025DW;
+GO
+
+IF OBJECT_ID('dbo.Fact_Sales_Archive', 'U') IS NOT NULL DROP TABLE dbo.Fact_Sales_Archive;
+IF OBJECT_ID('dbo.Fact_Sales_Switch', 'U') IS NOT NULL DROP TABLE dbo.Fact_Sales_Switch;
+IF OBJECT_ID('dbo.Fact_Sales', 'U') IS NOT NULL DROP TABLE dbo.Fact_Sales;
+IF OBJECT_ID('dbo.Dim_Date', 'U') IS NOT NULL DROP TABLE dbo.Dim_Date;
+IF EXISTS (SELECT 1 FROM sys.partition_schemes WHERE name = 'PS_Fact_Sales_Month') DROP PARTITION SCHEME PS_Fact_Sales_Month;
+IF EXISTS (SELECT 1 FROM sys.partition_functions WHERE name = 'PF_Fact_Sales_Month') DROP PARTITION FUNCTION PF_Fact_Sales_Month;
+GO
+
+PRINT 'Creating Dim_Date with YYYYMMDD keys...';
+GO
+
+CREATE TABLE dbo.Dim_Date (
+    Date_SK AS (YEAR(Date) * 10000 + MONTH(Date) * 100 + DAY(Date)) PERSISTED NOT NULL PRIMARY KEY,
+    Date DATE NOT NULL UNIQUE,
+    Year INT NOT NULL,
+    Month INT NOT NULL,
+    Day INT NOT NULL,
+    Quarter INT NOT NULL,
+    Day_of_Week INT NOT NULL,
+    Day_Name VARCHAR(20),
+    Day_Type VARCHAR(20),
+    Month_Name VARCHAR(20)
+);
+GO
+
+CREATE NONCLUSTERED INDEX IDX_Date ON dbo.Dim_Date(Date);
+GO
+
+PRINT 'Creating monthly partition function and scheme...';
+GO
+
+-- One boundary per month from 2010-01 to 2035-12; the ETL splits later
+-- months off the empty last partition as they arrive.
+DECLARE @boundaries NVARCHAR(MAX) = N'';
+DECLARE @month DATE = '2010-01-01';
+WHILE @month <= '2035-12-01'
+BEGIN
+    SET @boundaries = @boundaries + CASE WHEN @boundaries = N'' THEN N'' ELSE N', ' END
+                      + CONVERT(NVARCHAR(8), @month, 112);
+    SET @month = DATEADD(MONTH, 1, @month);
+END
+EXEC (N'CREATE PARTITION FUNCTION PF_Fact_Sales_Month (INT) AS RANGE RIGHT FOR VALUES (' + @boundaries + N')');
+GO
+
+CREATE PARTITION SCHEME PS_Fact_Sales_Month AS PARTITION PF_Fact_Sales_Month ALL TO ([PRIMARY]);
+GO
+
+PRINT 'Creating columnstore fact tables...';
+GO
+
+CREATE TABLE dbo.Fact_Sales (
+    Order_ID INT NOT NULL,
+    Customer_SK INT NOT NULL,
+    Product_SK INT NOT NULL,
+    Date_SK INT NOT NULL,
+    Store_SK INT NOT NULL,
+    Supplier_SK INT NOT NULL,
+    Quantity INT NOT NULL,
+    Total_Revenue DECIMAL(12, 2) NOT NULL
+) ON PS_Fact_Sales_Month (Date_SK);
+GO
+
+CREATE CLUSTERED COLUMNSTORE INDEX CCI_Fact_Sales ON dbo.Fact_Sales ON PS_Fact_Sales_Month (Date_SK);
+GO
+
+-- Staging for new months: loaded and rebuilt here, then switched into
+-- Fact_Sales. Must match Fact_Sales column for column.
+CREATE TABLE dbo.Fact_Sales_Switch (
+    Order_ID INT NOT NULL,
+    Customer_SK INT NOT NULL,
+    Product_SK INT NOT NULL,
+    Date_SK INT NOT NULL,
+    Store_SK INT NOT NULL,
+    Supplier_SK INT NOT NULL,
+    Quantity INT NOT NULL,
+    Total_Revenue DECIMAL(12, 2) NOT NULL
+) ON PS_Fact_Sales_Month (Date_SK);
+GO
+
+CREATE CLUSTERED COLUMNSTORE INDEX CCI_Fact_Sales_Switch ON dbo.Fact_Sales_Switch ON PS_Fact_Sales_Month (Date_SK);
+GO
+
+CREATE TABLE dbo.Fact_Sales_Archive (
+    Order_ID INT NOT NULL,
+    Customer_SK INT NOT NULL,
+    Product_SK INT NOT NULL,
+    Date_SK INT NOT NULL,
+    Store_SK INT NOT NULL,
+    Supplier_SK INT NOT NULL,
+    Quantity INT NOT NULL,
+    Total_Revenue DECIMAL(12, 2) NOT NULL
+) ON PS_Fact_Sales_Month (Date_SK);
+GO
+
+CREATE CLUSTERED COLUMNSTORE INDEX CCI_Fact_Sales_Archive ON dbo.Fact_Sales_Archive ON PS_Fact_Sales_Month (Date_SK);
+GO
+
+PRINT '';
+PRINT '============================================================================';
+PRINT 'COLUMNSTORE FACT LAYOUT COMPLETE!';
+PRINT '============================================================================';
+PRINT '';
+PRINT 'Partitioned by month (PF_Fact_Sales_Month / PS_Fact_Sales_Month):';
+PRINT '  - Fact_Sales          (clustered columnstore)';
+PRINT '  - Fact_Sales_Switch   (load staging, switched into Fact_Sales)';
+PRINT '  - Fact_Sales_Archive  (months switched out with --archive-before)';
+PRINT '';
+PRINT 'Dim_Date recreated with Date_SK = YYYYMMDD.';
+PRINT '';
+PRINT '============================================================================';
+GO
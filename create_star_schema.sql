@@ -28,6 +28,13 @@ GO
 USE November2025DW;
 GO
 
+IF OBJECT_ID('dbo.Agg_Store_Quarter', 'U') IS NOT NULL DROP TABLE dbo.Agg_Store_Quarter;
+IF OBJECT_ID('dbo.Agg_Product_Month', 'U') IS NOT NULL DROP TABLE dbo.Agg_Product_Month;
+IF OBJECT_ID('dbo.Agg_Category_DayType', 'U') IS NOT NULL DROP TABLE dbo.Agg_Category_DayType;
+IF OBJECT_ID('dbo.Agg_Supplier_Month', 'U') IS NOT NULL DROP TABLE dbo.Agg_Supplier_Month;
+IF OBJECT_ID('dbo.Product_Affinity', 'U') IS NOT NULL DROP TABLE dbo.Product_Affinity;
+IF OBJECT_ID('dbo.Fact_Sales_Archive', 'U') IS NOT NULL DROP TABLE dbo.Fact_Sales_Archive;
+IF OBJECT_ID('dbo.Fact_Sales_Switch', 'U') IS NOT NULL DROP TABLE dbo.Fact_Sales_Switch;
 IF OBJECT_ID('dbo.Fact_Sales', 'U') IS NOT NULL DROP TABLE dbo.Fact_Sales;
 IF OBJECT_ID('dbo.Dim_Date', 'U') IS NOT NULL DROP TABLE dbo.Dim_Date;
 IF OBJECT_ID('dbo.Dim_Customer', 'U') IS NOT NULL DROP TABLE dbo.Dim_Customer;
@@ -36,6 +43,11 @@ IF OBJECT_ID('dbo.Dim_Store', 'U') IS NOT NULL DROP TABLE dbo.Dim_Store;
 IF OBJECT_ID('dbo.Dim_Supplier', 'U') IS NOT NULL DROP TABLE dbo.Dim_Supplier;
 GO
 
+-- Left behind by create_columnstore_fact.sql
+IF EXISTS (SELECT 1 FROM sys.partition_schemes WHERE name = 'PS_Fact_Sales_Month') DROP PARTITION SCHEME PS_Fact_Sales_Month;
+IF EXISTS (SELECT 1 FROM sys.partition_functions WHERE name = 'PF_Fact_Sales_Month') DROP PARTITION FUNCTION PF_Fact_Sales_Month;
+GO
+
 PRINT 'Creating dimension tables...';
 GO
 
@@ -115,6 +127,66 @@ GO
 PRINT 'Fact table created successfully.';
 GO
 
+PRINT 'Creating aggregate tables...';
+GO
+
+CREATE TABLE dbo.Agg_Store_Quarter (
+    Year INT NOT NULL,
+    Quarter INT NOT NULL,
+    Store_ID INT NOT NULL,
+    Total_Revenue DECIMAL(18, 2) NOT NULL,
+    Total_Quantity BIGINT NOT NULL,
+    Total_Orders BIGINT NOT NULL,
+    PRIMARY KEY (Year, Quarter, Store_ID)
+);
+GO
+
+CREATE TABLE dbo.Agg_Product_Month (
+    Year INT NOT NULL,
+    Month INT NOT NULL,
+    Product_ID VARCHAR(50) NOT NULL,
+    Total_Revenue DECIMAL(18, 2) NOT NULL,
+    Total_Quantity BIGINT NOT NULL,
+    Total_Orders BIGINT NOT NULL,
+    PRIMARY KEY (Year, Month, Product_ID)
+);
+GO
+
+CREATE TABLE dbo.Agg_Category_DayType (
+    Product_Category VARCHAR(100) NOT NULL,
+    Day_Type VARCHAR(20) NOT NULL,
+    Total_Revenue DECIMAL(18, 2) NOT NULL,
+    Total_Quantity BIGINT NOT NULL,
+    Total_Orders BIGINT NOT NULL,
+    PRIMARY KEY (Product_Category, Day_Type)
+);
+GO
+
+CREATE TABLE dbo.Agg_Supplier_Month (
+    Year INT NOT NULL,
+    Month INT NOT NULL,
+    Supplier_ID INT NOT NULL,
+    Total_Revenue DECIMAL(18, 2) NOT NULL,
+    Total_Quantity BIGINT NOT NULL,
+    Total_Orders BIGINT NOT NULL,
+    PRIMARY KEY (Year, Month, Supplier_ID)
+);
+GO
+
+-- Each product's top co-purchased products (distinct customers who bought
+-- both), refreshed by the ETL's affinity stage for the products a batch touches.
+CREATE TABLE dbo.Product_Affinity (
+    Product_ID VARCHAR(50) NOT NULL,
+    Related_Product_ID VARCHAR(50) NOT NULL,
+    Co_Purchase_Count INT NOT NULL,
+    Partner_Rank INT NOT NULL,
+    PRIMARY KEY (Product_ID, Related_Product_ID)
+);
+GO
+
+PRINT 'Aggregate tables created successfully.';
+GO
+
 PRINT 'Creating indexes...';
 GO
 
@@ -124,6 +196,7 @@ CREATE NONCLUSTERED INDEX IDX_Date ON dbo.Dim_Date(Date);
 CREATE NONCLUSTERED INDEX IDX_Store_ID ON dbo.Dim_Store(Store_ID);
 CREATE NONCLUSTERED INDEX IDX_Supplier_ID ON dbo.Dim_Supplier(Supplier_ID);
 
+CREATE NONCLUSTERED INDEX IDX_Fact_Order_ID ON dbo.Fact_Sales(Order_ID);
 CREATE NONCLUSTERED INDEX IDX_Fact_Customer_SK ON dbo.Fact_Sales(Customer_SK);
 CREATE NONCLUSTERED INDEX IDX_Fact_Product_SK ON dbo.Fact_Sales(Product_SK);
 CREATE NONCLUSTERED INDEX IDX_Fact_Date_SK ON dbo.Fact_Sales(Date_SK);
@@ -145,20 +218,19 @@ IF OBJECT_ID('dbo.STORE_QUARTERLY_SALES', 'V') IS NOT NULL
     DROP VIEW dbo.STORE_QUARTERLY_SALES;
 GO
 
+-- Served from the Agg_Store_Quarter summary table maintained by the ETL.
 CREATE VIEW dbo.STORE_QUARTERLY_SALES AS
 SELECT 
-    d.Year,
-    d.Quarter,
+    a.Year,
+    a.Quarter,
     s.Store_SK,
     s.Store_Name,
-    SUM(f.Total_Revenue) AS Total_Revenue,
-    SUM(f.Quantity) AS Total_Quantity,
-    COUNT(f.Order_ID) AS Total_Orders,
-    AVG(f.Total_Revenue) AS Avg_Order_Value
-FROM dbo.Fact_Sales f
-JOIN dbo.Dim_Date d ON f.Date_SK = d.Date_SK
-JOIN dbo.Dim_Store s ON f.Store_SK = s.Store_SK
-GROUP BY d.Year, d.Quarter, s.Store_SK, s.Store_Name;
+    a.Total_Revenue,
+    a.Total_Quantity,
+    a.Total_Orders,
+    a.Total_Revenue / a.Total_Orders AS Avg_Order_Value
+FROM dbo.Agg_Store_Quarter a
+JOIN dbo.Dim_Store s ON a.Store_ID = s.Store_ID;
 GO
 
 PRINT 'Views created successfully.';
@@ -177,6 +249,13 @@ PRINT '  - Dim_Store';
 PRINT '  - Dim_Supplier';
 PRINT '  - Fact_Sales';
 PRINT '';
+PRINT 'Aggregate Tables Created (maintained by the ETL):';
+PRINT '  - Agg_Store_Quarter';
+PRINT '  - Agg_Product_Month';
+PRINT '  - Agg_Category_DayType';
+PRINT '  - Agg_Supplier_Month';
+PRINT '  - Product_Affinity';
+PRINT '';
 PRINT 'Views Created:';
 PRINT '  - STORE_QUARTERLY_SALES';
 PRINT '';
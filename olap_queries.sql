@@ -153,15 +153,14 @@ ORDER BY Product_Category, Revenue_Rank;
 
 WITH Monthly_Sales AS (
     SELECT 
-        d.Year,
-        d.Month,
+        a.Year,
+        a.Month,
         p.Product_Category,
-        SUM(f.Total_Revenue) AS Current_Month_Revenue,
-        LAG(SUM(f.Total_Revenue)) OVER (PARTITION BY p.Product_Category ORDER BY d.Year, d.Month) AS Previous_Month_Revenue
-    FROM Fact_Sales f
-    JOIN Dim_Date d ON f.Date_SK = d.Date_SK
-    JOIN Dim_Product p ON f.Product_SK = p.Product_SK
-    GROUP BY d.Year, d.Month, p.Product_Category
+        SUM(a.Total_Revenue) AS Current_Month_Revenue,
+        LAG(SUM(a.Total_Revenue)) OVER (PARTITION BY p.Product_Category ORDER BY a.Year, a.Month) AS Previous_Month_Revenue
+    FROM Agg_Product_Month a
+    JOIN Dim_Product p ON a.Product_ID = p.Product_ID
+    GROUP BY a.Year, a.Month, p.Product_Category
 )
 SELECT 
     Year,
@@ -223,17 +222,15 @@ ORDER BY Year, Month, Day_Type, Revenue_Rank;
 
 WITH Quarterly_Store_Revenue AS (
     SELECT 
-        d.Year,
-        d.Quarter,
+        a.Year,
+        a.Quarter,
         s.Store_SK,
         s.Store_Name,
-        SUM(f.Total_Revenue) AS Current_Quarter_Revenue,
-        LAG(SUM(f.Total_Revenue)) OVER (PARTITION BY s.Store_SK ORDER BY d.Year, d.Quarter) AS Previous_Quarter_Revenue
-    FROM Fact_Sales f
-    JOIN Dim_Date d ON f.Date_SK = d.Date_SK
-    JOIN Dim_Store s ON f.Store_SK = s.Store_SK
-    WHERE d.Year = 2017
-    GROUP BY d.Year, d.Quarter, s.Store_SK, s.Store_Name
+        a.Total_Revenue AS Current_Quarter_Revenue,
+        LAG(a.Total_Revenue) OVER (PARTITION BY s.Store_SK ORDER BY a.Year, a.Quarter) AS Previous_Quarter_Revenue
+    FROM Agg_Store_Quarter a
+    JOIN Dim_Store s ON a.Store_ID = s.Store_ID
+    WHERE a.Year = 2017
 )
 SELECT 
     Year,
@@ -322,26 +319,18 @@ GROUP BY Store_Name, Supplier_Name
 ORDER BY Volatility_Percentage DESC;
 
 
-WITH Product_Pairs AS (
-    SELECT 
-        f1.Product_SK AS Product1_SK,
-        f2.Product_SK AS Product2_SK,
-        COUNT(DISTINCT f1.Customer_SK) AS Co_Purchase_Count
-    FROM Fact_Sales f1
-    JOIN Fact_Sales f2 ON f1.Customer_SK = f2.Customer_SK AND f1.Product_SK < f2.Product_SK
-    GROUP BY f1.Product_SK, f2.Product_SK
-),
-Ranked_Pairs AS (
+WITH Ranked_Pairs AS (
     SELECT 
         p1.Product_ID AS Product1_ID,
         p1.Product_Category AS Product1_Category,
         p2.Product_ID AS Product2_ID,
         p2.Product_Category AS Product2_Category,
-        pp.Co_Purchase_Count,
-        ROW_NUMBER() OVER (ORDER BY pp.Co_Purchase_Count DESC) AS Affinity_Rank
-    FROM Product_Pairs pp
-    JOIN Dim_Product p1 ON pp.Product1_SK = p1.Product_SK
-    JOIN Dim_Product p2 ON pp.Product2_SK = p2.Product_SK
+        a.Co_Purchase_Count,
+        ROW_NUMBER() OVER (ORDER BY a.Co_Purchase_Count DESC) AS Affinity_Rank
+    FROM Product_Affinity a
+    JOIN Dim_Product p1 ON a.Product_ID = p1.Product_ID
+    JOIN Dim_Product p2 ON a.Related_Product_ID = p2.Product_ID
+    WHERE a.Product_ID < a.Related_Product_ID
 )
 SELECT 
     Product1_ID,
@@ -446,16 +435,14 @@ FROM STORE_QUARTERLY_SALES
 ORDER BY Year, Quarter, Total_Revenue DESC;
 
 SELECT 
-    d.Year,
-    d.Quarter,
+    a.Year,
+    a.Quarter,
     s.Store_SK,
     s.Store_Name,
-    SUM(f.Total_Revenue) AS Total_Revenue,
-    SUM(f.Quantity) AS Total_Quantity,
-    COUNT(f.Order_ID) AS Total_Orders,
-    AVG(f.Total_Revenue) AS Avg_Order_Value
-FROM Fact_Sales f
-JOIN Dim_Date d ON f.Date_SK = d.Date_SK
-JOIN Dim_Store s ON f.Store_SK = s.Store_SK
-GROUP BY d.Year, d.Quarter, s.Store_SK, s.Store_Name
-ORDER BY d.Year, d.Quarter, Total_Revenue DESC;
+    a.Total_Revenue,
+    a.Total_Quantity,
+    a.Total_Orders,
+    a.Total_Revenue / a.Total_Orders AS Avg_Order_Value
+FROM Agg_Store_Quarter a
+JOIN Dim_Store s ON a.Store_ID = s.Store_ID
+ORDER BY a.Year, a.Quarter, a.Total_Revenue DESC;
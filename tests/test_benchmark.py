@@ -0,0 +1,68 @@
+import json
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+import Benchmark_ETL as bench
+
+
+@pytest.fixture(scope='module')
+def dataset(tmp_path_factory):
+    out_dir = str(tmp_path_factory.mktemp('dataset'))
+    bench.generate_dataset(out_dir, transactions=2000, customers=60, products=40, unmatched_rate=0.1,
+                           chunk_size=700, seed=7)
+    return out_dir
+
+
+def test_generated_dataset_matches_its_manifest(dataset):
+    with open(os.path.join(dataset, 'manifest.json')) as f:
+        manifest = json.load(f)
+    transactions = pd.read_csv(os.path.join(dataset, 'transactional_data.csv'), index_col=0)
+    customers = pd.read_csv(os.path.join(dataset, 'customer_master_data.csv'), index_col=0)
+    products = pd.read_csv(os.path.join(dataset, 'product_master_data.csv'), index_col=0)
+    
+    assert len(transactions) == manifest['transactions'] == 2000
+    assert transactions['orderID'].tolist() == list(range(1, 2001))
+    assert customers['Customer_ID'].is_unique and len(customers) == 60
+    assert products['Product_ID'].is_unique and len(products) == 40
+    unmatched = (~transactions['Customer_ID'].isin(customers['Customer_ID'])
+                 | ~transactions['Product_ID'].isin(products['Product_ID']))
+    assert unmatched.sum() == manifest['unmatched_rows'] > 0
+
+
+def test_sweep_report_has_one_summary_per_case(dataset, tmp_path):
+    sweep = {'join_mode': ['batch', 'tuple'], 'load': ['none'], 'hash_slots': [500], 'queue_size': [200],
+             'disk_partition_size': [20], 'batch_size': [250]}
+    report_path = str(tmp_path / 'report.json')
+    report = bench.run_sweep(dataset, sweep, repeat=1, report_path=report_path)
+    
+    with open(report_path) as f:
+        assert json.load(f)['results'].keys() == report['results'].keys()
+    assert report['dataset']['transactions'] == 2000
+    assert report['repeat'] == 1
+    assert len(report['results']) == 2
+    
+    for key, result in report['results'].items():
+        assert key == bench.case_key(result['config'])
+        assert result['repeats'] == len(result['runs']) == 1
+        assert result['records'] == 2000
+        assert result['dropped'] == report['dataset']['unmatched_rows']
+        assert result['joined'] + result['dropped'] == result['records']
+        assert result['records_per_second'] > 0
+        assert set(result['latency']) <= set(bench.STAGES)
+    modes = {result['config']['join_mode']: result for result in report['results'].values()}
+    assert 'join' in modes['batch']['latency']
+    assert 'hash_probe' in modes['tuple']['latency']
+    
+    assert bench.compare_reports(report, report) == []
+    slower = json.loads(json.dumps(report))
+    for result in slower['results'].values():
+        result['records_per_second'] /= 2
+    regressions = bench.compare_reports(report, slower)
+    assert {regression['case'] for regression in regressions} == set(report['results'])
+    assert all(regression['metric'] == 'records/s' for regression in regressions)
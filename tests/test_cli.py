@@ -0,0 +1,48 @@
+import os
+import sys
+
+import pytest
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+import Hybrid_ETL as etl
+
+TRANSACTIONS = os.path.join(REPO, 'transactional_data.csv')
+
+
+def test_defaults_match_the_repository_files():
+    args = etl.parse_args([])
+    assert (args.transactions, args.customers, args.products) == ('transactional_data.csv',
+                                                                  'customer_master_data.csv',
+                                                                  'product_master_data.csv')
+    assert (args.join_mode, args.join_workers, args.watermark) == ('batch', 1, 'offset')
+    assert (args.stage, args.stage_partition, args.no_stage) == ('enriched_stage', 'month', False)
+    assert args.archive_before is None and not args.embedded
+
+
+def test_options_are_parsed_into_their_types():
+    args = etl.parse_args([TRANSACTIONS, '--embedded', '--incremental', '--watermark=date', '--alert-z=3.5',
+                           '--alert-lateness', '7', '--archive-before=2019-03', '--partition-by=Store_SK'])
+    assert args.transactions == TRANSACTIONS
+    assert args.incremental and args.embedded and args.watermark == 'date'
+    assert (args.alert_z, args.alert_lateness) == (3.5, 7)
+    assert args.archive_before == 20190301
+    assert args.partition_by == 'Store_SK'
+
+
+@pytest.mark.parametrize('argv', [
+    ['--join-mode=hash'],
+    ['--watermark=rowid'],
+    ['--archive-before=2019-13'],
+    ['--archive-before=March'],
+    ['--incremental', '--pipelined'],
+    ['--rebuild-aggregates', '--from-stage'],
+    ['--pipelined', '--join-workers=4'],
+    ['-', '--join-workers=4'],
+    [TRANSACTIONS, '--follow', '--join-workers=4'],
+])
+def test_invalid_combinations_are_rejected(argv):
+    with pytest.raises(SystemExit) as exited:
+        etl.parse_args(argv)
+    assert exited.value.code == 2
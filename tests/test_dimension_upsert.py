@@ -0,0 +1,114 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+from ETL_Join import HybridJoinThreaded
+from ETL_Loaders import DIMENSION_SPECS, DimensionCache, resolve_surrogate_keys
+from ETL_Warehouse import EmbeddedWarehouse, duckdb
+
+CUSTOMERS = os.path.join(REPO, 'customer_master_data.csv')
+PRODUCTS = os.path.join(REPO, 'product_master_data.csv')
+TRANSACTIONS = os.path.join(REPO, 'transactional_data.csv')
+SCHEMA = os.path.join(REPO, 'create_star_schema.sql')
+
+ENGINES = [pytest.param('duckdb', marks=pytest.mark.skipif(duckdb is None, reason="duckdb is not installed")),
+           'sqlite']
+
+
+@pytest.fixture(scope='module')
+def enriched(tmp_path_factory):
+    hybrid_join = HybridJoinThreaded(join_mode='batch', batch_size=500,
+                                     disk_dir=str(tmp_path_factory.mktemp('disk_buffer')))
+    hybrid_join.load_master_data_to_disk(CUSTOMERS, PRODUCTS)
+    return hybrid_join.execute_join_threaded(TRANSACTIONS)
+
+
+def dimension_table(warehouse, dimension):
+    spec = DIMENSION_SPECS[dimension]
+    columns = [spec['surrogate_key']] + [column for column, _ in spec['columns']]
+    rows = warehouse.conn.execute(f"SELECT {', '.join(columns)} FROM {dimension}").fetchall()
+    return pd.DataFrame(rows, columns=columns)
+
+
+def test_diff_splits_new_and_changed_rows():
+    cache = DimensionCache()
+    cached = pd.DataFrame({'Store_ID': [1, 2], 'Store_Name': ['Tech Haven', 'Photo World']})
+    cached.insert(0, 'Store_SK', [10, 11])
+    cache.frames['Dim_Store'] = cached
+    
+    incoming = pd.DataFrame({'Store_ID': [1, 2, 3], 'Store_Name': ['Tech Haven', 'Photo Planet', 'Game Zone']})
+    new_rows, changed_rows = cache.diff('Dim_Store', incoming)
+    
+    assert new_rows['Store_ID'].tolist() == [3]
+    assert changed_rows['Store_ID'].tolist() == [2]
+    assert changed_rows['Store_Name'].tolist() == ['Photo Planet']
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_reload_upserts_changes_without_duplicate_surrogate_keys(tmp_path, enriched, engine):
+    path = str(tmp_path / f"dw.{engine}")
+    warehouse = EmbeddedWarehouse(path=path, engine=engine, schema_path=SCHEMA)
+    warehouse.load_dimensions(enriched, verbose=False)
+    first = {dimension: dimension_table(warehouse, dimension) for dimension in DIMENSION_SPECS}
+    warehouse.close()
+    
+    customer_id = int(enriched['Customer_ID'].iloc[0])
+    changed = enriched.copy()
+    changed.loc[changed['Customer_ID'] == customer_id, 'City_Category'] = 'Z'
+    extra = changed.iloc[[0]].assign(Customer_ID=99999999)
+    changed = pd.concat([changed, extra], ignore_index=True)
+    
+    # A fresh warehouse object seeds its DimensionCache from the tables.
+    warehouse = EmbeddedWarehouse(path=path, engine=engine, schema_path=SCHEMA)
+    warehouse.load_dimensions(changed, verbose=False)
+    for dimension, spec in DIMENSION_SPECS.items():
+        table = dimension_table(warehouse, dimension)
+        assert table[spec['surrogate_key']].is_unique
+        assert table[spec['natural_key']].is_unique
+    
+    customers = dimension_table(warehouse, 'Dim_Customer').set_index('Customer_ID')
+    before = first['Dim_Customer'].set_index('Customer_ID')
+    assert len(customers) == len(before) + 1
+    assert customers.loc[customer_id, 'City_Category'] == 'Z'
+    assert customers.loc[customer_id, 'Customer_SK'] == before.loc[customer_id, 'Customer_SK']
+    assert customers.loc[99999999, 'Customer_SK'] > before['Customer_SK'].max()
+    unchanged = customers.drop(index=[customer_id, 99999999])['Customer_SK'].sort_index()
+    assert unchanged.equals(before.drop(index=customer_id)['Customer_SK'].sort_index())
+    
+    warehouse.load_dimensions(changed, verbose=False)
+    assert len(dimension_table(warehouse, 'Dim_Customer')) == len(customers)
+    warehouse.close()
+
+
+def test_unresolved_surrogate_keys_are_counted_as_failed(enriched):
+    key_maps = {
+        'Customer_SK': pd.Series(1, index=enriched['Customer_ID'].unique(), dtype='int64'),
+        'Product_SK': pd.Series(1, index=enriched['Product_ID'].unique(), dtype='int64'),
+        'Date_SK': pd.Series(1, index=pd.to_datetime(enriched['date']).dt.normalize().unique(), dtype='int64'),
+        'Store_SK': pd.Series(1, index=enriched['storeID'].unique(), dtype='int64'),
+        'Supplier_SK': pd.Series(1, index=enriched['supplierID'].unique(), dtype='int64')
+    }
+    unknown = enriched.iloc[:3].assign(storeID=999, orderID=[1, 2, 3])
+    
+    fact, failed = resolve_surrogate_keys(pd.concat([enriched, unknown], ignore_index=True), key_maps)
+    assert failed == 3
+    assert len(fact) == len(enriched)
+    assert not fact['Order_ID'].isin([1, 2, 3]).any()
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_fact_load_reports_rows_with_unknown_dimensions(tmp_path, enriched, engine):
+    warehouse = EmbeddedWarehouse(path=str(tmp_path / f"dw.{engine}"), engine=engine, schema_path=SCHEMA)
+    warehouse.load_dimensions(enriched, verbose=False)
+    unknown = enriched.iloc[:2].assign(supplierID=999, orderID=[1, 2])
+    
+    result = warehouse.load_fact_table(pd.concat([enriched, unknown], ignore_index=True), verbose=False)
+    assert result['failed_resolution'] == 2
+    assert result['loaded'] == len(enriched)
+    assert warehouse.conn.execute("SELECT COUNT(*) FROM Fact_Sales").fetchone()[0] == len(enriched)
+    warehouse.close()
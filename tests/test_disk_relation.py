@@ -0,0 +1,66 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+from ETL_Transport import PRODUCT_ATTRIBUTES
+from ETL_Join import DiskRelation, HybridJoinThreaded
+
+CUSTOMERS = os.path.join(REPO, 'customer_master_data.csv')
+PRODUCTS = os.path.join(REPO, 'product_master_data.csv')
+TRANSACTIONS = os.path.join(REPO, 'transactional_data.csv')
+
+
+def test_chunked_snapshot_matches_whole_file_snapshot(tmp_path):
+    whole = DiskRelation('product_master', pd.read_csv(PRODUCTS, index_col=0), 'Product_ID',
+                         PRODUCT_ATTRIBUTES, 500, str(tmp_path / 'whole'))
+    chunked = DiskRelation.from_csv('product_master', PRODUCTS, 'Product_ID', PRODUCT_ATTRIBUTES, 500,
+                                    str(tmp_path / 'chunked'), chunk_size=97)
+    
+    assert chunked.num_records == whole.num_records
+    for column in ['Product_ID'] + PRODUCT_ATTRIBUTES:
+        assert np.array_equal(chunked.column(chunked.records, column), whole.column(whole.records, column))
+
+
+def test_chunked_snapshot_keeps_the_last_duplicate_across_runs(tmp_path):
+    products = pd.read_csv(PRODUCTS, index_col=0).head(300)
+    updated = products.head(50).assign(**{'price$': products['price$'].head(50) * 2, 'storeName': 'Relocated'})
+    source = pd.concat([products, updated], ignore_index=True).sample(frac=1, random_state=7)
+    path = tmp_path / 'products.csv'
+    source.to_csv(path, index=False)
+    
+    chunked = DiskRelation.from_csv('product_master', str(path), 'Product_ID', PRODUCT_ATTRIBUTES, 64,
+                                    str(tmp_path / 'chunked'), chunk_size=40)
+    expected = source.drop_duplicates('Product_ID', keep='last').sort_values('Product_ID')
+    
+    assert chunked.num_records == len(expected) == 300
+    for column in ['Product_ID'] + PRODUCT_ATTRIBUTES:
+        assert np.array_equal(chunked.column(chunked.records, column), expected[column].to_numpy())
+    assert sorted(os.listdir(tmp_path / 'chunked')) == ['product_master.dat', 'product_master.meta.json']
+
+
+def test_batch_mode_counts_partition_reads(tmp_path):
+    hybrid_join = HybridJoinThreaded(join_mode='batch', batch_size=500, disk_partition_size=100,
+                                     disk_dir=str(tmp_path / 'disk_buffer'))
+    hybrid_join.load_master_data_to_disk(CUSTOMERS, PRODUCTS)
+    enriched = hybrid_join.execute_join_threaded(TRANSACTIONS)
+    
+    for relation in (hybrid_join.customer_disk, hybrid_join.product_disk):
+        assert 0 < relation.stats['partition_reads']
+        assert relation.stats['partition_hits'] == len(enriched)
+
+
+def test_batch_and_tuple_modes_produce_the_same_dtypes(tmp_path):
+    frames = {}
+    for join_mode in ('batch', 'tuple'):
+        hybrid_join = HybridJoinThreaded(join_mode=join_mode, batch_size=500,
+                                         disk_dir=str(tmp_path / join_mode))
+        hybrid_join.load_master_data_to_disk(CUSTOMERS, PRODUCTS)
+        frames[join_mode] = hybrid_join.execute_join_threaded(TRANSACTIONS)
+    
+    assert frames['batch'].dtypes.to_dict() == frames['tuple'].dtypes.to_dict()
+    assert frames['batch']['storeID'].dtype == np.int64
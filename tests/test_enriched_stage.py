@@ -0,0 +1,91 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+import ETL_Transport
+import Hybrid_ETL as etl
+from ETL_Transport import ENRICHED_COLUMNS, EnrichedStage
+from ETL_Join import HybridJoinThreaded
+
+CUSTOMERS = os.path.join(REPO, 'customer_master_data.csv')
+PRODUCTS = os.path.join(REPO, 'product_master_data.csv')
+TRANSACTIONS = os.path.join(REPO, 'transactional_data.csv')
+
+
+def join_into(stage, tmp_path):
+    hybrid_join = HybridJoinThreaded(join_mode='batch', batch_size=200, disk_dir=str(tmp_path / 'disk_buffer'),
+                                     stage=stage)
+    hybrid_join.load_master_data_to_disk(CUSTOMERS, PRODUCTS)
+    hybrid_join.execute_join_threaded(TRANSACTIONS)
+
+
+def in_memory_join(tmp_path):
+    hybrid_join = HybridJoinThreaded(join_mode='batch', batch_size=200, disk_dir=str(tmp_path / 'disk_buffer'))
+    hybrid_join.load_master_data_to_disk(CUSTOMERS, PRODUCTS)
+    return hybrid_join.execute_join_threaded(TRANSACTIONS)
+
+
+def by_order(frame):
+    return frame.sort_values('orderID').reset_index(drop=True)
+
+
+def test_staged_join_reads_back_like_the_in_memory_join(tmp_path):
+    pytest.importorskip('pyarrow')
+    join_into(EnrichedStage(str(tmp_path / 'stage')), tmp_path)
+    
+    stage = EnrichedStage(str(tmp_path / 'stage'))
+    stage.require_manifest()
+    expected = by_order(in_memory_join(tmp_path))
+    staged = by_order(stage.read())
+    assert len(stage) == len(expected)
+    assert staged[ENRICHED_COLUMNS].astype(str).equals(expected[ENRICHED_COLUMNS].astype(str))
+    
+    revenue = by_order(stage.read(columns=['orderID', 'Total_Revenue']))
+    assert list(revenue.columns) == ['orderID', 'Total_Revenue']
+    pd.testing.assert_series_equal(revenue['Total_Revenue'], expected['Total_Revenue'], check_dtype=False)
+
+
+def test_partition_filters_skip_other_months(tmp_path):
+    pytest.importorskip('pyarrow')
+    stage = EnrichedStage(str(tmp_path / 'stage'))
+    join_into(stage, tmp_path)
+    
+    recent = stage.read(columns=['orderID', 'date'], filters=[('month', '>=', '2019-01')])
+    assert len(recent) > 0
+    assert (pd.to_datetime(recent['date']) >= '2019-01-01').all()
+
+
+# A new join clears the previous stage on its first batch, so an interrupted
+# re-join leaves neither the old nor a partial stage to load.
+def test_interrupted_stage_is_not_read_back(tmp_path):
+    pytest.importorskip('pyarrow')
+    join_into(EnrichedStage(str(tmp_path / 'stage')), tmp_path)
+    
+    stage = EnrichedStage(str(tmp_path / 'stage'))
+    stage.append(in_memory_join(tmp_path).head(50))
+    for partition in list(stage.buffers):
+        stage.flush(partition)
+    
+    with pytest.raises(Exception, match="No complete enriched stage"):
+        EnrichedStage(str(tmp_path / 'stage')).require_manifest()
+
+
+@pytest.mark.parametrize('mode', ['--incremental', '--pipelined'])
+def test_from_stage_is_rejected_with_loaders_that_join_themselves(mode):
+    with pytest.raises(SystemExit) as exited:
+        etl.parse_args(['--embedded', '--from-stage', mode])
+    assert exited.value.code == 2
+
+
+def test_from_stage_without_pyarrow_exits_cleanly(monkeypatch, tmp_path):
+    monkeypatch.setattr(ETL_Transport, 'pa', None)
+    args = etl.parse_args([TRANSACTIONS, f"--customers={CUSTOMERS}", f"--products={PRODUCTS}", '--embedded',
+                           '--from-stage', f"--stage={tmp_path / 'stage'}"])
+    with pytest.raises(SystemExit) as exited:
+        etl.run_pipeline(args)
+    assert exited.value.code == 1
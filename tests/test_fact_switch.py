@@ -0,0 +1,177 @@
+import bisect
+import os
+import re
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+from ETL_Loaders import FACT_ARCHIVE_TABLE, FACT_SWITCH_TABLE, archive_fact_months, load_fact_table_switch
+
+
+# Stands in for a SQL Server database with the create_columnstore_fact.sql
+# layout: Fact_Sales, Fact_Sales_Switch and Fact_Sales_Archive partitioned on
+# RANGE RIGHT month boundaries. It understands just the statements the switch
+# loader and archiver issue; anything else fails the test.
+class FakeDatabase:
+    def __init__(self, boundaries):
+        self.boundaries = list(boundaries)
+        self.tables = {'dbo.Fact_Sales': [], FACT_SWITCH_TABLE: [], FACT_ARCHIVE_TABLE: [],
+                       '#Fact_Sales_Staging': []}
+        self.fail_switch = False
+        self.rollbacks = 0
+    
+    def partition(self, date_sk):
+        return bisect.bisect_right(self.boundaries, date_sk) + 1
+    
+    def order_ids(self, table):
+        return sorted(row[0] for row in self.tables[table])
+
+
+class FakeCursor:
+    def __init__(self, database):
+        self.database = database
+        self.rows = []
+        self.fast_executemany = False
+    
+    def execute(self, sql, *params):
+        database = self.database
+        query = ' '.join(sql.split())
+        if 'sys.partition_range_values' in query:
+            self.rows = [(boundary,) for boundary in database.boundaries]
+        elif query.startswith('ALTER PARTITION SCHEME'):
+            pass
+        elif 'SPLIT RANGE' in query:
+            bisect.insort(database.boundaries, int(re.search(r'SPLIT RANGE \((\d+)\)', query).group(1)))
+        elif '$PARTITION' in query:
+            months = [int(month) for month in re.findall(r'\((\d+)\)', query.split('VALUES')[1])]
+            self.rows = [(month, database.partition(month)) for month in months]
+        elif 'FROM sys.partitions' in query:
+            counts = {}
+            for row in database.tables[params[0]]:
+                partition = database.partition(row[3])
+                counts[partition] = counts.get(partition, 0) + 1
+            self.rows = sorted(counts.items())
+        elif query.startswith('TRUNCATE TABLE'):
+            database.tables[query.split()[2]] = []
+        elif query.startswith('ALTER INDEX') or query.startswith('DROP TABLE'):
+            pass
+        elif query.startswith('ALTER TABLE') and 'SWITCH' in query:
+            match = re.match(r'ALTER TABLE (\S+) SWITCH PARTITION (\d+) TO (\S+) PARTITION (\d+)', query)
+            source, partition, target = match.group(1), int(match.group(2)), match.group(3)
+            if database.fail_switch:
+                raise RuntimeError("switch failed")
+            assert not [row for row in database.tables[target] if database.partition(row[3]) == partition]
+            database.tables[target] += [row for row in database.tables[source]
+                                        if database.partition(row[3]) == partition]
+            database.tables[source] = [row for row in database.tables[source]
+                                       if database.partition(row[3]) != partition]
+        elif 'CREATE TABLE #Fact_Sales_Staging' in query:
+            database.tables['#Fact_Sales_Staging'] = []
+        elif 'OUTPUT inserted.Order_ID' in query:
+            target = re.search(r'INSERT INTO (\S+)', query).group(1)
+            existing = {row[0] for table in re.findall(r'NOT EXISTS \(SELECT 1 FROM (\S+) f', query)
+                        for row in database.tables[table]}
+            new = [row for row in database.tables['#Fact_Sales_Staging'] if row[0] not in existing]
+            database.tables[target] += new
+            self.rows = [(row[0],) for row in new]
+        else:
+            raise AssertionError(f"unexpected statement: {query}")
+    
+    def executemany(self, sql, rows):
+        self.database.tables[re.search(r'INSERT INTO (\S+)', sql).group(1)] += list(rows)
+    
+    def fetchall(self):
+        return self.rows
+    
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, database):
+        self.database = database
+    
+    def cursor(self):
+        return FakeCursor(self.database)
+    
+    def commit(self):
+        pass
+    
+    def rollback(self):
+        self.database.rollbacks += 1
+
+
+def month_boundaries(last_year):
+    return [year * 10000 + month * 100 + 1 for year in range(2010, last_year + 1) for month in range(1, 13)]
+
+
+def fact_frame(rows, seed, start='2017-01-01', days=120):
+    rng = np.random.default_rng(seed)
+    dates = pd.to_datetime(start) + pd.to_timedelta(rng.integers(0, days, rows), unit='D')
+    return pd.DataFrame({'Order_ID': seed * 100000 + np.arange(rows), 'Customer_SK': 1, 'Product_SK': 2,
+                         'Date_SK': (dates.year * 10000 + dates.month * 100 + dates.day).astype('int64'),
+                         'Store_SK': 3, 'Supplier_SK': 4, 'Quantity': 1, 'Total_Revenue': 1.5})
+
+
+@pytest.fixture
+def database():
+    return FakeDatabase(month_boundaries(2017))
+
+
+def test_new_months_are_switched_in_and_loaded_months_take_inserts(database):
+    conn = FakeConnection(database)
+    first = fact_frame(5000, 1)
+    result = load_fact_table_switch(conn, None, fact=first, verbose=False)
+    assert result['switched_rows'] == result['loaded'] == 5000
+    assert database.tables[FACT_SWITCH_TABLE] == []
+    
+    # Overlaps the loaded months and runs past the last boundary (2017-12).
+    second = fact_frame(3000, 2, start='2017-03-01', days=400)
+    result = load_fact_table_switch(conn, None, fact=second, verbose=False)
+    assert result['loaded'] == 3000
+    assert 0 < result['switched_rows'] < 3000
+    assert database.boundaries[-1] > 20180101
+    assert database.order_ids('dbo.Fact_Sales') == sorted(first['Order_ID'].tolist() + second['Order_ID'].tolist())
+
+
+def test_failed_switch_rolls_back_and_raises(database):
+    database.fail_switch = True
+    with pytest.raises(RuntimeError):
+        load_fact_table_switch(FakeConnection(database), None, fact=fact_frame(10, 3), verbose=False)
+    assert database.rollbacks == 1
+    assert database.tables['dbo.Fact_Sales'] == []
+
+
+def test_archive_moves_whole_months_and_blocks_occupied_ones(database):
+    conn = FakeConnection(database)
+    load_fact_table_switch(conn, None, fact=fact_frame(5000, 1), verbose=False)
+    result = archive_fact_months(conn, 20170301, verbose=False)
+    assert result['archived_partitions'] == 2
+    assert all(row[3] < 20170301 for row in database.tables[FACT_ARCHIVE_TABLE])
+    assert all(row[3] >= 20170301 for row in database.tables['dbo.Fact_Sales'])
+    
+    late = fact_frame(5, 4, start='2017-01-05', days=3)
+    load_fact_table_switch(conn, None, fact=late, verbose=False)
+    result = archive_fact_months(conn, 20170301, verbose=False)
+    assert result['archived_partitions'] == 0
+    assert len(result['blocked_partitions']) == 1
+
+
+def test_idempotent_replay_skips_rows_already_loaded_or_archived(database):
+    conn = FakeConnection(database)
+    first = fact_frame(5000, 1)
+    load_fact_table_switch(conn, None, fact=first, verbose=False)
+    archive_fact_months(conn, 20170301, verbose=False)
+    archived = len(database.tables[FACT_ARCHIVE_TABLE])
+    
+    # The archived months are empty in Fact_Sales, so they go through the
+    # switch table again; the replay must still find them in the archive.
+    result = load_fact_table_switch(conn, None, fact=first, idempotent=True, verbose=False)
+    assert result['loaded'] == 0
+    assert result['skipped_existing'] == 5000
+    assert len(database.tables['dbo.Fact_Sales']) + archived == 5000
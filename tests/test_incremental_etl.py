@@ -0,0 +1,229 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+import Hybrid_ETL as etl
+from ETL_Transport import TRANSACTION_DTYPES
+from ETL_Analytics import AGGREGATE_SPECS, AlertSink, RevenueAnomalyDetector, StreamingAggregates
+from ETL_Join import HybridJoinThreaded
+from ETL_Loaders import AGGREGATE_KEY_SOURCES
+from ETL_Warehouse import EmbeddedWarehouse
+
+CUSTOMERS = os.path.join(REPO, 'customer_master_data.csv')
+PRODUCTS = os.path.join(REPO, 'product_master_data.csv')
+TRANSACTIONS = os.path.join(REPO, 'transactional_data.csv')
+SCHEMA = os.path.join(REPO, 'create_star_schema.sql')
+
+
+def joinable_order_ids():
+    transactions = pd.read_csv(TRANSACTIONS, index_col=0, dtype=TRANSACTION_DTYPES)
+    customers = pd.read_csv(CUSTOMERS, index_col=0)
+    products = pd.read_csv(PRODUCTS, index_col=0)
+    joinable = (transactions['Customer_ID'].isin(customers['Customer_ID'])
+                & transactions['Product_ID'].isin(products['Product_ID']))
+    return set(transactions.loc[joinable, 'orderID'])
+
+
+def open_warehouse(tmp_path):
+    return EmbeddedWarehouse(path=str(tmp_path / 'dw.duckdb'), schema_path=SCHEMA)
+
+
+def run_incremental(tmp_path, warehouse, watermark, **options):
+    return etl.run_incremental_etl(warehouse, pd.read_csv(CUSTOMERS, index_col=0),
+                                   pd.read_csv(PRODUCTS, index_col=0), TRANSACTIONS,
+                                   checkpoint_path=str(tmp_path / 'checkpoint.json'), watermark=watermark,
+                                   affinity_state_path=str(tmp_path / 'affinity.npz'),
+                                   anomaly_state_path=str(tmp_path / 'anomaly.npz'),
+                                   disk_dir=str(tmp_path / 'disk_buffer'), batch_size=100, **options)
+
+
+def fact_order_ids(warehouse):
+    return [row[0] for row in warehouse.conn.execute("SELECT Order_ID FROM Fact_Sales").fetchall()]
+
+
+# transactional_data.csv is in neither orderID nor date order, so a watermark
+# advanced chunk by chunk within a run would drop most of the stream.
+@pytest.mark.parametrize('watermark', ['offset', 'orderID', 'date'])
+def test_fresh_incremental_run_loads_every_joinable_fact(tmp_path, watermark):
+    warehouse = open_warehouse(tmp_path)
+    run_incremental(tmp_path, warehouse, watermark)
+    
+    loaded = fact_order_ids(warehouse)
+    assert len(loaded) == len(set(loaded))
+    assert set(loaded) == joinable_order_ids()
+    warehouse.close()
+
+
+@pytest.mark.parametrize('watermark', ['offset', 'orderID', 'date'])
+def test_rerun_after_complete_run_loads_nothing(tmp_path, watermark):
+    warehouse = open_warehouse(tmp_path)
+    run_incremental(tmp_path, warehouse, watermark)
+    first = len(fact_order_ids(warehouse))
+    
+    checkpoint = run_incremental(tmp_path, warehouse, watermark)
+    assert len(fact_order_ids(warehouse)) == first
+    assert checkpoint.state['rows_loaded'] == first
+    warehouse.close()
+
+
+def test_idempotent_reload_does_not_duplicate_facts(tmp_path):
+    warehouse = open_warehouse(tmp_path)
+    joined = HybridJoinThreaded(join_mode='batch', batch_size=500, disk_dir=str(tmp_path / 'disk_buffer'))
+    joined.load_master_data_to_disk(pd.read_csv(CUSTOMERS, index_col=0), pd.read_csv(PRODUCTS, index_col=0))
+    enriched = joined.execute_join_threaded(TRANSACTIONS)
+    
+    for _ in range(2):
+        warehouse.load_dimensions(enriched)
+        warehouse.load_fact_table(enriched, idempotent=True)
+    
+    loaded = fact_order_ids(warehouse)
+    assert len(loaded) == len(set(loaded)) == len(joinable_order_ids())
+    warehouse.close()
+
+
+def detector_totals(detector):
+    return pd.Series(detector.day_totals, index=detector.day_keys).sort_index()
+
+
+# The state files are written before the checkpoint that names them; a crash
+# in between must resume from the previous checkpoint's state, or the replayed
+# batches are counted twice by the revenue detector.
+def test_crash_before_the_checkpoint_rename_resumes_from_matching_state(tmp_path, monkeypatch):
+    whole = RevenueAnomalyDetector(AlertSink(str(tmp_path / 'whole.jsonl')))
+    (tmp_path / 'whole').mkdir()
+    run_incremental(tmp_path / 'whole', open_warehouse(tmp_path / 'whole'), 'offset', checkpoint_every=2,
+                    anomaly_detector=whole)
+    
+    checkpoint_path = str(tmp_path / 'checkpoint.json')
+    replace = os.replace
+    calls = {'checkpoint': 0}
+    
+    def crashing_replace(source, destination):
+        if destination == checkpoint_path:
+            calls['checkpoint'] += 1
+            if calls['checkpoint'] == 3:
+                raise RuntimeError("crashed before the checkpoint rename")
+        replace(source, destination)
+    
+    warehouse = open_warehouse(tmp_path)
+    monkeypatch.setattr(os, 'replace', crashing_replace)
+    with pytest.raises(RuntimeError):
+        run_incremental(tmp_path, warehouse, 'offset', checkpoint_every=2,
+                        anomaly_detector=RevenueAnomalyDetector(AlertSink(str(tmp_path / 'first.jsonl'))))
+    monkeypatch.setattr(os, 'replace', replace)
+    assert etl.EtlCheckpoint(checkpoint_path).state['batches_committed'] == 4
+    
+    resumed = RevenueAnomalyDetector(AlertSink(str(tmp_path / 'resumed.jsonl')))
+    checkpoint = run_incremental(tmp_path, warehouse, 'offset', checkpoint_every=2, anomaly_detector=resumed)
+    
+    pd.testing.assert_series_equal(detector_totals(resumed), detector_totals(whole))
+    assert set(fact_order_ids(warehouse)) == joinable_order_ids()
+    assert sorted(path.name for path in tmp_path.glob('*.npz')) == ['affinity.10.npz', 'anomaly.10.npz']
+    assert checkpoint.state_file('anomalies') == str(tmp_path / 'anomaly.10.npz')
+    warehouse.close()
+
+
+def test_checkpoint_refuses_to_resume_without_its_state_files(tmp_path):
+    warehouse = open_warehouse(tmp_path)
+    run_incremental(tmp_path, warehouse, 'offset',
+                    anomaly_detector=RevenueAnomalyDetector(AlertSink(str(tmp_path / 'alerts.jsonl'))))
+    warehouse.close()
+    
+    os.remove(str(tmp_path / 'anomaly.10.npz'))
+    with pytest.raises(RuntimeError, match='anomaly.10.npz'):
+        etl.EtlCheckpoint(str(tmp_path / 'checkpoint.json'))
+
+
+# Recomputes every summary table from Fact_Sales and returns the tables whose
+# stored groups differ.
+def stale_aggregates(warehouse):
+    stale = []
+    for table, keys in AGGREGATE_SPECS.items():
+        columns = [column for column, _ in keys]
+        sources = ', '.join(AGGREGATE_KEY_SOURCES[column] for column in columns)
+        expected = warehouse.conn.execute(f"""
+            SELECT {sources}, ROUND(SUM(f.Total_Revenue), 2), SUM(f.Quantity), COUNT(*)
+            FROM Fact_Sales f
+            JOIN Dim_Date d ON f.Date_SK = d.Date_SK
+            JOIN Dim_Product p ON f.Product_SK = p.Product_SK
+            JOIN Dim_Store s ON f.Store_SK = s.Store_SK
+            JOIN Dim_Supplier sup ON f.Supplier_SK = sup.Supplier_SK
+            GROUP BY {sources}
+        """).fetchall()
+        stored = warehouse.conn.execute(
+            f"SELECT {', '.join(columns)}, Total_Revenue, Total_Quantity, Total_Orders FROM {table}").fetchall()
+        normalise = lambda rows: {row[:-3]: (round(float(row[-3]), 2), row[-2], row[-1]) for row in rows}
+        if normalise(stored) != normalise(expected):
+            stale.append(table)
+    return stale
+
+
+def test_incremental_run_keeps_aggregates_in_step_with_facts(tmp_path):
+    warehouse = open_warehouse(tmp_path)
+    run_incremental(tmp_path, warehouse, 'offset')
+    
+    assert stale_aggregates(warehouse) == []
+    warehouse.close()
+
+
+# Facts are committed before the summary tables are merged; a crash in between
+# must be repaired by the replay, which loads none of the batch's facts again.
+def test_replay_after_crash_between_fact_load_and_merge_repairs_aggregates(tmp_path, monkeypatch):
+    warehouse = open_warehouse(tmp_path)
+    merge_aggregates = EmbeddedWarehouse.merge_aggregates
+    calls = {'merge': 0}
+    
+    def crashing_merge(self, aggregates):
+        calls['merge'] += 1
+        if calls['merge'] == 5:
+            raise RuntimeError("crashed after the fact load")
+        merge_aggregates(self, aggregates)
+    
+    monkeypatch.setattr(EmbeddedWarehouse, 'merge_aggregates', crashing_merge)
+    with pytest.raises(RuntimeError):
+        run_incremental(tmp_path, warehouse, 'offset')
+    assert stale_aggregates(warehouse) != []
+    
+    monkeypatch.setattr(EmbeddedWarehouse, 'merge_aggregates', merge_aggregates)
+    run_incremental(tmp_path, warehouse, 'offset')
+    
+    loaded = fact_order_ids(warehouse)
+    assert set(loaded) == joinable_order_ids()
+    assert stale_aggregates(warehouse) == []
+    warehouse.close()
+
+
+def summary_tables(warehouse):
+    tables = {}
+    for table in AGGREGATE_SPECS:
+        rows = warehouse.conn.execute(f"SELECT * FROM {table}").fetchall()
+        tables[table] = sorted(row[:-3] + (round(float(row[-3]), 2),) + row[-2:] for row in rows)
+    return tables
+
+
+# Archived months still belong to their groups: a rebuild after facts moved
+# to Fact_Sales_Archive, of some groups or of all of them, must keep them.
+def test_rebuild_counts_facts_moved_to_the_archive(tmp_path):
+    warehouse = open_warehouse(tmp_path)
+    run_incremental(tmp_path, warehouse, 'offset')
+    before = summary_tables(warehouse)
+    
+    warehouse.conn.execute("CREATE TABLE Fact_Sales_Archive AS SELECT * FROM Fact_Sales WHERE Date_SK % 2 = 0")
+    warehouse.conn.execute("DELETE FROM Fact_Sales WHERE Date_SK % 2 = 0")
+    
+    joined = HybridJoinThreaded(join_mode='batch', batch_size=500, disk_dir=str(tmp_path / 'disk_buffer'))
+    joined.load_master_data_to_disk(CUSTOMERS, PRODUCTS)
+    aggregates = StreamingAggregates()
+    aggregates.update(joined.execute_join_threaded(TRANSACTIONS).head(100))
+    warehouse.rebuild_aggregates(aggregates)
+    assert summary_tables(warehouse) == before
+    
+    warehouse.conn.execute("DELETE FROM Agg_Store_Quarter")
+    warehouse.rebuild_aggregates(None)
+    assert summary_tables(warehouse) == before
+    warehouse.close()
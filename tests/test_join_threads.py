@@ -0,0 +1,112 @@
+import os
+import sys
+import threading
+
+import pandas as pd
+import pytest
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+from ETL_Transport import DataFrameStreamSource, TRANSACTION_DTYPES
+from ETL_Join import HybridJoinThreaded
+
+CUSTOMERS = os.path.join(REPO, 'customer_master_data.csv')
+PRODUCTS = os.path.join(REPO, 'product_master_data.csv')
+TRANSACTIONS = os.path.join(REPO, 'transactional_data.csv')
+
+
+class FailingAggregates:
+    def update(self, joined):
+        raise RuntimeError("aggregation failed")
+
+
+def repeated_stream(times):
+    transactions = pd.read_csv(TRANSACTIONS, index_col=0, dtype=TRANSACTION_DTYPES)
+    return pd.concat([transactions] * times, ignore_index=True)
+
+
+def run_with_deadline(target, seconds=60):
+    outcome = {}
+    
+    def run():
+        try:
+            outcome['result'] = target()
+        except Exception as e:
+            outcome['error'] = e
+    
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(seconds)
+    assert not thread.is_alive(), "join did not finish (producer left blocked on the stream buffer)"
+    return outcome
+
+
+@pytest.mark.parametrize('join_mode', ['batch', 'tuple'])
+def test_consumer_failure_stops_producer_and_is_raised(tmp_path, join_mode):
+    hybrid_join = HybridJoinThreaded(join_mode=join_mode, batch_size=5000, disk_dir=str(tmp_path))
+    hybrid_join.load_master_data_to_disk(CUSTOMERS, PRODUCTS)
+    hybrid_join.aggregates = FailingAggregates()
+    
+    outcome = run_with_deadline(lambda: hybrid_join.execute_join_threaded(repeated_stream(60)))
+    assert isinstance(outcome.get('error'), RuntimeError)
+    assert hybrid_join.stream_buffer.cancelled
+
+
+def test_producer_failure_is_raised(tmp_path):
+    class BrokenSource(DataFrameStreamSource):
+        def read_chunks(self):
+            yield from list(super().read_chunks())[:2]
+            raise IOError("source went away")
+    
+    hybrid_join = HybridJoinThreaded(join_mode='batch', batch_size=500, disk_dir=str(tmp_path))
+    hybrid_join.load_master_data_to_disk(CUSTOMERS, PRODUCTS)
+    source = BrokenSource(repeated_stream(2), chunk_size=500)
+    
+    outcome = run_with_deadline(lambda: hybrid_join.execute_join_threaded(source))
+    assert isinstance(outcome.get('error'), IOError)
+
+
+def test_batch_mode_counts_hits_without_the_hash_table(tmp_path):
+    hybrid_join = HybridJoinThreaded(join_mode='batch', batch_size=500, disk_dir=str(tmp_path))
+    hybrid_join.load_master_data_to_disk(CUSTOMERS, PRODUCTS)
+    hybrid_join.execute_join_threaded(repeated_stream(2))
+    
+    stats = hybrid_join.stats
+    assert stats['snapshot_lookups'] == stats['processed'] == stats['joined'] + stats['dropped']
+    assert stats['hash_hits'] + stats['queue_hits'] == stats['joined']
+    assert stats['hash_hits'] == stats['joined'] // 2
+    assert len(hybrid_join.hash_table) == 0
+
+
+def test_batch_and_tuple_modes_produce_the_same_rows_and_counters(tmp_path):
+    results = {}
+    for join_mode in ('batch', 'tuple'):
+        hybrid_join = HybridJoinThreaded(join_mode=join_mode, batch_size=500,
+                                         disk_dir=str(tmp_path / join_mode))
+        hybrid_join.load_master_data_to_disk(CUSTOMERS, PRODUCTS)
+        enriched = hybrid_join.execute_join_threaded(repeated_stream(2))
+        results[join_mode] = (enriched.sort_values('orderID', kind='stable').reset_index(drop=True),
+                              dict(hybrid_join.stats))
+    
+    pd.testing.assert_frame_equal(results['batch'][0], results['tuple'][0])
+    batch_stats, tuple_stats = results['batch'][1], results['tuple'][1]
+    for counter in ('processed', 'joined', 'dropped'):
+        assert batch_stats[counter] == tuple_stats[counter]
+    for stats in (batch_stats, tuple_stats):
+        assert stats['hash_hits'] + stats['queue_hits'] == stats['joined']
+        assert stats['hash_hits'] > 0
+
+
+@pytest.mark.parametrize('join_mode', ['batch', 'tuple'])
+def test_summary_reports_hash_table_or_how_to_get_its_statistics(tmp_path, capsys, join_mode):
+    hybrid_join = HybridJoinThreaded(join_mode=join_mode, batch_size=500, disk_dir=str(tmp_path))
+    hybrid_join.load_master_data_to_disk(CUSTOMERS, PRODUCTS)
+    hybrid_join.execute_join_threaded(TRANSACTIONS)
+    
+    summary = capsys.readouterr().out
+    assert 'Hash Table Hits' in summary and 'Queue Processing Hits' in summary
+    if join_mode == 'tuple':
+        assert 'Hash Table Utilization' in summary and 'Hash Table Evictions' in summary
+    else:
+        assert '--join-mode=tuple' in summary
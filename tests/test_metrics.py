@@ -0,0 +1,105 @@
+import os
+import sys
+import threading
+
+import pytest
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+from ETL_Metrics import LatencyHistogram, MetricsExporter, MetricsRegistry
+
+
+def prometheus_samples(text):
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith('#'):
+            name, value = line.rsplit(' ', 1)
+            samples[name] = float(value)
+    return samples
+
+
+# A latency equal to a bucket bound falls in that bucket (Prometheus `le`).
+def test_histogram_buckets_are_upper_bound_inclusive():
+    histogram = LatencyHistogram(buckets=(0.001, 0.01, 0.1))
+    for seconds in (0.0005, 0.001, 0.002, 0.01, 0.05, 2.0):
+        histogram.observe(seconds)
+    
+    assert histogram.counts == [2, 2, 1, 1]
+    snapshot = histogram.snapshot()
+    assert snapshot['buckets'] == {'0.001': 2, '0.01': 2, '0.1': 1, '+Inf': 1}
+    assert snapshot['count'] == 6
+    assert snapshot['max'] == 2.0
+    assert snapshot['sum'] == pytest.approx(2.0635)
+    assert histogram.quantile(0.5) == 0.01
+    assert histogram.quantile(1.0) == 2.0
+
+
+def test_histograms_recorded_on_different_threads_are_merged():
+    metrics = MetricsRegistry()
+    threads = [threading.Thread(target=lambda: [metrics.observe('join', 0.002) for _ in range(50)])
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    metrics.observe('load', 0.5)
+    
+    histograms = metrics.snapshot()['histograms']
+    assert histograms['join']['count'] == 200
+    assert histograms['join']['buckets']['0.005'] == 200
+    assert histograms['load']['buckets']['0.5'] == 1
+
+
+def test_prometheus_text_has_cumulative_buckets_counters_and_gauges():
+    metrics = MetricsRegistry(namespace='test')
+    metrics.increment('facts_loaded', 7)
+    metrics.set_gauge('queue_depth', 3)
+    metrics.register_collector('join', lambda: {'hash_slots_used': 12})
+    for seconds in (0.00002, 0.0002, 0.0002, 60.0):
+        metrics.observe('join', seconds)
+    
+    text = metrics.to_prometheus()
+    assert '# TYPE test_facts_loaded_total counter' in text
+    assert '# TYPE test_queue_depth gauge' in text
+    assert '# TYPE test_stage_seconds histogram' in text
+    
+    samples = prometheus_samples(text)
+    assert samples['test_facts_loaded_total'] == 7
+    assert samples['test_queue_depth'] == 3
+    assert samples['test_hash_slots_used'] == 12
+    assert samples['test_stage_seconds_bucket{stage="join",le="1e-05"}'] == 0
+    assert samples['test_stage_seconds_bucket{stage="join",le="5e-05"}'] == 1
+    assert samples['test_stage_seconds_bucket{stage="join",le="0.0005"}'] == 3
+    assert samples['test_stage_seconds_bucket{stage="join",le="30.0"}'] == 3
+    assert samples['test_stage_seconds_bucket{stage="join",le="+Inf"}'] == 4
+    assert samples['test_stage_seconds_count{stage="join"}'] == 4
+    assert samples['test_stage_seconds_sum{stage="join"}'] == pytest.approx(60.00042)
+
+
+def test_prometheus_export_replaces_the_file(tmp_path):
+    metrics = MetricsRegistry()
+    metrics.increment('db_commits')
+    path = str(tmp_path / 'metrics.prom')
+    exporter = MetricsExporter(path, 'prometheus', metrics=metrics)
+    exporter.write()
+    metrics.increment('db_commits')
+    exporter.write()
+    
+    with open(path) as handle:
+        assert prometheus_samples(handle.read())['hybridjoin_db_commits_total'] == 2
+    assert os.listdir(str(tmp_path)) == ['metrics.prom']
+
+
+def test_sampled_timer_times_one_call_in_every():
+    metrics = MetricsRegistry()
+    for _ in range(130):
+        with metrics.sampled_timer('hash_probe', every=64):
+            pass
+    assert metrics.histograms()['hash_probe'].count == 3
+    
+    metrics.enable_profiling(['join'])
+    for _ in range(10):
+        with metrics.sampled_timer('join', every=64):
+            pass
+    assert metrics.histograms()['join'].count == 10
@@ -0,0 +1,96 @@
+import contextlib
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+from ETL_Transport import TRANSACTION_DTYPES
+from ETL_Join import HybridJoinThreaded
+import OLAP_Engine as olap
+
+CUSTOMERS = os.path.join(REPO, 'customer_master_data.csv')
+PRODUCTS = os.path.join(REPO, 'product_master_data.csv')
+TRANSACTIONS = os.path.join(REPO, 'transactional_data.csv')
+
+
+@pytest.fixture(scope='module')
+def enriched(tmp_path_factory):
+    hybrid_join = HybridJoinThreaded(join_mode='batch', batch_size=100,
+                                     disk_dir=str(tmp_path_factory.mktemp('disk_buffer')))
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        hybrid_join.load_master_data_to_disk(CUSTOMERS, PRODUCTS)
+        transactions = pd.read_csv(TRANSACTIONS, index_col=0, dtype=TRANSACTION_DTYPES).head(400)
+        return hybrid_join.execute_join_threaded(transactions)
+
+
+def expected_group_by(enriched, keys, mask):
+    frame = pd.DataFrame(olap.columnar_frame(enriched))[mask(pd.DataFrame(olap.columnar_frame(enriched)))]
+    grouped = frame.groupby(keys).agg(Revenue=('Total_Revenue', 'sum'), Orders=('Order_ID', 'count'))
+    grouped['Revenue'] = grouped['Revenue'].round(2)
+    return grouped.reset_index().sort_values(keys).reset_index(drop=True)
+
+
+def test_bitmap_index_ors_the_bitmaps_of_each_code():
+    index = olap.BitmapIndex(np.array([0, 1, 2, 1, 0, 2, 2, 1, 0]))
+    
+    assert np.unpackbits(index.any_of([1]), count=9).tolist() == [0, 1, 0, 1, 0, 0, 0, 1, 0]
+    assert np.unpackbits(index.any_of([0, 2]), count=9).tolist() == [1, 0, 1, 0, 1, 1, 1, 0, 1]
+    assert not np.unpackbits(index.any_of([]), count=9).any()
+
+
+def test_where_filters_match_a_pandas_group_by(enriched):
+    engine = olap.ColumnarOlapEngine(enriched)
+    categories = sorted(enriched['Product_Category'].unique())[:3]
+    where = {'Gender': 'M', 'Product_Category': categories, 'Month': range(1, 7)}
+    
+    actual = engine.group_by(['Store_Name'], {'Revenue': olap.REVENUE, 'Orders': ('count', None)}, where=where)
+    expected = expected_group_by(enriched, ['Store_Name'],
+                                 lambda frame: (frame['Gender'] == 'M') & frame['Product_Category'].isin(categories)
+                                 & frame['Month'].between(1, 6))
+    assert len(expected) > 0
+    pd.testing.assert_frame_equal(actual.sort_values('Store_Name').reset_index(drop=True), expected,
+                                  check_dtype=False)
+
+
+def test_where_on_an_unknown_value_selects_nothing(enriched):
+    engine = olap.ColumnarOlapEngine(enriched)
+    
+    frame = engine.group_by(['Store_Name'], {'Revenue': olap.REVENUE}, where={'Gender': 'X'})
+    assert frame.empty
+    frame = engine.group_by([], {'Revenue': olap.REVENUE}, where={'Gender': ['M', 'X']})
+    assert frame['Revenue'].iloc[0] == round(enriched.loc[enriched['Gender'] == 'M', 'Total_Revenue'].sum(), 2)
+
+
+def test_append_invalidates_cached_results(enriched):
+    engine = olap.ColumnarOlapEngine(enriched.iloc[:200])
+    first = engine.group_by(['Year'], {'Orders': ('count', None)})
+    first['Orders'] = 0
+    cached = engine.group_by(['Year'], {'Orders': ('count', None)})
+    assert engine.cache.stats['hits'] == 1
+    assert cached['Orders'].sum() == 200
+    
+    assert engine.append(enriched.iloc[200:]) == 2
+    assert all(version == 2 for _, version in engine.cache.entries)
+    refreshed = engine.group_by(['Year'], {'Orders': ('count', None)}, where={'Year': list(range(2000, 2100))})
+    assert refreshed['Orders'].sum() == len(enriched)
+    assert engine.group_by(['Year'], {'Orders': ('count', None)})['Orders'].sum() == len(enriched)
+    assert engine.cache.stats['hits'] == 1
+
+
+def test_verify_compares_values_not_just_row_counts(enriched, monkeypatch):
+    monkeypatch.chdir(REPO)
+    engine = olap.ColumnarOlapEngine(enriched)
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        assert olap.verify_against_warehouse(engine, enriched) == []
+    
+    query = olap.OLAP_CATALOGUE['Q3']
+    monkeypatch.setitem(olap.OLAP_CATALOGUE, 'Q3',
+                        lambda engine: query(engine).assign(Total_Sales=lambda frame: frame['Total_Sales'] + 0.01))
+    engine = olap.ColumnarOlapEngine(enriched)
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        assert olap.verify_against_warehouse(engine, enriched) == ['Q3']
@@ -0,0 +1,175 @@
+import os
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+from ETL_Loaders import ConnectionPool, load_fact_partition, load_fact_table_parallel, partition_fact_rows
+
+
+# Stands in for a pyodbc connection to dbo.Fact_Sales: rows inserted by a
+# cursor stay pending until commit, rollback drops them, and the first
+# `deadlocks` inserts fail the way SQL Server reports a deadlock victim.
+class FakeDatabase:
+    def __init__(self, deadlocks=0):
+        self.rows = []
+        self.deadlocks = deadlocks
+        self.lock = threading.Lock()
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.fast_executemany = False
+    
+    def execute(self, sql, *params):
+        pass
+    
+    def executemany(self, sql, rows):
+        database = self.conn.database
+        with database.lock:
+            if database.deadlocks:
+                database.deadlocks -= 1
+                raise Exception('40001', "[40001] Transaction was deadlocked and has been chosen as "
+                                         "the deadlock victim. Rerun the transaction. (1205)")
+        self.conn.pending.extend(rows)
+    
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, database):
+        self.database = database
+        self.pending = []
+        self.closed = False
+    
+    def cursor(self):
+        return FakeCursor(self)
+    
+    def commit(self):
+        with self.database.lock:
+            self.database.rows.extend(self.pending)
+        self.pending = []
+    
+    def rollback(self):
+        self.pending = []
+    
+    def close(self):
+        self.closed = True
+
+
+def fact_frame(date_keys):
+    count = len(date_keys)
+    return pd.DataFrame({'Order_ID': np.arange(1, count + 1), 'Customer_SK': 1, 'Product_SK': 1,
+                         'Date_SK': date_keys, 'Store_SK': 1, 'Supplier_SK': 1, 'Quantity': 1,
+                         'Total_Revenue': 9.99})
+
+
+@pytest.mark.parametrize('date_keys, partitions, expected', [
+    ([1, 1, 1, 1, 1, 2, 3], 2, [[1, 1, 1, 1, 1], [2, 3]]),
+    ([1, 1, 1, 1, 1, 2, 3], 3, [[1, 1, 1, 1, 1], [2, 3]]),
+    ([1, 2, 2, 2, 2, 2, 2, 3], 3, [[1], [2, 2, 2, 2, 2, 2], [3]]),
+    ([1, 2, 3, 4, 5, 6, 7, 8], 4, [[1, 2], [3, 4], [5, 6], [7, 8]]),
+    ([5, 5, 5], 3, [[5, 5, 5]]),
+])
+def test_partition_fact_rows_keeps_keys_whole_without_collapsing(date_keys, partitions, expected):
+    parts = partition_fact_rows(fact_frame(date_keys), 'Date_SK', partitions)
+    assert [part['Date_SK'].tolist() for part in parts] == expected
+
+
+def test_pool_opens_lazily_and_reuses_connections():
+    database = FakeDatabase()
+    pool = ConnectionPool(lambda: FakeConnection(database), size=2)
+    assert pool.opened == 0
+    
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        assert second is first
+    assert pool.stats['opened'] == 1
+    assert pool.stats['reused'] == 1
+    pool.close()
+    assert first.closed
+
+
+def test_pool_blocks_at_size_until_a_connection_is_released():
+    pool = ConnectionPool(lambda: FakeConnection(FakeDatabase()), size=1)
+    held = pool.acquire()
+    acquired = []
+    waiter = threading.Thread(target=lambda: acquired.append(pool.acquire()))
+    waiter.start()
+    waiter.join(0.2)
+    assert waiter.is_alive() and not acquired
+    
+    pool.release(held)
+    waiter.join(5)
+    assert acquired == [held]
+    assert pool.stats['waits'] >= 1
+
+
+def test_pool_discards_a_connection_that_raised():
+    pool = ConnectionPool(lambda: FakeConnection(FakeDatabase()), size=1)
+    with pytest.raises(RuntimeError):
+        with pool.connection() as broken:
+            raise RuntimeError("query failed")
+    
+    assert broken.closed
+    with pool.connection() as conn:
+        assert conn is not broken
+    assert pool.stats['discarded'] == 1
+
+
+def test_closed_pool_refuses_connections():
+    pool = ConnectionPool(lambda: FakeConnection(FakeDatabase()), size=1)
+    pool.close()
+    with pytest.raises(RuntimeError):
+        pool.acquire()
+
+
+def test_deadlocked_batches_are_rolled_back_and_retried():
+    database = FakeDatabase(deadlocks=3)
+    fact = fact_frame(np.repeat(np.arange(20170101, 20170109), 50))
+    
+    result = load_fact_partition(FakeConnection(database), fact, batch_size=100, retry_backoff=0)
+    assert result['retries'] == 3
+    assert result['loaded'] == len(fact)
+    assert sorted(row[0] for row in database.rows) == fact['Order_ID'].tolist()
+
+
+def test_retries_are_bounded_and_other_errors_are_not_retried():
+    fact = fact_frame([20170101] * 10)
+    database = FakeDatabase(deadlocks=10)
+    with pytest.raises(Exception) as raised:
+        load_fact_partition(FakeConnection(database), fact, max_retries=2, retry_backoff=0)
+    assert raised.value.args[0] == '40001'
+    assert database.deadlocks == 7 and database.rows == []
+    
+    class BrokenCursor(FakeCursor):
+        def executemany(self, sql, rows):
+            raise Exception('23000', "Violation of PRIMARY KEY constraint")
+    
+    conn = FakeConnection(FakeDatabase())
+    conn.cursor = lambda: BrokenCursor(conn)
+    with pytest.raises(Exception) as raised:
+        load_fact_partition(conn, fact, retry_backoff=0)
+    assert raised.value.args[0] == '23000'
+
+
+def test_parallel_load_survives_deadlocks_across_pooled_connections():
+    database = FakeDatabase(deadlocks=4)
+    pool = ConnectionPool(lambda: FakeConnection(database), size=4)
+    fact = fact_frame(np.repeat(np.arange(20170101, 20170121), 100))
+    
+    result = load_fact_table_parallel(pool, None, fact=fact, workers=4, batch_size=250, retry_backoff=0,
+                                      verbose=False)
+    assert result['loaded'] == len(fact)
+    assert result['retries'] == 4
+    assert sorted(row[0] for row in database.rows) == fact['Order_ID'].tolist()
+    assert pool.stats['opened'] <= 4
+    pool.close()
@@ -0,0 +1,77 @@
+import contextlib
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+from ETL_Transport import TRANSACTION_DTYPES
+from ETL_Analytics import PACKED_KEY_BITS, PACKED_KEY_MASK, ProductAffinity, StreamingAggregates
+from ETL_Join import HybridJoinThreaded, execute_join_parallel
+
+CUSTOMERS = os.path.join(REPO, 'customer_master_data.csv')
+PRODUCTS = os.path.join(REPO, 'product_master_data.csv')
+TRANSACTIONS = os.path.join(REPO, 'transactional_data.csv')
+
+
+def sorted_frame(frame):
+    return frame.sort_values(list(frame.columns)).reset_index(drop=True)
+
+
+# Every product pair with its co-purchase count, independent of the product
+# codes each instance assigned (top_partners breaks ties by code order).
+def pair_counts(affinity):
+    product_ids = affinity.product_ids.to_numpy()
+    low = product_ids[affinity.pair_keys >> PACKED_KEY_BITS]
+    high = product_ids[affinity.pair_keys & PACKED_KEY_MASK]
+    frame = pd.DataFrame({'First': [min(pair) for pair in zip(low, high)],
+                          'Second': [max(pair) for pair in zip(low, high)],
+                          'Count': affinity.pair_counts})
+    return sorted_frame(frame)
+
+
+def single_worker_join(tmp_path):
+    hybrid_join = HybridJoinThreaded(join_mode='batch', batch_size=200, disk_dir=str(tmp_path / 'single'),
+                                     maintain_aggregates=True, maintain_affinity=True)
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        hybrid_join.load_master_data_to_disk(CUSTOMERS, PRODUCTS)
+        hybrid_join.execute_join_threaded(TRANSACTIONS)
+    return hybrid_join
+
+
+@pytest.mark.parametrize('shard_by', ['Customer_ID', 'Product_ID'])
+def test_sharded_join_matches_single_worker(tmp_path, shard_by):
+    single = single_worker_join(tmp_path)
+    
+    aggregates = StreamingAggregates()
+    affinity = ProductAffinity()
+    enriched, stats, _ = execute_join_parallel(pd.read_csv(CUSTOMERS, index_col=0),
+                                               pd.read_csv(PRODUCTS, index_col=0),
+                                               pd.read_csv(TRANSACTIONS, index_col=0, dtype=TRANSACTION_DTYPES),
+                                               num_workers=3, shard_by=shard_by, verbose=False,
+                                               aggregates=aggregates, affinity=affinity, join_mode='batch',
+                                               batch_size=200, disk_dir=str(tmp_path / 'sharded'))
+    
+    for counter in ('processed', 'joined', 'dropped'):
+        assert stats[counter] == single.stats[counter]
+    assert len(enriched) == single.stats['joined']
+    assert aggregates.rows_aggregated == single.aggregates.rows_aggregated
+    for name, frame in single.aggregates.frames().items():
+        pd.testing.assert_frame_equal(sorted_frame(aggregates.frame(name)), sorted_frame(frame), check_dtype=False)
+    pd.testing.assert_frame_equal(pair_counts(affinity), pair_counts(single.affinity))
+
+
+def test_absorb_replays_customers_seen_on_both_sides():
+    joined = pd.DataFrame({'Customer_ID': [1, 1, 2, 2, 3], 'Product_ID': ['A', 'B', 'A', 'C', 'B']})
+    expected = ProductAffinity()
+    expected.update(joined)
+    
+    left, right = ProductAffinity(), ProductAffinity()
+    left.update(joined.iloc[[0, 2, 4]])
+    right.update(joined.iloc[[1, 3]])
+    left.absorb(right)
+    
+    pd.testing.assert_frame_equal(pair_counts(left), pair_counts(expected))
@@ -0,0 +1,104 @@
+import itertools
+import os
+import sys
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+import pytest
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+import ETL_Analytics
+from ETL_Analytics import PACKED_KEY_BITS, PACKED_KEY_MASK, ProductAffinity
+
+COUNTERS = [pytest.param('sparse', marks=pytest.mark.skipif(ETL_Analytics.sparse is None,
+                                                           reason="scipy is not installed")),
+            'joined']
+
+
+@pytest.fixture(params=COUNTERS)
+def counter(request, monkeypatch):
+    if request.param == 'joined':
+        monkeypatch.setattr(ETL_Analytics, 'sparse', None)
+    return request.param
+
+
+def purchases(rows=600, customers=40, products=25, seed=3):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({'Customer_ID': rng.integers(1000, 1000 + customers, rows),
+                         'Product_ID': [f"P{code:03d}" for code in rng.integers(0, products, rows)]})
+
+
+# Customers who bought both products of each pair, counted the obvious way.
+def brute_force_pairs(joined):
+    baskets = joined.drop_duplicates().groupby('Customer_ID')['Product_ID'].apply(sorted)
+    return dict(Counter(pair for basket in baskets for pair in itertools.combinations(basket, 2)))
+
+
+def affinity_pairs(affinity):
+    product_ids = affinity.product_ids.to_numpy()
+    low = product_ids[affinity.pair_keys >> PACKED_KEY_BITS]
+    high = product_ids[affinity.pair_keys & PACKED_KEY_MASK]
+    return {tuple(sorted(pair)): int(count) for pair, count in zip(zip(low, high), affinity.pair_counts)}
+
+
+def test_batched_updates_match_a_pairwise_count(counter):
+    joined = purchases()
+    affinity = ProductAffinity()
+    for start, end in [(0, 1), (1, 50), (50, 51), (51, 300), (300, 600)]:
+        affinity.update(joined.iloc[start:end])
+    
+    assert affinity_pairs(affinity) == brute_force_pairs(joined)
+    assert len(affinity.purchases) == len(joined.drop_duplicates())
+
+
+def test_replayed_batches_are_not_counted_twice(counter):
+    joined = purchases()
+    affinity = ProductAffinity()
+    affinity.update(joined.iloc[:400])
+    affinity.update(joined.iloc[200:400])
+    affinity.update(joined.iloc[300:])
+    affinity.update(joined)
+    
+    assert affinity_pairs(affinity) == brute_force_pairs(joined)
+
+
+def test_saved_state_resumes_without_double_counting(tmp_path, counter):
+    joined = purchases()
+    first = ProductAffinity()
+    first.update(joined.iloc[:350])
+    first.save(str(tmp_path / 'affinity.npz'))
+    
+    resumed = ProductAffinity(state_path=str(tmp_path / 'affinity.npz'))
+    resumed.update(joined.iloc[300:])
+    assert affinity_pairs(resumed) == brute_force_pairs(joined)
+
+
+def test_top_partners_keep_the_highest_counts_per_product():
+    joined = purchases(rows=900, seed=5)
+    affinity = ProductAffinity(top_k=3)
+    affinity.update(joined)
+    partners = affinity.top_partners()
+    
+    expected = {}
+    for (first, second), count in brute_force_pairs(joined).items():
+        expected.setdefault(first, []).append(count)
+        expected.setdefault(second, []).append(count)
+    for product, counts in expected.items():
+        rows = partners[partners['Product_ID'] == product]
+        assert rows['Co_Purchase_Count'].tolist() == sorted(counts, reverse=True)[:3]
+        assert rows['Partner_Rank'].tolist() == list(range(1, len(rows) + 1))
+
+
+def test_changes_list_only_products_whose_counts_moved():
+    affinity = ProductAffinity()
+    affinity.update(pd.DataFrame({'Customer_ID': [1, 1, 2, 2], 'Product_ID': ['A', 'B', 'C', 'D']}))
+    affinity.changes()
+    
+    affinity.update(pd.DataFrame({'Customer_ID': [1, 1, 3], 'Product_ID': ['A', 'E', 'D']}))
+    rows, products = affinity.changes()
+    assert sorted(products) == ['A', 'B', 'E']
+    assert set(rows['Product_ID']) == {'A', 'B', 'E'}
+    assert affinity.changes()[1] == []
@@ -0,0 +1,99 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+from ETL_Analytics import RevenueAnomalyDetector
+
+
+class ListSink:
+    def __init__(self):
+        self.frames = []
+    
+    def write(self, alerts):
+        self.frames.append(alerts)
+    
+    def net_alerts(self):
+        if not self.frames:
+            return set()
+        latest = pd.concat(self.frames).groupby(['Date', 'Product_ID'])['Revenue_Status'].last()
+        return set(latest[latest != 'Retracted'].index)
+
+
+def daily_sales(days=60, rows=20000, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'Product_ID': rng.choice(['P1', 'P2', 'P3', 'P4'], rows),
+        'date': (pd.Timestamp('2020-01-01') + pd.to_timedelta(rng.integers(0, days, rows), 'D')).astype(str),
+        'Total_Revenue': rng.gamma(2.0, 50.0, rows)
+    })
+
+
+def feed(detector, sales, batch_size=100):
+    for start in range(0, len(sales), batch_size):
+        detector.update(sales.iloc[start:start + batch_size])
+
+
+def final_outliers(detector):
+    outliers = detector.outliers()
+    return set(zip(outliers['Date'], outliers['Product_ID']))
+
+
+# A shuffled stream scored on partial day totals alerts on most days; with the
+# lateness covering the disorder every day is scored once, complete.
+def test_shuffled_stream_alerts_only_on_complete_days():
+    sink = ListSink()
+    detector = RevenueAnomalyDetector(sink, allowed_lateness=60)
+    feed(detector, daily_sales())
+    detector.flush()
+    
+    assert detector.stats['retractions'] == 0
+    assert sink.net_alerts() == final_outliers(detector)
+    assert detector.stats['alerts'] == len(final_outliers(detector))
+
+
+def test_open_day_is_not_scored_until_it_closes():
+    sales = pd.DataFrame({'Product_ID': 'P1', 'date': [f"2020-01-{day:02d}" for day in range(1, 8)],
+                          'Total_Revenue': [100.0, 101.0, 99.0, 100.0, 102.0, 98.0, 100.0]})
+    spike = pd.DataFrame({'Product_ID': ['P1'], 'date': ['2020-01-08'], 'Total_Revenue': [1000.0]})
+    sink = ListSink()
+    detector = RevenueAnomalyDetector(sink, allowed_lateness=0)
+    detector.update(sales)
+    detector.update(spike)
+    assert sink.net_alerts() == set()
+    
+    detector.update(pd.DataFrame({'Product_ID': ['P1'], 'date': ['2020-01-09'], 'Total_Revenue': [100.0]}))
+    assert sink.net_alerts() == {('2020-01-08', 'P1')}
+
+
+def test_late_rows_retract_an_alert_that_no_longer_holds():
+    sales = pd.DataFrame({'Product_ID': 'P1', 'date': [f"2020-01-{day:02d}" for day in range(1, 10)],
+                          'Total_Revenue': [100.0, 101.0, 99.0, 100.0, 10.0, 98.0, 100.0, 102.0, 99.0]})
+    sink = ListSink()
+    detector = RevenueAnomalyDetector(sink, allowed_lateness=0)
+    detector.update(sales)
+    assert sink.net_alerts() == {('2020-01-05', 'P1')}
+    
+    detector.update(pd.DataFrame({'Product_ID': ['P1'], 'date': ['2020-01-05'], 'Total_Revenue': [90.0]}))
+    assert detector.stats['retractions'] == 1
+    assert sink.net_alerts() == set()
+
+
+def test_saved_state_resumes_where_the_run_stopped(tmp_path):
+    sales = daily_sales(seed=1).sort_values('date', kind='stable').reset_index(drop=True)
+    whole = RevenueAnomalyDetector(ListSink())
+    feed(whole, sales)
+    
+    first = RevenueAnomalyDetector(ListSink())
+    feed(first, sales.iloc[:len(sales) // 2])
+    first.save(str(tmp_path / 'anomaly_state.npz'))
+    resumed = RevenueAnomalyDetector(ListSink())
+    resumed.load(str(tmp_path / 'anomaly_state.npz'))
+    feed(resumed, sales.iloc[len(sales) // 2:])
+    
+    assert resumed.sink.net_alerts() | first.sink.net_alerts() == whole.sink.net_alerts()
+    pd.testing.assert_frame_equal(resumed.outliers(), whole.outliers())
@@ -0,0 +1,76 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+from ETL_Transport import SpillQueue, TRANSACTION_DTYPES
+from ETL_Join import HybridJoinThreaded
+
+CUSTOMERS = os.path.join(REPO, 'customer_master_data.csv')
+PRODUCTS = os.path.join(REPO, 'product_master_data.csv')
+TRANSACTIONS = os.path.join(REPO, 'transactional_data.csv')
+
+
+def record(number):
+    return {'orderID': number, 'Customer_ID': 1000000 + number, 'Product_ID': f"P{number:08d}", 'quantity': 1}
+
+
+def test_records_come_back_in_order_across_segments(tmp_path):
+    spill = SpillQueue(str(tmp_path / 'spill'), segment_bytes=256)
+    popped = []
+    for number in range(300):
+        spill.append(record(number))
+        if number % 3 == 2:
+            popped.append(spill.popleft()['orderID'])
+    assert spill.stats['segments'] > 5
+    assert len(os.listdir(str(tmp_path / 'spill'))) < spill.stats['segments']
+    
+    while len(spill):
+        popped.append(spill.popleft()['orderID'])
+    assert popped == list(range(300))
+    assert spill.stats['spilled'] == spill.stats['unspilled'] == 300
+    assert spill.stats['peak_backlog'] == 201
+    assert len(os.listdir(str(tmp_path / 'spill'))) == 1
+    spill.close()
+
+
+def test_drained_queue_reuses_its_segment(tmp_path):
+    spill = SpillQueue(str(tmp_path / 'spill'), segment_bytes=1 << 20)
+    for burst in range(3):
+        for number in range(10):
+            spill.append(record(burst * 10 + number))
+        assert [spill.popleft()['orderID'] for _ in range(10)] == list(range(burst * 10, burst * 10 + 10))
+        assert os.path.getsize(spill.segments[0]) == 0
+    assert spill.stats['segments'] == 1
+    
+    with pytest.raises(IndexError):
+        spill.popleft()
+    spill.close()
+
+
+# A queue of five tuples spills nearly the whole stream; every spilled tuple
+# must come back and join (or drop) exactly as the batch join does.
+def test_tuple_join_with_a_tiny_queue_spills_and_unspills_every_tuple(tmp_path):
+    transactions = pd.read_csv(TRANSACTIONS, index_col=0, dtype=TRANSACTION_DTYPES)
+    unmatched = transactions.iloc[:20].assign(Customer_ID=1, orderID=range(1, 21))
+    stream = pd.concat([transactions, unmatched, transactions.iloc[::-1]], ignore_index=True)
+    
+    results = {}
+    for join_mode, config in (('batch', {}), ('tuple', {'queue_size': 5, 'hash_slots': 50, 'spill_threshold': 50})):
+        hybrid_join = HybridJoinThreaded(join_mode=join_mode, batch_size=200, disk_partition_size=100,
+                                         disk_dir=str(tmp_path / join_mode), **config)
+        hybrid_join.load_master_data_to_disk(CUSTOMERS, PRODUCTS)
+        enriched = hybrid_join.execute_join_threaded(stream)
+        results[join_mode] = hybrid_join, enriched.sort_values(['orderID', 'date'], kind='stable').reset_index(drop=True)
+    
+    tuple_join, tuple_rows = results['tuple']
+    batch_join, batch_rows = results['batch']
+    assert tuple_join.spill.stats['spilled'] > len(stream) // 2
+    assert tuple_join.spill.stats['unspilled'] == tuple_join.spill.stats['spilled']
+    assert len(tuple_join.spill) == 0 and not tuple_join.processing_queue
+    assert tuple_join.stats['dropped'] == batch_join.stats['dropped'] == 20
+    pd.testing.assert_frame_equal(tuple_rows, batch_rows)
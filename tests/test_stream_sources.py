@@ -0,0 +1,123 @@
+import io
+import os
+import sys
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+from ETL_Transport import DirectoryStreamSource, TRANSACTION_DTYPES, TailStreamSource, open_stream_source
+
+TRANSACTIONS = os.path.join(REPO, 'transactional_data.csv')
+
+with open(TRANSACTIONS, 'rb') as handle:
+    HEADER, *ROWS = handle.readlines()
+ORDER_IDS = pd.read_csv(TRANSACTIONS, index_col=0, dtype=TRANSACTION_DTYPES)['orderID'].tolist()
+
+
+def write_rows(path, rows, header=True, mode='wb'):
+    with open(path, mode) as handle:
+        if header:
+            handle.write(HEADER)
+        handle.writelines(rows)
+
+
+def order_ids(chunks):
+    return [order_id for chunk in chunks for order_id in chunk['orderID'].tolist()]
+
+
+def open_source(kind, tmp_path, monkeypatch, start_position=None):
+    if kind == 'stdin':
+        monkeypatch.setattr(sys, 'stdin', io.StringIO(b''.join([HEADER] + ROWS).decode()))
+        return open_stream_source('-', 100, start_position=start_position)
+    if kind == 'dataframe':
+        frame = pd.read_csv(TRANSACTIONS, index_col=0, dtype=TRANSACTION_DTYPES)
+        return open_stream_source(frame, 100, start_position=start_position)
+    if kind == 'directory':
+        directory = tmp_path / 'incoming'
+        directory.mkdir(exist_ok=True)
+        for number, start in enumerate(range(0, len(ROWS), 350)):
+            write_rows(str(directory / f"part-{number:03d}.csv"), ROWS[start:start + 350])
+        return open_stream_source(str(directory), 100, start_position=start_position)
+    return open_stream_source(TRANSACTIONS, 100, start_position=start_position)
+
+
+# Reopening a source at the position reported after any chunk yields exactly
+# the records that followed it.
+@pytest.mark.parametrize('kind', ['csv', 'dataframe', 'stdin', 'directory'])
+def test_resume_from_a_reported_position_reads_the_rest(tmp_path, monkeypatch, kind):
+    source = open_source(kind, tmp_path, monkeypatch)
+    positions, read = [], []
+    for chunk in source.chunks():
+        positions.append(chunk.attrs['source_position'])
+        read.append(chunk['orderID'].tolist())
+    assert sum(read, []) == ORDER_IDS
+    
+    for resume_after in (0, 3, 4, len(positions) - 1):
+        resumed = open_source(kind, tmp_path, monkeypatch, start_position=positions[resume_after])
+        assert order_ids(resumed.chunks()) == sum(read[resume_after + 1:], [])
+
+
+def test_directory_follow_picks_up_new_files_then_times_out(tmp_path):
+    directory = tmp_path / 'incoming'
+    directory.mkdir()
+    write_rows(str(directory / 'part-000.csv'), ROWS[:300])
+    source = DirectoryStreamSource(str(directory), chunk_size=100, follow=True, poll_interval=0.05,
+                                   idle_timeout=1.0)
+    
+    def rotate():
+        time.sleep(0.3)
+        write_rows(str(directory / 'part-001.csv.tmp'), ROWS[300:700])
+        os.rename(str(directory / 'part-001.csv.tmp'), str(directory / 'part-001.csv'))
+    
+    writer = threading.Thread(target=rotate)
+    writer.start()
+    start_time = time.time()
+    chunks = list(source.chunks())
+    writer.join()
+    
+    assert order_ids(chunks) == ORDER_IDS[:700]
+    assert [os.path.basename(path) for path in source.files_read] == ['part-000.csv', 'part-001.csv']
+    assert chunks[-1].attrs['source_position'] == {'file': 'part-001.csv',
+                                                   'offset': len(HEADER) + sum(map(len, ROWS[300:700]))}
+    assert 1.0 <= time.time() - start_time < 10
+
+
+def test_tail_reads_appended_and_partial_lines_and_resumes(tmp_path):
+    path = str(tmp_path / 'growing.csv')
+    write_rows(path, ROWS[:150])
+    
+    def append():
+        time.sleep(0.2)
+        line = ROWS[150]
+        write_rows(path, [line[:10]], header=False, mode='ab')
+        time.sleep(0.2)
+        write_rows(path, [line[10:]] + ROWS[151:400], header=False, mode='ab')
+    
+    writer = threading.Thread(target=append)
+    writer.start()
+    source = open_stream_source(path, 100, follow=True, idle_timeout=1.0)
+    source.poll_interval = 0.05
+    chunks = list(source.chunks())
+    writer.join()
+    assert order_ids(chunks) == ORDER_IDS[:400]
+    
+    write_rows(path, ROWS[400:450], header=False, mode='ab')
+    resumed = TailStreamSource(path, 100, poll_interval=0.05, idle_timeout=0.3,
+                               start_position=chunks[-1].attrs['source_position'])
+    assert order_ids(resumed.chunks()) == ORDER_IDS[400:450]
+
+
+def test_tail_without_new_data_exits_after_the_idle_timeout(tmp_path):
+    path = str(tmp_path / 'quiet.csv')
+    write_rows(path, ROWS[:10])
+    source = TailStreamSource(path, 100, poll_interval=0.05, idle_timeout=0.5,
+                              start_position={'offset': os.path.getsize(path)})
+    
+    start_time = time.time()
+    assert list(source.chunks()) == []
+    assert 0.5 <= time.time() - start_time < 5
@@ -0,0 +1,127 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+from ETL_Warehouse import duckdb, translate_tsql
+
+ENGINES = [pytest.param('duckdb', marks=pytest.mark.skipif(duckdb is None, reason="duckdb is not installed")),
+           'sqlite']
+
+SALES = [(1, 'A', '2019-02-14', 10.0), (2, 'B', '2019-05-03', None), (3, 'A', '2019-11-30', 7.5),
+         (4, 'C', '2020-01-05', 2.0)]
+
+
+def connect(engine):
+    conn = duckdb.connect(':memory:') if engine == 'duckdb' else sqlite3.connect(':memory:')
+    conn.execute("CREATE TABLE Sales (Id INTEGER, Product VARCHAR, Sale_Date DATE, Revenue DOUBLE)")
+    conn.executemany("INSERT INTO Sales VALUES (?, ?, ?, ?)", SALES)
+    return conn
+
+
+def run(engine, script):
+    conn = connect(engine)
+    statements = translate_tsql(script, engine)
+    rows = [conn.execute(statement).fetchall() for statement in statements]
+    conn.close()
+    return rows[-1]
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_top_becomes_a_trailing_limit(engine):
+    statement, = translate_tsql("SELECT TOP 2 Id FROM Sales ORDER BY Id DESC;", engine)
+    assert statement == "SELECT Id FROM Sales ORDER BY Id DESC\nLIMIT 2"
+    assert run(engine, "SELECT TOP (3) Id FROM Sales ORDER BY Id;") == [(1,), (2,), (3,)]
+    assert run(engine, "SELECT DISTINCT TOP 2 Product FROM Sales ORDER BY Product;") == [('A',), ('B',)]
+    assert run(engine, "WITH Ranked AS (SELECT Id FROM Sales) SELECT TOP 1 Id FROM Ranked ORDER BY Id DESC;") == [(4,)]
+
+
+def test_top_inside_a_subquery_is_rejected():
+    with pytest.raises(ValueError, match='subquery'):
+        translate_tsql("SELECT * FROM (SELECT TOP 1 Id FROM Sales ORDER BY Id) t;", 'sqlite')
+
+
+def test_text_mentioning_top_is_left_alone():
+    statement, = translate_tsql("SELECT 'Top 5 products' AS Title, STORE_TOP FROM Sales;", 'sqlite')
+    assert statement == "SELECT 'Top 5 products' AS Title, STORE_TOP FROM Sales"
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_isnull_becomes_coalesce(engine):
+    statement, = translate_tsql("SELECT ISNULL(Revenue, 0) FROM Sales;", engine)
+    assert statement == "SELECT COALESCE(Revenue, 0) FROM Sales"
+    assert run(engine, "SELECT isnull(Revenue, 0) FROM Sales ORDER BY Id;") == [(10.0,), (0.0,), (7.5,), (2.0,)]
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_datepart_matches_sql_server(engine):
+    rows = run(engine, """
+        SELECT DATEPART(year, Sale_Date), DATEPART(qq, Sale_Date), DATEPART(month, Sale_Date),
+               DATEPART(dd, Sale_Date), DATEPART(dayofyear, Sale_Date), DATEPART(weekday, Sale_Date)
+        FROM Sales ORDER BY Id;
+    """)
+    # 2019-02-14 was a Thursday, 2019-05-03 a Friday, 2019-11-30 a Saturday
+    # and 2020-01-05 a Sunday (SQL Server weekday 5, 6, 7 and 1).
+    assert [tuple(int(value) for value in row) for row in rows] == [(2019, 1, 2, 14, 45, 5), (2019, 2, 5, 3, 123, 6),
+                                                                   (2019, 4, 11, 30, 334, 7), (2020, 1, 1, 5, 5, 1)]
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_nested_datepart_and_grouping(engine):
+    rows = run(engine, """
+        SELECT DATEPART(year, Sale_Date) AS Year, COUNT(*)
+        FROM Sales
+        WHERE DATEPART(quarter, Sale_Date) IN (1, 4) AND DATEPART(month, DATE(Sale_Date)) > 1
+        GROUP BY DATEPART(year, Sale_Date)
+        ORDER BY Year;
+    """)
+    assert [tuple(int(value) for value in row) for row in rows] == [(2019, 2)]
+
+
+def test_unknown_datepart_is_rejected():
+    with pytest.raises(ValueError, match='nanosecond'):
+        translate_tsql("SELECT DATEPART(nanosecond, Sale_Date) FROM Sales;", 'sqlite')
+
+
+def test_dbo_prefix_guards_and_batches():
+    script = """
+CREATE DATABASE Warehouse;
+GO
+USE Warehouse;
+GO
+PRINT 'Creating tables';
+IF OBJECT_ID('dbo.Dim_Store', 'U') IS NOT NULL
+    DROP TABLE dbo.Dim_Store;
+CREATE TABLE dbo.Dim_Store (
+    Store_SK INT PRIMARY KEY IDENTITY(1,1),
+    Store_ID INT NOT NULL
+);
+CREATE NONCLUSTERED INDEX IX_Store ON dbo.Dim_Store(Store_ID);
+GO
+IF OBJECT_ID('dbo.Store_View', 'V') IS NOT NULL
+    DROP VIEW dbo.Store_View;
+GO
+-- A comment line
+SELECT STDEV(Store_ID) FROM dbo.Dim_Store;
+"""
+    assert translate_tsql(script, 'sqlite') == [
+        'DROP TABLE IF EXISTS Dim_Store',
+        'CREATE TABLE Dim_Store (\n    Store_SK INTEGER PRIMARY KEY,\n    Store_ID INT NOT NULL\n)',
+        'CREATE INDEX IX_Store ON Dim_Store(Store_ID)',
+        'DROP VIEW IF EXISTS Store_View',
+        'SELECT STDEV(Store_ID) FROM Dim_Store'
+    ]
+    assert translate_tsql(script, 'duckdb')[-1] == 'SELECT STDDEV_SAMP(Store_ID) FROM Dim_Store'
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_repository_scripts_translate_without_sql_server_syntax(engine):
+    for path in ('create_star_schema.sql', 'olap_queries.sql'):
+        with open(os.path.join(REPO, path)) as handle:
+            for statement in translate_tsql(handle.read(), engine):
+                assert 'dbo.' not in statement
+                assert not any(token in statement.upper() for token in ('ISNULL(', 'DATEPART(', 'IDENTITY(', 'GO\n'))